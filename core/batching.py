@@ -0,0 +1,163 @@
+"""
+Token-budget batching for transformer inference.
+
+Inputs are tokenized once, sorted by token length into length buckets and
+cut into batches whose padded size (inputs x longest input) stays under a
+token budget, so "Good" is batched with other short sentences instead of
+being padded to the length of a paragraph, and short inputs get large
+batches while long ones get small batches. Outputs are put back in the
+original input order. Inputs longer than the model limit are split into
+windows by core.chunking rather than truncated.
+"""
+import numpy as np
+
+from .chunking import encode_windows, pool_windows
+
+
+# A length bucket spans from its shortest input to that length plus
+# max(BUCKET_MIN_WIDTH, shortest * BUCKET_GROWTH) tokens
+BUCKET_MIN_WIDTH = 8
+BUCKET_GROWTH = 0.25
+
+
+def plan_batches(lengths, max_tokens, max_items=None) -> list:
+    """
+    Index arrays of the batches for inputs of the given token `lengths`.
+    Inputs are sorted shortest first and cut into length buckets, so no
+    input is padded much past its own length; each bucket is split into
+    batches of as many inputs as fit in `max_tokens` once padded (and at
+    most `max_items`). An input longer than the budget gets its own batch.
+    """
+    lengths = np.asarray(lengths)
+    batches = []
+    batch = []
+    bucket_end = 0
+    for i in np.argsort(lengths, kind="stable"):
+        n = int(lengths[i])  # sorted, so also the padded length of the batch
+        if batch and (
+            n > bucket_end
+            or (len(batch) + 1) * n > max_tokens
+            or (max_items and len(batch) >= max_items)
+        ):
+            batches.append(np.array(batch))
+            batch = []
+        if not batch:
+            bucket_end = n + max(BUCKET_MIN_WIDTH, int(n * BUCKET_GROWTH))
+        batch.append(i)
+    if batch:
+        batches.append(np.array(batch))
+    return batches
+
+
+def token_lengths(encodings) -> np.ndarray:
+    return np.fromiter(map(len, encodings), dtype=np.int64, count=len(encodings))
+
+
+def run_batched(encodings, run_batch, max_tokens, max_items=None) -> np.ndarray:
+    """
+    Run `run_batch(indices)` over token-budget batches of `encodings` (one
+    token id list per input) and return its output rows in input order.
+    """
+    lengths = token_lengths(encodings)
+    out = None
+    for batch in plan_batches(lengths, max_tokens, max_items):
+        rows = np.asarray(run_batch(batch))
+        if out is None:
+            out = np.empty((len(encodings),) + rows.shape[1:], dtype=rows.dtype)
+        out[batch] = rows
+    return out
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    probs = np.exp(logits)
+    return probs / probs.sum(axis=-1, keepdims=True)
+
+
+def max_input_length(tokenizer, config) -> int:
+    return min(tokenizer.model_max_length, getattr(config, "max_position_embeddings", tokenizer.model_max_length))
+
+
+def pad_batch(tokenizer, encoded, indices, return_tensors):
+    """Pad the inputs `indices` of an unpadded tokenizer output into one batch."""
+    names = [name for name in tokenizer.model_input_names if name in encoded]
+    features = [{name: encoded[name][i] for name in names} for i in indices]
+    return tokenizer.pad(features, padding=True, return_tensors=return_tensors)
+
+
+def sequence_logits(pipe, encoded, max_tokens, max_items=None) -> np.ndarray:
+    """Logits of a transformers pipeline's (torch) model for every input in `encoded`."""
+    import torch
+
+    model = pipe.model
+
+    def run(indices):
+        batch = pad_batch(pipe.tokenizer, encoded, indices, "pt")
+        with torch.inference_mode():
+            return model(**{k: v.to(model.device) for k, v in batch.items()}).logits.float().cpu().numpy()
+
+    return run_batched(encoded["input_ids"], run, max_tokens, max_items)
+
+
+class TokenBudgetClassifier:
+    """
+    Wraps a "sentiment-analysis" (text classification) pipeline. Called like
+    the pipeline with a list of texts it returns one {"label", "score"} dict
+    per text, but runs the model in token-budget batches; `batch_size` only
+    caps the number of texts per batch. Texts longer than `window` tokens
+    (default: the model limit) are scored in overlapping windows whose
+    probabilities are averaged, instead of being truncated; `truncation` is
+    only accepted for compatibility with the pipeline.
+    """
+
+    def __init__(self, pipe, max_tokens, window=None, overlap=0, max_windows=None):
+        self.pipe = pipe
+        self.model = pipe.model
+        self.tokenizer = pipe.tokenizer
+        self.max_tokens = max_tokens
+        self.max_length = max_input_length(pipe.tokenizer, pipe.model.config)
+        self.window = window or self.max_length
+        self.overlap = overlap
+        self.max_windows = max_windows
+        self.labels = [pipe.model.config.id2label[i] for i in range(pipe.model.config.num_labels)]
+
+    def __call__(self, texts, batch_size=None, truncation=True):
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return []
+        encoded, owners = encode_windows(
+            self.tokenizer, texts, self.window, self.overlap, self.max_windows, self.max_length,
+        )
+        probs = softmax(sequence_logits(self.pipe, encoded, self.max_tokens, batch_size))
+        probs = pool_windows(probs, owners, len(texts), weights=token_lengths(encoded["input_ids"]))
+        best = probs.argmax(axis=1)
+        return [{"label": self.labels[label], "score": float(probs[row, label])} for row, label in enumerate(best)]
+
+
+def zero_shot_scores(pipe, texts, labels, max_tokens, template="This example is {}.", max_items=None,
+                     window=None, overlap=0, max_windows=None) -> np.ndarray:
+    """
+    Multi-label zero-shot scores of a "zero-shot-classification" pipeline for
+    every (text, label) pair, as an array of shape (len(texts), len(labels)).
+    Same scores as pipe(text, labels, multi_label=True) for texts that fit in
+    one window, but the premise / hypothesis pairs of all texts share
+    token-budget batches. Longer texts are split into overlapping windows of
+    at most `window` tokens and each label keeps its best window, so an issue
+    mentioned anywhere in a long review is found.
+    """
+    if not texts:
+        return np.zeros((0, len(labels)))
+    max_length = max_input_length(pipe.tokenizer, pipe.model.config)
+    hypotheses = pipe.tokenizer(
+        [template.format(label) for label in labels], add_special_tokens=False,
+    )["input_ids"]
+    encoded, owners = encode_windows(
+        pipe.tokenizer, texts, window or max_length, overlap, max_windows, max_length, suffixes=hypotheses,
+    )
+    logits = sequence_logits(pipe, encoded, max_tokens, max_items)
+    # like the pipeline: entailment against contradiction, softmaxed per pair
+    contradiction_id = -1 if pipe.entailment_id == 0 else 0
+    entail = softmax(logits[:, [contradiction_id, pipe.entailment_id]])[:, 1]
+    # one row of label scores per window
+    return pool_windows(entail.reshape(-1, len(labels)), owners[::len(labels)], len(texts), how="max")
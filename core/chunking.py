@@ -0,0 +1,77 @@
+"""
+Sliding-window chunking of long inputs for transformer inference.
+
+Instead of truncating at the model limit, every input is tokenized in full
+and cut into overlapping windows of at most `size` tokens (`overlap` tokens
+shared between neighbours). The windows are scored like separate inputs and
+their outputs pooled back into one row per input. `max_windows` caps the
+windows of a single input so a very long review costs at most that many
+passes: the first and last windows are always kept and the rest are spread
+evenly in between, skipping some of the middle.
+"""
+import numpy as np
+
+
+def window_spans(length, size, overlap=0, max_windows=None) -> list:
+    """(start, end) token offsets of the windows covering `length` tokens."""
+    if length <= size:
+        return [(0, length)]
+    stride = max(size - overlap, 1)
+    starts = list(range(0, length - size + 1, stride))
+    if starts[-1] + size < length:
+        starts.append(length - size)
+    if max_windows and len(starts) > max_windows:
+        picks = np.unique(np.linspace(0, len(starts) - 1, max_windows).round().astype(int))
+        starts = [starts[i] for i in picks]
+    return [(start, start + size) for start in starts]
+
+
+def encode_windows(tokenizer, texts, size, overlap=0, max_windows=None, max_length=512, suffixes=None):
+    """
+    Tokenize `texts` into windows, ready for batching.pad_batch(). Each window
+    gets the tokenizer's special tokens; with `suffixes` (token id lists,
+    e.g. zero-shot hypotheses) every window is paired with every suffix, in
+    window-major order. Returns (encoded, owners), owners[i] being the index
+    in `texts` of the window (or window/suffix pair) i.
+    """
+    reserved = tokenizer.num_special_tokens_to_add(pair=bool(suffixes))
+    if suffixes:
+        reserved += max(map(len, suffixes))
+    size = max(min(size, max_length - reserved), 1)
+    tokens = tokenizer(list(texts), add_special_tokens=False, verbose=False)["input_ids"]
+    with_types = "token_type_ids" in tokenizer.model_input_names
+
+    encoded = {"input_ids": [], "attention_mask": []}
+    if with_types:
+        encoded["token_type_ids"] = []
+    owners = []
+    for owner, ids in enumerate(tokens):
+        for start, end in window_spans(len(ids), size, overlap, max_windows):
+            window = ids[start:end]
+            for suffix in suffixes or [None]:
+                input_ids = tokenizer.build_inputs_with_special_tokens(window, suffix)
+                encoded["input_ids"].append(input_ids)
+                encoded["attention_mask"].append([1] * len(input_ids))
+                if with_types:
+                    encoded["token_type_ids"].append(tokenizer.create_token_type_ids_from_sequences(window, suffix))
+                owners.append(owner)
+    return encoded, np.array(owners, dtype=np.int64)
+
+
+def pool_windows(rows, owners, n, how="mean", weights=None) -> np.ndarray:
+    """
+    Pool the output `rows` of the windows into `n` rows, one per input:
+    "mean" (weighted by `weights`, e.g. window lengths) or "max".
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    if how == "max":
+        out = np.full((n,) + rows.shape[1:], -np.inf)
+        np.maximum.at(out, owners, rows)
+        return out
+    if how != "mean":
+        raise ValueError(f"Unknown window pooling {how!r}, expected 'mean' or 'max'")
+    weights = np.ones(len(owners)) if weights is None else np.asarray(weights, dtype=np.float64)
+    shape = (-1,) + (1,) * (rows.ndim - 1)
+    out = np.zeros((n,) + rows.shape[1:])
+    np.add.at(out, owners, rows * weights.reshape(shape))
+    return out / np.bincount(owners, weights=weights, minlength=n).reshape(shape)
@@ -0,0 +1,19 @@
+import hashlib
+import re
+
+# Flipkart shows recent reviews with relative dates that drift between scrapes
+_RELATIVE_DATE = re.compile(r"\bago\b|\btoday\b|\byesterday\b", re.IGNORECASE)
+
+
+def review_fingerprint(product_key, reviewer, title, text, date):
+    """
+    Stable content hash of a review, built from the product and the fields a
+    marketplace shows for it. Whitespace and case are normalized, and relative
+    dates ("3 months ago") are ignored so the same review hashes the same way
+    on every scrape.
+    """
+    if date and _RELATIVE_DATE.search(date):
+        date = ""
+    parts = [str(product_key), reviewer, title, text, date]
+    normalized = "\x1f".join(" ".join(str(p or "").split()).lower() for p in parts)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
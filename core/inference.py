@@ -0,0 +1,281 @@
+"""
+Local inference server shared by the processes of one machine.
+
+`manage.py inference_server` loads each model once and serves it over a
+Unix socket, so gunicorn workers, job workers and commands don't each hold
+their own copy. Requests arriving at about the same time are merged into
+micro-batches: the first request of a batch waits at most `max_wait`
+seconds for others to join, up to `max_batch` inputs, and the model runs
+once for all of them.
+
+RemoteModel is the client side. Called like the pipeline it stands for, it
+sends the inputs to the server and returns the results; with `fallback`
+it uses this process's own model when no server is running.
+
+Messages are JSON, each prefixed with its length (4 bytes, big endian):
+    {"op": "run", "model": name, "inputs": [...]} -> {"results": [...]}
+    {"op": "stats"} -> {"models": {name: {"requests", "batches", "inputs"}}}
+and {"error": message} when a request fails.
+"""
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+
+from django.conf import settings
+
+from .ml import get_model
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("!I")
+_STOP = object()
+
+# How the server runs a micro-batch of inputs through each model it serves
+BATCH_CALLS = {
+    "sentiment": lambda model, inputs, max_batch: model(inputs, batch_size=max_batch, truncation=True),
+}
+
+
+class InferenceError(RuntimeError):
+    """The inference server couldn't run a request."""
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        part = sock.recv(size - len(data))
+        if not part:
+            return None
+        data += part
+    return bytes(data)
+
+
+def recv_message(sock):
+    """Next message from `sock`, None once the peer has closed it."""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exactly(sock, _HEADER.unpack(header)[0])
+    if data is None:
+        return None
+    return json.loads(data)
+
+
+class MicroBatcher:
+    """
+    Runs `run(inputs)` for the requests given to submit(), from one thread,
+    merging requests that arrive within `max_wait` seconds of the first
+    into a single call of at most `max_batch` inputs (a larger request runs
+    on its own).
+    """
+
+    def __init__(self, run, max_batch=256, max_wait=0.01):
+        self.run = run
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.stats = {"requests": 0, "batches": 0, "inputs": 0}
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, inputs) -> list:
+        """Results for `inputs`, once the batch they joined has run."""
+        future = Future()
+        self.queue.put((list(inputs), future))
+        return future.result()
+
+    def close(self):
+        self.queue.put(_STOP)
+        self.thread.join()
+
+    def _loop(self):
+        item = self.queue.get()
+        while item is not _STOP:
+            batch = [item]
+            size = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            item = None
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP or size + len(item[0]) > self.max_batch:
+                    break  # starts the next batch (or stops the loop)
+                batch.append(item)
+                size += len(item[0])
+                item = None
+            self._run(batch)
+            if item is None:
+                item = self.queue.get()
+
+    def _run(self, batch):
+        inputs = [x for request, _ in batch for x in request]
+        self.stats["requests"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["inputs"] += len(inputs)
+        try:
+            results = self.run(inputs)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        start = 0
+        for request, future in batch:
+            future.set_result(results[start:start + len(request)])
+            start += len(request)
+
+
+def server_is_running(path) -> bool:
+    """Whether a server accepts connections on the Unix socket `path`."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(path))
+        except OSError:
+            return False
+    return True
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            message = recv_message(self.request)
+            if message is None:
+                return
+            send_message(self.request, self.server.dispatch(message))
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves `models` (name -> loaded model) on the Unix socket `path`, one
+    thread per client connection and one MicroBatcher per model. Raises
+    InferenceError when another server is already listening on `path`.
+    """
+
+    daemon_threads = True
+    # pending connections; a full backlog fails clients' connect() at once
+    request_queue_size = socket.SOMAXCONN
+
+    def __init__(self, path, models, max_batch=256, max_wait=0.01):
+        self.path = str(path)
+        if os.path.exists(self.path):
+            if server_is_running(self.path):
+                raise InferenceError(f"An inference server is already listening on {self.path}")
+            os.unlink(self.path)  # left behind by a server that didn't shut down cleanly
+        self.batchers = {
+            name: MicroBatcher(
+                partial(BATCH_CALLS[name], model, max_batch=max_batch), max_batch=max_batch, max_wait=max_wait,
+            )
+            for name, model in models.items()
+        }
+        super().__init__(self.path, _Handler)
+
+    def dispatch(self, message) -> dict:
+        op = message.get("op")
+        if op == "stats":
+            return {"models": {name: dict(b.stats) for name, b in self.batchers.items()}}
+        if op != "run":
+            return {"error": f"Unknown op {op!r}"}
+        batcher = self.batchers.get(message.get("model"))
+        if batcher is None:
+            return {"error": f"Model {message.get('model')!r} is not served, only {sorted(self.batchers)}"}
+        try:
+            return {"results": batcher.submit(message["inputs"])}
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    def server_close(self):
+        super().server_close()
+        for batcher in self.batchers.values():
+            batcher.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def request(message, path=None, timeout=None) -> dict:
+    """Send one message to the inference server and return its reply."""
+    path = str(path or settings.INFERENCE_SOCKET)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout or settings.INFERENCE_TIMEOUT)
+        sock.connect(path)
+        send_message(sock, message)
+        reply = recv_message(sock)
+    if reply is None:
+        raise InferenceError("The inference server closed the connection")
+    if "error" in reply:
+        raise InferenceError(reply["error"])
+    return reply
+
+
+class RemoteModel:
+    """
+    Stands in for model `name` (only BATCH_CALLS models), running it on the
+    inference server. With `fallback`, inputs are run on this process's own
+    copy (core.ml.get_model) when no server is listening on `path` or a
+    request fails or times out; after such a failure the server is only
+    tried again once settings.INFERENCE_RETRY_INTERVAL seconds have passed.
+    """
+
+    def __init__(self, name, path=None, fallback=True):
+        self.name = name
+        self.path = path
+        self.fallback = fallback
+        self.warned = False
+        self.retry_at = 0.0  # time.monotonic() before which the server isn't tried
+
+    def __call__(self, inputs, batch_size=None, truncation=True):
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        if not inputs:
+            return []
+        if not self.fallback or time.monotonic() >= self.retry_at:
+            try:
+                return request({"op": "run", "model": self.name, "inputs": list(inputs)}, self.path)["results"]
+            except (OSError, InferenceError) as e:  # no server, a dead or timed out one, or a failed request
+                if not self.fallback:
+                    raise
+                self.retry_at = time.monotonic() + settings.INFERENCE_RETRY_INTERVAL
+                if not self.warned:
+                    logger.warning(
+                        "No inference server at %s (%s), running %s locally",
+                        self.path or settings.INFERENCE_SOCKET, e.__class__.__name__, self.name,
+                    )
+                    self.warned = True
+        return get_model(self.name)(inputs, batch_size=batch_size, truncation=truncation)
+
+
+_remote_models = {}
+_remote_models_lock = threading.Lock()
+
+
+def get_classifier(name="sentiment"):
+    """
+    The model to run `name` with in this process: a RemoteModel when
+    settings.INFERENCE_SOCKET is set, else the process's own copy. Each
+    model gets a single RemoteModel per socket, so a missing server is
+    noticed (and reported) once rather than on every call.
+    """
+    if settings.INFERENCE_SOCKET and name in BATCH_CALLS:
+        key = (name, str(settings.INFERENCE_SOCKET))
+        with _remote_models_lock:
+            model = _remote_models.get(key)
+            if model is None:
+                model = _remote_models[key] = RemoteModel(name)
+        return model
+    return get_model(name)
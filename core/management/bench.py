@@ -0,0 +1,79 @@
+"""
+Shared pieces of the bench_* management commands: the --repeat / --json
+options, best-of-N timing and the machine-readable results file.
+"""
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+from django.conf import settings
+
+PACKAGES = ["django", "beautifulsoup4", "lxml", "requests", "numpy", "transformers", "torch", "onnxruntime", "nltk"]
+
+
+def add_bench_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Timed runs per measurement, the best one is kept (default: 3)')
+    parser.add_argument('--json', dest='json_path', default=None,
+                        help='Write machine-readable results to this file ("-" for stdout)')
+
+
+def timed(fn, repeat):
+    """Run fn() `repeat` times (at least once); return (last result, best time in seconds)."""
+    best = None
+    result = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def package_versions():
+    versions = {}
+    for name in PACKAGES:
+        try:
+            versions[name] = version(name)
+        except PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(command, options, results, **extra):
+    """
+    With --json, write `results` (plus `extra` fields) together with the
+    environment they were measured in, to the file or to stdout for "-".
+    """
+    path = options['json_path']
+    if not path:
+        return
+    payload = json.dumps({
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "packages": package_versions(),
+        "database": settings.DATABASES["default"]["ENGINE"],
+        "repeat": max(options['repeat'], 1),
+        **extra,
+        "results": results,
+    }, indent=2)
+    if path == "-":
+        command.stdout.write(payload)
+    else:
+        Path(path).write_text(payload, encoding="utf-8")
+        command.stdout.write(f"Results written to {path}")
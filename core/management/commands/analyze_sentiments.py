@@ -1,71 +1,158 @@
 # core/management/commands/analyze_sentiments.py
-from django.core.management.base import BaseCommand
-from transformers import pipeline
+import multiprocessing
+import os
+import queue
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.ml import MODEL_SPECS, backend_for, get_model
 from core.models import Review
-from nltk.tokenize import sent_tokenize
-import nltk
-import statistics
+from core.sentiment import analyze_reviews, get_sentiment_cache, id_shards, save_sentiments, stale_reviews
+from core.sentiment_worker import analyze_shard
 
-nltk.download("punkt", quiet=True)
+REPORT_EVERY = 5.0  # seconds
+# Worker results merged per write transaction
+WRITE_BATCH = 5000
 
 class Command(BaseCommand):
     help = "Analyze sentiment for all reviews with robust sentence-level analysis"
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write("🔍 Starting sentiment analysis...")
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Sentences per classifier batch (default: SENTIMENT_BATCH_SIZE)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Reviews whose sentences are classified together (default: SENTIMENT_CHUNK_SIZE)')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Classify every sentence again instead of using the sentence cache')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Inference processes, each analyzing one id range of the reviews (default: 1)')
+        parser.add_argument('--threads', type=int, default=None,
+                            help='CPU threads per worker process (default: cores / workers)')
+        parser.add_argument('--only-stale', action='store_true',
+                            help='Only analyze reviews that are new, whose text changed or that an older model scored')
 
-        # ✅ Use a stable, recommended model (not default)
-        classifier = pipeline(
-            "sentiment-analysis",
-            model="distilbert/distilbert-base-uncased-finetuned-sst-2-english",
-            device=-1
+    def report_cache(self, stats):
+        self.stdout.write(
+            f"🗃️ Sentence cache: {stats['hit_rate']:.1%} hit rate "
+            f"({stats['memory_hits']} memory + {stats['disk_hits']} disk hits, {stats['misses']} misses)"
         )
 
-        reviews = Review.objects.all()
-        updated_count = 0
+    # -----------------------------
+    # Single process
+    # -----------------------------
+    def analyze_in_process(self, reviews, options):
+        # ✅ Shared DistilBERT SST-2 pipeline, loaded once per process
+        classifier = get_model("sentiment")
+
+        def report(review, avg_score, median_score):
+            print(
+                f"📄 {review.reviewer[:20]}... | "
+                f"Sentiment: {review.sentiment.upper()} | "
+                f"Avg: {avg_score:.2f}, Median: {median_score:.2f}"
+            )
+
+        # ✅ Sentences of many reviews share each classifier batch; per review the
+        # median decides, with a majority vote as fallback, and the score is the mean
+        cache = None if options['no_cache'] else get_sentiment_cache()
+        updated_count = analyze_reviews(
+            reviews, classifier,
+            batch_size=options['batch_size'], chunk_size=options['chunk_size'],
+            on_review=report, cache=cache,
+        )
+        if cache is not None:
+            self.report_cache(cache.stats())
+        return updated_count
 
-        for review in reviews:
-            if not review.text:
-                continue
+    # -----------------------------
+    # Worker processes
+    # -----------------------------
+    def analyze_sharded(self, reviews, options):
+        shards = id_shards(reviews, options['workers'])
+        if not shards:
+            return 0
+        threads = options['threads'] or max((os.cpu_count() or 1) // len(shards), 1)
+        total = reviews.count()
+        self.stdout.write(f"🧵 {len(shards)} workers x {threads} threads over {total} reviews")
 
-            # Split into sentences
-            sentences = sent_tokenize(review.text)
-            if not sentences:
-                continue
+        if backend_for("sentiment") == "onnx-int8":
+            # export once here instead of in every worker at the same time
+            from core.onnx_backend import ensure_exported
+            ensure_exported(MODEL_SPECS["sentiment"][1], settings.ONNX_MODEL_DIR)
 
-            results = classifier(sentences, truncation=True)
+        worker_options = {k: options[k] for k in ("batch_size", "chunk_size", "no_cache", "only_stale")}
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue(maxsize=4 * len(shards))
+        workers = [
+            ctx.Process(target=analyze_shard, args=(i, first, last, threads, worker_options, results), daemon=True)
+            for i, (first, last) in enumerate(shards)
+        ]
+        for worker in workers:
+            worker.start()
 
-            weighted_scores = []
-            sentiments = []
+        updated = 0
+        pending = []
+        finished = {}
+        cache_stats = []
+        start = last_report = time.perf_counter()
+        try:
+            while len(finished) < len(workers):
+                try:
+                    kind, shard, payload = results.get(timeout=1.0)
+                except queue.Empty:
+                    dead = [i for i, w in enumerate(workers) if i not in finished and w.exitcode is not None]
+                    if dead:
+                        raise CommandError(f"Worker {dead[0]} exited with code {workers[dead[0]].exitcode}")
+                    continue
 
-            for r in results:
-                score = r["score"]
-                if r["label"] == "POSITIVE":
-                    sentiments.append(1)
-                    weighted_scores.append(score)
+                if kind == "error":
+                    raise CommandError(f"Worker {shard} failed:\n{payload}")
+                if kind == "done":
+                    finished[shard] = True
+                    if payload:
+                        cache_stats.append(payload)
                 else:
-                    sentiments.append(0)
-                    weighted_scores.append(1 - score)
+                    pending.extend(payload)
+                    if len(pending) >= WRITE_BATCH:
+                        updated += save_sentiments(pending)
+                        pending = []
 
-            # ✅ Use median for robustness against extreme sentences
-            avg_score = statistics.mean(weighted_scores)
-            median_score = statistics.median(weighted_scores)
+                now = time.perf_counter()
+                if now - last_report >= REPORT_EVERY:
+                    done = updated + len(pending)
+                    self.stdout.write(f"📈 {done}/{total} reviews, {done / (now - start):.0f} reviews/s")
+                    last_report = now
+            updated += save_sentiments(pending)
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
 
-            # ✅ Final sentiment decision based on both average + majority vote
-            majority_vote = "positive" if sum(sentiments) >= len(sentiments) / 2 else "negative"
-            final_sentiment = "positive" if median_score >= 0.5 else majority_vote
+        if cache_stats:
+            merged = {key: sum(s[key] for s in cache_stats) for key in ("memory_hits", "disk_hits", "misses")}
+            lookups = sum(merged.values())
+            merged["hit_rate"] = (merged["memory_hits"] + merged["disk_hits"]) / lookups if lookups else 0.0
+            self.report_cache(merged)
+        return updated
 
-            review.sentiment = final_sentiment
-            review.sentiment_score = round(avg_score, 3)
-            review.save(update_fields=["sentiment", "sentiment_score"])
+    def handle(self, *args, **options):
+        self.stdout.write("🔍 Starting sentiment analysis...")
+        reviews = Review.objects.exclude(text="")
+        if options['only_stale']:
+            reviews = stale_reviews(reviews)
+            self.stdout.write(f"🔁 {reviews.count()} reviews are new or stale")
 
-            print(
-                f"📄 {review.reviewer[:20]}... | "
-                f"Sentiment: {final_sentiment.upper()} | "
-                f"Avg: {avg_score:.2f}, Median: {median_score:.2f}"
-            )
-            updated_count += 1
+        start = time.perf_counter()
+        if options['workers'] > 1:
+            updated_count = self.analyze_sharded(reviews, options)
+        else:
+            updated_count = self.analyze_in_process(reviews, options)
+        elapsed = max(time.perf_counter() - start, 1e-9)
 
         self.stdout.write(
-            self.style.SUCCESS(f"✅ Sentiment analysis completed for {updated_count} reviews.")
+            self.style.SUCCESS(
+                f"✅ Sentiment analysis completed for {updated_count} reviews "
+                f"in {elapsed:.1f}s ({updated_count / elapsed:.1f} reviews/s)."
+            )
         )
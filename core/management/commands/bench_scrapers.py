@@ -0,0 +1,172 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.management.bench import add_bench_arguments, timed, write_results
+from core.models import Product
+from core.scraper import amazon, flipkart
+from core.scraper.synth import scale_page
+from core.scraper.sources import SOURCES
+from core.services import get_page_cache, insert_reviews
+
+SCRAPERS = {
+    "flipkart": flipkart,
+    "amazon": amazon,
+}
+
+# Scraped dict -> Review fields
+NORMALIZERS = {name: source.review_fields for name, source in SOURCES.items()}
+
+FIXTURES_DIR = Path(flipkart.__file__).resolve().parent / "fixtures"
+STAGES = ["parse", "normalize", "insert"]
+
+
+def guess_site(name):
+    return "amazon" if "amazon" in name.lower() else "flipkart"
+
+
+class Command(BaseCommand):
+    help = "Benchmark scraper parse, normalize and DB insert stages over recorded review pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='HTML files or directories (default: the recorded fixtures)')
+        parser.add_argument('--from-cache', action='store_true',
+                            help='Benchmark every page in the on-disk page cache instead')
+        parser.add_argument('--record', action='store_true',
+                            help='Copy the page cache into the fixtures directory and exit')
+        parser.add_argument('--site', choices=sorted(SCRAPERS), default=None,
+                            help='Which scraper the pages belong to (default: guessed from file name / URL)')
+        parser.add_argument('--parser', action='append', dest='parsers', default=None,
+                            help='Parser backend to time (repeatable, default: all)')
+        parser.add_argument('--stage', action='append', dest='stages', choices=STAGES, default=None,
+                            help='Stage to time (repeatable, default: all)')
+        parser.add_argument('--scale', type=int, default=1,
+                            help='Repeat each page\'s review blocks this many times (synthetic pages)')
+        add_bench_arguments(parser)
+
+    # -----------------------------
+    # Inputs
+    # -----------------------------
+    def cached_pages(self, site):
+        cache = get_page_cache(replay=True)
+        if cache is None:
+            raise CommandError("SCRAPER_CACHE_DIR is not set")
+        for entry in cache.iter_entries():
+            if entry["status"] == 200:
+                yield entry, site or guess_site(entry["url"]), cache.response(entry).content
+
+    def record(self, site):
+        FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+        recorded = 0
+        for entry, page_site, content in self.cached_pages(site):
+            (FIXTURES_DIR / f"{page_site}_{entry['sha256'][:12]}.html").write_bytes(content)
+            recorded += 1
+        self.stdout.write(self.style.SUCCESS(f"✅ Recorded {recorded} pages into {FIXTURES_DIR}"))
+
+    def load_pages(self, options):
+        site = options['site']
+        if options['from_cache']:
+            return [(page_site, content) for _, page_site, content in self.cached_pages(site)]
+
+        pages = []
+        for path in map(Path, options['paths'] or [FIXTURES_DIR]):
+            files = sorted(path.glob("*.html")) if path.is_dir() else [path]
+            for f in files:
+                pages.append((site or guess_site(f.name), f.read_bytes()))
+        return pages
+
+    # -----------------------------
+    # Stages
+    # -----------------------------
+    def bench_parse(self, site, pages, backend, expected, repeat):
+        parse = SCRAPERS[site].PARSERS[backend]
+        parsed, seconds = timed(lambda: [parse(content) for content in pages], repeat)
+        reviews = sum(len(p) for p in parsed)
+        return {
+            "site": site, "stage": "parse", "backend": backend,
+            "pages": len(pages), "reviews": reviews,
+            "bytes": sum(len(c) for c in pages), "seconds": seconds,
+            "pages_per_s": len(pages) / seconds, "reviews_per_s": reviews / seconds,
+            "parity_mismatches": sum(p != e for p, e in zip(parsed, expected)),
+        }
+
+    def bench_normalize(self, site, reviews, repeat):
+        normalize = NORMALIZERS[site]
+        rows, seconds = timed(lambda: [normalize(r) for r in reviews], repeat)
+        return rows, {
+            "site": site, "stage": "normalize", "backend": None,
+            "reviews": len(rows), "seconds": seconds, "reviews_per_s": len(rows) / seconds,
+        }
+
+    def bench_insert(self, site, rows, repeat):
+        def insert():
+            # always rolled back, the benchmark never leaves rows behind
+            with transaction.atomic():
+                product = Product.objects.create(name="bench", pid=None)
+                insert_reviews(product, rows)
+                transaction.set_rollback(True)
+
+        _, seconds = timed(insert, repeat)
+        return {
+            "site": site, "stage": "insert", "backend": None,
+            "reviews": len(rows), "seconds": seconds, "reviews_per_s": len(rows) / seconds,
+        }
+
+    def report(self, result):
+        line = f"{result['site']:>8} {result['stage']:>9} {result['backend'] or '-':>5}: "
+        if result["stage"] == "parse":
+            line += (f"{result['pages_per_s']:9.1f} pages/s  {result['reviews_per_s']:10.1f} reviews/s  "
+                     f"{result['bytes'] / result['seconds'] / 1e6:6.1f} MB/s  "
+                     f"parity mismatches: {result['parity_mismatches']}")
+        else:
+            line += f"{result['reviews_per_s']:10.1f} reviews/s ({result['reviews']} reviews)"
+        self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        if options['record']:
+            self.record(options['site'])
+            return
+
+        pages = self.load_pages(options)
+        if not pages:
+            raise CommandError("No pages to benchmark")
+
+        by_site = {}
+        try:
+            for site, content in pages:
+                by_site.setdefault(site, []).append(scale_page(content, site, options['scale']))
+        except ImportError as e:
+            raise CommandError(f"{e}, install it or run without --scale")
+
+        stages = options['stages'] or STAGES
+        repeat = max(options['repeat'], 1)
+        results = []
+        total_bytes = sum(len(c) for contents in by_site.values() for c in contents)
+        self.stdout.write(f"Benchmarking {len(pages)} pages ({total_bytes / 1e6:.1f} MB, scale x{options['scale']})...")
+
+        for site, contents in by_site.items():
+            scraper = SCRAPERS[site]
+            # bs4 output is the reference for parity and the input of later stages
+            expected = [scraper.PARSERS["bs4"](content) for content in contents]
+            reviews = [r for page in expected for r in page]
+
+            if "parse" in stages:
+                for backend in options['parsers'] or sorted(scraper.PARSERS):
+                    results.append(self.bench_parse(site, contents, backend, expected, repeat))
+                    self.report(results[-1])
+
+            if site not in NORMALIZERS or not ({"normalize", "insert"} & set(stages)):
+                continue
+            rows, result = self.bench_normalize(site, reviews, repeat)
+            if "normalize" in stages:
+                results.append(result)
+                self.report(result)
+            if "insert" in stages:
+                results.append(self.bench_insert(site, rows, repeat))
+                self.report(results[-1])
+
+        write_results(self, options, results, scale=options['scale'])
+
+        self.stdout.write(self.style.SUCCESS("✅ Scraper benchmark complete"))
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.bench import add_bench_arguments, timed, write_results
+from core.models import Review
+from core.scraper.cleaner import normalize_text
+from core.segment import SEGMENTERS
+
+
+class Command(BaseCommand):
+    help = "Compare sentence segmenters against nltk Punkt: texts/s and segmentation parity on stored reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Only use the first N reviews (default: all)')
+        parser.add_argument('--file', default=None,
+                            help='Segment the lines of this text file instead of stored reviews')
+        parser.add_argument('--examples', type=int, default=5,
+                            help='Differences to print per segmenter (default: 5)')
+        add_bench_arguments(parser)
+
+    def load_texts(self, options):
+        if options['file']:
+            with open(options['file'], encoding="utf-8") as f:
+                texts = [line.strip() for line in f if line.strip()]
+        else:
+            # the text as analysis segments it: normalized, line breaks kept
+            reviews = Review.objects.exclude(text="").order_by("id").values_list("text", flat=True)
+            texts = [normalize_text(text, keep_lines=True) for text in reviews]
+        return texts[:options['limit']] if options['limit'] else texts
+
+    def handle(self, *args, **options):
+        texts = self.load_texts(options)
+        if not texts:
+            raise CommandError("No texts to segment")
+        self.stdout.write(f"Segmenting {len(texts)} texts...")
+
+        outputs = {}
+        results = []
+        for name, segmenter in SEGMENTERS.items():
+            try:
+                (sentences, counts), best = timed(lambda: segmenter.segment_many(texts), options['repeat'])
+            except LookupError:  # nltk data files missing
+                raise CommandError(f"{name} segmenter needs nltk data, run `python -m nltk.downloader punkt_tab`")
+
+            # back to one sentence list per text, for the parity check
+            per_text, offset = [], 0
+            for count in counts:
+                per_text.append(sentences[offset:offset + count])
+                offset += count
+            outputs[name] = per_text
+            results.append({
+                "segmenter": name, "texts": len(texts), "sentences": len(sentences),
+                "seconds": best, "texts_per_s": len(texts) / best,
+            })
+
+        reference = outputs["punkt"]
+        for result in results:
+            per_text = outputs[result["segmenter"]]
+            same = sum(a == b for a, b in zip(per_text, reference))
+            result["identical_texts"] = same / len(texts)
+            result["speedup_vs_punkt"] = result["texts_per_s"] / next(
+                r["texts_per_s"] for r in results if r["segmenter"] == "punkt"
+            )
+            self.stdout.write(
+                f"{result['segmenter']:>6}: {result['texts_per_s']:10.1f} texts/s "
+                f"(x{result['speedup_vs_punkt']:.2f} vs punkt)  {result['sentences']} sentences  "
+                f"identical to punkt on {result['identical_texts']:.1%} of texts"
+            )
+            if result["segmenter"] == "punkt":
+                continue
+            shown = 0
+            for text, a, b in zip(texts, per_text, reference):
+                if a != b and shown < options['examples']:
+                    self.stdout.write(f"  {result['segmenter']}: {a}\n  punkt: {b}")
+                    shown += 1
+
+        write_results(self, options, results)
+
+        self.stdout.write(self.style.SUCCESS("✅ Segmenter benchmark complete"))
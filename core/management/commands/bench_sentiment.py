@@ -0,0 +1,89 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.bench import add_bench_arguments, timed, write_results
+from core.ml import BACKENDS, load_pipeline, model_id
+from core.models import Review
+from core.sentiment import split_sentences
+
+CORPUS = Path(__file__).resolve().parents[2] / "fixtures" / "sentiment_corpus.txt"
+
+
+class Command(BaseCommand):
+    help = "Compare sentiment backends: label agreement with torch and sentences/s on a fixture corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', default=str(CORPUS),
+                            help='Text file with one sentence per line (default: the fixture corpus)')
+        parser.add_argument('--from-db', type=int, default=None, metavar='N',
+                            help='Use the sentences of the first N stored reviews instead')
+        parser.add_argument('--backend', action='append', dest='backends', choices=BACKENDS, default=None,
+                            help='Backend to compare against torch (repeatable, default: all)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Max sentences per inference batch (default: SENTIMENT_BATCH_SIZE)')
+        parser.add_argument('--min-agreement', type=float, default=0.98,
+                            help='Fail if a backend agrees with torch on fewer labels (default: 0.98)')
+        add_bench_arguments(parser)
+
+    def load_sentences(self, options):
+        if options['from_db']:
+            texts = Review.objects.exclude(text="").order_by("id").values_list("text", flat=True)[:options['from_db']]
+            return [s for text in texts for s in split_sentences(text)]
+        with open(options['corpus'], encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def run(self, classifier, sentences, batch_size, repeat):
+        classifier(sentences[:64], batch_size=batch_size, truncation=True)  # warm up
+        return timed(lambda: classifier(sentences, batch_size=batch_size, truncation=True), repeat)
+
+    def handle(self, *args, **options):
+        options['batch_size'] = options['batch_size'] or settings.SENTIMENT_BATCH_SIZE
+        sentences = self.load_sentences(options)
+        if not sentences:
+            raise CommandError("No sentences to benchmark")
+        backends = ["torch"] + [b for b in options['backends'] or BACKENDS if b != "torch"]
+        self.stdout.write(f"Benchmarking {len(backends)} backends on {len(sentences)} sentences...")
+
+        reference = None
+        results = []
+        for backend in backends:
+            start = time.perf_counter()
+            classifier = load_pipeline("sentiment", backend=backend)
+            load_seconds = time.perf_counter() - start
+            labels, seconds = self.run(classifier, sentences, options['batch_size'], options['repeat'])
+            if reference is None:
+                reference = labels
+
+            mismatches = [i for i, (a, b) in enumerate(zip(labels, reference)) if a["label"] != b["label"]]
+            result = {
+                "backend": backend,
+                "model": model_id("sentiment", backend),
+                "sentences": len(sentences),
+                "load_seconds": load_seconds,
+                "seconds": seconds,
+                "sentences_per_s": len(sentences) / seconds,
+                "agreement": 1 - len(mismatches) / len(sentences),
+                "max_score_diff": max(
+                    abs((a["score"] if a["label"] == "POSITIVE" else 1 - a["score"])
+                        - (b["score"] if b["label"] == "POSITIVE" else 1 - b["score"]))
+                    for a, b in zip(labels, reference)
+                ),
+            }
+            results.append(result)
+            self.stdout.write(
+                f"{backend:>10}: {result['sentences_per_s']:9.1f} sentences/s "
+                f"(x{result['sentences_per_s'] / results[0]['sentences_per_s']:.2f})  "
+                f"agreement {result['agreement']:.2%}  max |Δp| {result['max_score_diff']:.3f}"
+            )
+            for i in mismatches[:5]:
+                self.stdout.write(f"    {labels[i]['label']} vs torch {reference[i]['label']}: {sentences[i][:80]}")
+
+        write_results(self, options, results, batch_size=options['batch_size'])
+
+        failing = [r["backend"] for r in results if r["agreement"] < options['min_agreement']]
+        if failing:
+            raise CommandError(f"Agreement with torch below {options['min_agreement']:.0%} for: {', '.join(failing)}")
+        self.stdout.write(self.style.SUCCESS("✅ Sentiment backend benchmark complete"))
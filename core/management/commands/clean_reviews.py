@@ -1,25 +1,49 @@
 from django.core.management.base import BaseCommand
+from core.fingerprint import review_fingerprint
 from core.models import Review
+from core.scraper.cleaner import normalize_text, text_features
 from datetime import datetime
 import re
 
+BATCH_SIZE = 1000
+UPDATE_FIELDS = [
+    "text", "normalized_text", "text_length", "word_count", "content_hash",
+    "title", "reviewer", "review_date", "fingerprint",
+]
+
 class Command(BaseCommand):
     help = "Lightweight clean and normalize review data."
 
     def handle(self, *args, **kwargs):
         reviews = Review.objects.all().order_by("id")
+        # A fingerprint identifies the review as the marketplace shows it, so it
+        # is taken from the values before cleaning: a fingerprint of the cleaned
+        # values would never match the next scrape, which would then store the
+        # review again. Rows that have none get one here (unless it is taken).
+        fingerprints = set(Review.objects.exclude(fingerprint=None).values_list("fingerprint", flat=True))
         cleaned_count = 0
         skipped_count = 0
+        batch = []
 
-        for review in reviews:
-            # Skip really empty reviews
-            if not review.text or len(review.text.strip()) < 5:
+        for review in reviews.iterator(chunk_size=BATCH_SIZE):
+            # Skip really empty reviews (length precomputed at ingest)
+            if review.text_length < 5:
                 skipped_count += 1
                 continue
 
-            # Normalize review text
-            review.text = re.sub(r"\s+", " ", review.text.strip())
-            review.text = re.sub(r"[^\x00-\x7F]+", "", review.text)
+            if review.fingerprint is None:
+                fingerprint = review_fingerprint(
+                    review.product_id, review.reviewer, review.title, review.text, review.review_date,
+                )
+                if fingerprint not in fingerprints:
+                    fingerprints.add(fingerprint)
+                    review.fingerprint = fingerprint
+
+            # Normalize review text: strip tags and extra whitespace (keeping
+            # line breaks, the segmenter splits on them) and drop non-ASCII
+            review.text = re.sub(r"[^\x00-\x7F]+", "", normalize_text(review.text, keep_lines=True))
+            for name, value in text_features(review.text).items():
+                setattr(review, name, value)
 
             # Normalize title
             if review.title:
@@ -47,8 +71,13 @@ class Command(BaseCommand):
                 except ValueError:
                     pass  # keep original if parsing fails
 
-            review.save()
+            batch.append(review)
             cleaned_count += 1
+            if len(batch) >= BATCH_SIZE:
+                Review.objects.bulk_update(batch, UPDATE_FIELDS)
+                batch = []
+
+        Review.objects.bulk_update(batch, UPDATE_FIELDS)
 
         self.stdout.write(self.style.SUCCESS(
             f"✅ Cleaned {cleaned_count} reviews, skipped {skipped_count} invalid/empty ones."
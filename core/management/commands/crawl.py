@@ -0,0 +1,207 @@
+import csv
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from core.models import CrawlTask, Product
+from core.scraper.sources import DEFAULT_SOURCE, SOURCES
+from core.scraper.http import fetch, make_session
+from core.scraper.throttle import CircuitOpenError
+from core.services import (
+    advance_high_water_mark, get_page_cache, get_refresh_page_cache, save_review_page, scraped_review_fingerprint, source_for,
+)
+
+MAX_ATTEMPTS = 3
+REPORT_EVERY = 5.0  # seconds
+
+
+def fetch_page(session, url, cache):
+    resp = fetch(session, url, cache)
+    return resp.status_code, resp.content
+
+
+class Command(BaseCommand):
+    help = "Crawl reviews for many products from a persistent (product, page) frontier"
+
+    def add_arguments(self, parser):
+        parser.add_argument('pid_file', nargs='?',
+                            help='File with one "PID[,name]" per line (not needed with --resume)')
+        parser.add_argument('--source', choices=sorted(SOURCES), default=DEFAULT_SOURCE,
+                            help='Marketplace the PIDs in the file belong to (default: %(default)s)')
+        parser.add_argument('--max-pages', type=int, default=10,
+                            help='Review pages per product (default: 10)')
+        parser.add_argument('--concurrency', type=int, default=settings.SCRAPER_CONCURRENCY,
+                            help='Pages fetched in parallel')
+        parser.add_argument('--parse-workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes parsing HTML (default: CPU count, 0 = parse in a thread)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue the existing frontier instead of seeding a new crawl')
+        parser.add_argument('--replay', action='store_true',
+                            help='Serve pages only from the on-disk page cache (offline)')
+
+    # -----------------------------
+    # Frontier
+    # -----------------------------
+    def seed(self, pid_file, source, max_pages):
+        seeded = 0
+        with open(pid_file, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if not row or not row[0].strip() or row[0].startswith("#"):
+                    continue
+                pid = row[0].strip()
+                name = row[1].strip() if len(row) > 1 and row[1].strip() else pid
+
+                product, _ = Product.objects.get_or_create(pid=pid, source=source, defaults={"name": name})
+                # Known products are walked page by page from the newest review until
+                # the high-water mark; new ones get every page queued up front.
+                pages = [1] if product.hwm_fingerprints else range(1, max_pages + 1)
+                CrawlTask.objects.filter(product=product).delete()
+                CrawlTask.objects.bulk_create([CrawlTask(product=product, page=p) for p in pages])
+                seeded += 1
+        return seeded
+
+    def claim(self, n):
+        tasks = list(
+            CrawlTask.objects.filter(status=CrawlTask.PENDING)
+            .select_related("product")
+            .order_by("page", "id")[:n]
+        )
+        CrawlTask.objects.filter(id__in=[t.id for t in tasks]).update(status=CrawlTask.FETCHING)
+        return tasks
+
+    def finish(self, task, status, reviews_saved=0):
+        CrawlTask.objects.filter(id=task.id).update(status=status, reviews_saved=reviews_saved)
+
+    def retry_later(self, task, reason):
+        task.attempts += 1
+        status = CrawlTask.PENDING if task.attempts < MAX_ATTEMPTS else CrawlTask.FAILED
+        CrawlTask.objects.filter(id=task.id).update(status=status, attempts=F("attempts") + 1)
+        self.stdout.write(self.style.WARNING(f"⚠️ {task}: {reason}"))
+
+    def close_product(self, task):
+        """No more reviews after `task`: drop the pages queued behind it."""
+        CrawlTask.objects.filter(
+            product=task.product, page__gt=task.page, status=CrawlTask.PENDING,
+        ).update(status=CrawlTask.SKIPPED)
+
+    # -----------------------------
+    # Storing parsed pages
+    # -----------------------------
+    def store(self, task, page_reviews, known, max_pages):
+        product = task.product
+        seen = known.setdefault(product.id, set(product.hwm_fingerprints or []))
+
+        rows = [source_for(product).review_fields(r) for r in page_reviews]
+        new_reviews = rows
+        for i, fields in enumerate(rows):
+            if scraped_review_fingerprint(product, fields) in seen:
+                new_reviews = rows[:i]
+                break
+
+        saved = save_review_page(product, new_reviews)
+        self.finish(task, CrawlTask.DONE, len(saved))
+        if task.page == 1:
+            advance_high_water_mark(product, new_reviews)
+
+        if not rows or len(new_reviews) < len(rows):
+            self.close_product(task)
+        elif task.page < max_pages:
+            CrawlTask.objects.get_or_create(product=product, page=task.page + 1)
+        return len(saved)
+
+    # -----------------------------
+    # Main loop
+    # -----------------------------
+    def handle(self, *args, **options):
+        max_pages = options['max_pages']
+        concurrency = max(options['concurrency'], 1)
+
+        if options['resume']:
+            CrawlTask.objects.filter(status=CrawlTask.FETCHING).update(status=CrawlTask.PENDING)
+        elif options['pid_file']:
+            seeded = self.seed(options['pid_file'], options['source'], max_pages)
+            self.stdout.write(f"🌱 Seeded frontier for {seeded} products")
+        else:
+            raise CommandError("Give a PID file, or --resume to continue the last crawl")
+
+        cache = get_page_cache(replay=options['replay'] or None)
+        refresh_cache = get_refresh_page_cache(replay=options['replay'] or None)
+        sessions = {name: make_session(pool_size=concurrency, headers=s.headers) for name, s in SOURCES.items()}
+        parse_workers = options['parse_workers']
+        parse_pool = ProcessPoolExecutor(parse_workers) if parse_workers > 0 else ThreadPoolExecutor(1)
+
+        known = {}
+        fetching = {}
+        parsing = {}
+        pages = reviews = 0
+        circuit_open = False
+        start = last_report = time.perf_counter()
+
+        with ThreadPoolExecutor(concurrency) as fetch_pool, parse_pool:
+            while True:
+                if not circuit_open and len(fetching) < concurrency:
+                    for task in self.claim(concurrency - len(fetching)):
+                        source = source_for(task.product)
+                        url = source.page_url(task.product.pid, task.page, sort=source.newest_first)
+                        # known products are re-crawled for their new reviews: revalidate
+                        page_cache = refresh_cache if task.product.hwm_fingerprints else cache
+                        fetching[fetch_pool.submit(fetch_page, sessions[source.name], url, page_cache)] = task
+
+                if not fetching and not parsing:
+                    break
+
+                done, _ = wait(list(fetching) + list(parsing), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in fetching:
+                        task = fetching.pop(future)
+                        try:
+                            status, content = future.result()
+                        except CircuitOpenError as e:
+                            circuit_open = True
+                            CrawlTask.objects.filter(id=task.id).update(status=CrawlTask.PENDING)
+                            self.stdout.write(self.style.WARNING(f"⚠️ {e}"))
+                            continue
+                        except requests.RequestException as e:
+                            self.retry_later(task, e)
+                            continue
+                        if status != 200:
+                            self.retry_later(task, f"status {status}")
+                            continue
+                        parsing[parse_pool.submit(source_for(task.product).parse, content)] = task
+                    else:
+                        task = parsing.pop(future)
+                        try:
+                            page_reviews = future.result()
+                        except Exception as e:
+                            self.retry_later(task, f"parse error: {e}")
+                            continue
+                        reviews += self.store(task, page_reviews, known, max_pages)
+                        pages += 1
+
+                now = time.perf_counter()
+                if now - last_report >= REPORT_EVERY:
+                    elapsed = now - start
+                    self.stdout.write(
+                        f"📈 {pages} pages, {reviews} reviews — "
+                        f"{pages / elapsed:.1f} pages/s, {reviews / elapsed:.1f} reviews/s"
+                    )
+                    last_report = now
+
+        for session in sessions.values():
+            session.close()
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        summary = (
+            f"{pages} pages, {reviews} reviews in {elapsed:.1f}s — "
+            f"{pages / elapsed:.1f} pages/s, {reviews / elapsed:.1f} reviews/s"
+        )
+        if circuit_open:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Stopped early, host circuit is open. Run again with --resume later. {summary}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ Crawl complete: {summary}"))
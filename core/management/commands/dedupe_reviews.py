@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from core.fingerprint import review_fingerprint
+from core.models import Review
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Backfill review fingerprints and delete duplicate reviews (keeps one row per fingerprint)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Recompute every fingerprint, not only missing ones (after a change to core.fingerprint; '
+                                 'not after clean_reviews, re-scrapes would no longer match the cleaned reviews)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report what would be changed')
+
+    def handle(self, *args, **options):
+        missing = Review.objects.all() if options['all'] else Review.objects.filter(fingerprint__isnull=True)
+        # rows that already have a fingerprint win, then analyzed rows, then the oldest
+        keep = {} if options['all'] else dict(
+            Review.objects.filter(fingerprint__isnull=False).values_list("fingerprint", "id")
+        )
+
+        updates = []
+        duplicates = []
+        rows = (
+            missing.order_by(F("sentiment").asc(nulls_last=True), "id")
+            .values_list("id", "product_id", "reviewer", "title", "text", "review_date")
+            .iterator(chunk_size=BATCH_SIZE)
+        )
+        for pk, product_id, reviewer, title, text, review_date in rows:
+            fingerprint = review_fingerprint(product_id, reviewer, title, text, review_date)
+            if fingerprint in keep:
+                duplicates.append(pk)
+            else:
+                keep[fingerprint] = pk
+                updates.append(Review(id=pk, fingerprint=fingerprint))
+
+        self.stdout.write(f"[DEBUG] {len(updates)} fingerprints to store, {len(duplicates)} duplicate reviews")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Dry run, nothing changed"))
+            return
+
+        with transaction.atomic():
+            for i in range(0, len(duplicates), BATCH_SIZE):
+                Review.objects.filter(id__in=duplicates[i:i + BATCH_SIZE]).delete()
+            if options['all']:
+                # clear first so recomputed values can't collide with stale ones
+                Review.objects.update(fingerprint=None)
+            Review.objects.bulk_update(updates, ["fingerprint"], batch_size=BATCH_SIZE)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Fingerprinted {len(updates)} reviews, deleted {len(duplicates)} duplicates"
+        ))
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from core.batching import zero_shot_scores
 from core.models import Review
-from transformers import pipeline
+from core.ml import get_model, windowing
 import re
 from collections import defaultdict, Counter
 
@@ -20,6 +22,7 @@ class Command(BaseCommand):
             "general dissatisfaction"
         ]
         self.max_issues_per_review = 5
+        self.chunk_size = 64  # reviews whose label pairs share token-budget batches
 
     # -----------------------------
     # Load classifier
@@ -27,7 +30,7 @@ class Command(BaseCommand):
     def load_classifier(self):
         self.stdout.write("🔄 Loading zero-shot classifier...")
         try:
-            self.classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+            self.classifier = get_model("zero-shot")
             self.stdout.write("✅ Classifier loaded successfully")
             return True
         except Exception as e:
@@ -66,12 +69,19 @@ class Command(BaseCommand):
     # -----------------------------
     # Main analysis
     # -----------------------------
-    def analyze_review(self, review):
+    def classify(self, texts):
+        """Multi-label scores, shape (len(texts), len(self.issue_labels))."""
+        return zero_shot_scores(self.classifier, texts, self.issue_labels, settings.INFERENCE_TOKEN_BUDGET, **windowing())
+
+    def analyze_review(self, review, scores=None):
         text = review.text
         if not text:
             return []
 
-        results = self.classifier(text, self.issue_labels, multi_label=True)
+        if scores is None:
+            scores = self.classify([text])[0]
+        # strongest labels first, like the pipeline output
+        results = sorted(zip(self.issue_labels, scores.tolist()), key=lambda pair: pair[1], reverse=True)
         intensity = self.get_language_intensity(text)
         issues = []
 
@@ -85,7 +95,7 @@ class Command(BaseCommand):
             "general dissatisfaction": 2,
         }
 
-        for label, score in zip(results["labels"], results["scores"]):
+        for label, score in results:
             if score > 0.4:
                 severity = min(severity_base.get(label, 1) * score * intensity, 10)
                 evidence = self.extract_evidence_sentences(text, label)
@@ -105,15 +115,19 @@ class Command(BaseCommand):
 
     def analyze_reviews(self, reviews):
         all_issues = defaultdict(list)
-        for idx, review in enumerate(reviews, 1):
-            issues = self.analyze_review(review)
-            if issues:
-                for issue in issues:
-                    all_issues[issue["issue"]].append(issue)
-                review.is_critical = True
-                review.save(update_fields=["is_critical"])
-            if idx % 10 == 0:
-                self.stdout.write(f"Processed {idx} reviews...")
+        reviews = list(reviews)
+        for start in range(0, len(reviews), self.chunk_size):
+            chunk = [r for r in reviews[start:start + self.chunk_size] if r.text]
+            critical_ids = []
+            for review, scores in zip(chunk, self.classify([r.text for r in chunk])):
+                issues = self.analyze_review(review, scores)
+                if issues:
+                    for issue in issues:
+                        all_issues[issue["issue"]].append(issue)
+                    review.is_critical = True
+                    critical_ids.append(review.id)
+            Review.objects.filter(id__in=critical_ids).update(is_critical=True)
+            self.stdout.write(f"Processed {min(start + self.chunk_size, len(reviews))} reviews...")
         return all_issues
 
     # -----------------------------
@@ -0,0 +1,213 @@
+import csv
+import gzip
+import itertools
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Product
+from core.scraper.sources import DEFAULT_SOURCE, SOURCES
+from core.services import REVIEW_FIELDS, review_upsert_values, upsert_review_values
+
+# Column names that map onto Review fields without --map
+COLUMN_ALIASES = {
+    "reviewer_name": "reviewer",
+    "author": "reviewer",
+    "review_text": "text",
+    "body": "text",
+    "stars": "rating",
+    "date": "review_date",
+}
+
+REPORT_EVERY = 5.0  # seconds
+
+
+def open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def detect_format(path):
+    """csv or jsonl from the extension, looking past a trailing .gz."""
+    name = Path(path)
+    if name.suffix.lower() == ".gz":
+        name = name.with_suffix("")
+    return "csv" if name.suffix.lower() == ".csv" else "jsonl"
+
+
+def read_rows(f, fmt):
+    if fmt == "csv":
+        yield from csv.DictReader(f)
+    else:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield {}  # counted as invalid, like a row without PID
+
+
+class Command(BaseCommand):
+    help = "Stream reviews from a CSV or JSONL file (optionally .gz) into the DB in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='CSV or JSONL file with one review per row')
+        parser.add_argument('--format', choices=["csv", "jsonl"], default=None,
+                            help='File format (default: from the file extension)')
+        parser.add_argument('--map', action='append', default=[], metavar='COLUMN=FIELD',
+                            help='Map a column onto a Review field (repeatable), e.g. --map stars=rating')
+        parser.add_argument('--pid-column', default='pid',
+                            help='Column with the product PID (default: pid)')
+        parser.add_argument('--name-column', default='product_name',
+                            help='Column with the product name, used for new products (default: product_name)')
+        parser.add_argument('--pid', default=None,
+                            help='Import every row for this PID instead of reading a PID column')
+        parser.add_argument('--source', choices=sorted(SOURCES), default=DEFAULT_SOURCE,
+                            help='Marketplace of the PIDs (default: %(default)s)')
+        parser.add_argument('--batch-size', type=int, default=20000,
+                            help='Rows per transaction (default: 20000)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip the rows a previous, interrupted import already committed')
+
+    # -----------------------------
+    # Setup
+    # -----------------------------
+    def column_map(self, maps):
+        mapping = dict(COLUMN_ALIASES)
+        mapping.update({field: field for field in REVIEW_FIELDS})
+        for item in maps:
+            column, sep, field = item.partition("=")
+            if not sep or field not in REVIEW_FIELDS:
+                raise CommandError(f"Bad --map {item!r}, expected COLUMN=FIELD with FIELD one of {REVIEW_FIELDS}")
+            mapping[column] = field
+        return mapping
+
+    @contextmanager
+    def tuned_sqlite(self):
+        """
+        WAL + NORMAL sync for the import: one fsync per checkpoint instead of
+        per commit. journal_mode is stored in the database file, so it and
+        the connection's own settings are put back afterwards.
+        """
+        if connection.vendor != "sqlite" or connection.in_atomic_block:
+            yield
+            return
+        pragmas = ["journal_mode", "synchronous", "cache_size"]
+        with connection.cursor() as cursor:
+            saved = {}
+            for pragma in pragmas:
+                cursor.execute(f"PRAGMA {pragma}")
+                saved[pragma] = cursor.fetchone()[0]
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA cache_size=-65536")
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                for pragma in pragmas:
+                    cursor.execute(f"PRAGMA {pragma}={saved[pragma]}")
+
+    # -----------------------------
+    # Checkpoint
+    # -----------------------------
+    def checkpoint_path(self, path):
+        return f"{path}.import-checkpoint"
+
+    def read_checkpoint(self, path):
+        try:
+            with open(self.checkpoint_path(path), encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return 0
+        if checkpoint.get("size") != os.path.getsize(path):
+            raise CommandError(f"{path} changed since the interrupted import, can't resume")
+        return checkpoint["rows"]
+
+    def write_checkpoint(self, path, rows):
+        tmp = self.checkpoint_path(path) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows, "size": os.path.getsize(path)}, f)
+        os.replace(tmp, self.checkpoint_path(path))
+
+    # -----------------------------
+    # Import
+    # -----------------------------
+    def get_product(self, pid, name, source, products):
+        product = products.get(pid)
+        if product is None:
+            product, created = Product.objects.get_or_create(
+                pid=pid, source=source, defaults={"name": name or pid},
+            )
+            if created:
+                print(f"[DEBUG] Created new Product: {product.name}")
+            products[pid] = product
+        return product
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        mapping = self.column_map(options['map'])
+        pid_column, name_column = options['pid_column'], options['name_column']
+        batch_size = max(options['batch_size'], 1)
+
+        skip = self.read_checkpoint(path) if options['resume'] else 0
+        if skip:
+            self.stdout.write(f"🔁 Resuming after row {skip}")
+
+        products = {}
+        done = skip
+        created = updated = invalid = 0
+        start = last_report = time.perf_counter()
+
+        with self.tuned_sqlite(), open_text(path) as f:
+            rows = itertools.islice(read_rows(f, fmt), skip, None)
+            while True:
+                chunk = list(itertools.islice(rows, batch_size))
+                if not chunk:
+                    break
+
+                values = []
+                for row in chunk:
+                    if not isinstance(row, dict):  # a JSONL line holding a list, string, number...
+                        invalid += 1
+                        continue
+                    pid = options['pid'] or row.get(pid_column)
+                    if not pid:
+                        invalid += 1
+                        continue
+                    product = self.get_product(str(pid), row.get(name_column), options['source'], products)
+                    row_values = review_upsert_values(product, {mapping[k]: v for k, v in row.items() if k in mapping})
+                    if row_values is None:
+                        invalid += 1
+                        continue
+                    values.append(row_values)
+
+                with transaction.atomic():
+                    batch_created, batch_updated = upsert_review_values(values, batch_size=batch_size)
+                created += batch_created
+                updated += batch_updated
+                done += len(chunk)
+                # a crash between the commit and this write only means the batch is
+                # upserted again on --resume, which the fingerprints make harmless
+                self.write_checkpoint(path, done)
+
+                now = time.perf_counter()
+                if now - last_report >= REPORT_EVERY:
+                    self.stdout.write(f"📈 {done} rows, {(done - skip) / (now - start):.0f} rows/s")
+                    last_report = now
+
+        if os.path.exists(self.checkpoint_path(path)):
+            os.remove(self.checkpoint_path(path))
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Imported {created} new and updated {updated} existing reviews from {done - skip} rows in {elapsed:.1f}s "
+            f"({(done - skip) / elapsed:.0f} rows/s, {invalid} invalid rows skipped)"
+        ))
@@ -0,0 +1,84 @@
+import signal
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.inference import BATCH_CALLS, InferenceServer, server_is_running
+from core.ml import limit_threads, registry
+
+REPORT_EVERY = 60.0  # seconds
+
+
+class Command(BaseCommand):
+    help = "Serve the models to local processes over a Unix socket, micro-batching concurrent requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None,
+                            help='Unix socket path (default: INFERENCE_SOCKET)')
+        parser.add_argument('--models', nargs='+', default=["sentiment"], choices=sorted(BATCH_CALLS),
+                            help='Models to serve (default: sentiment)')
+        parser.add_argument('--max-batch', type=int, default=None,
+                            help='Inputs per micro-batch (default: INFERENCE_SERVER_MAX_BATCH)')
+        parser.add_argument('--max-wait-ms', type=float, default=None,
+                            help='How long a request waits for others to join its batch '
+                                 '(default: INFERENCE_SERVER_MAX_WAIT)')
+        parser.add_argument('--threads', type=int, default=None,
+                            help='CPU threads for inference (default: all cores)')
+
+    def report(self, server):
+        for name, batcher in server.batchers.items():
+            stats = batcher.stats
+            self.stdout.write(
+                f"📈 {name}: {stats['requests']} requests in {stats['batches']} batches "
+                f"({stats['inputs'] / max(stats['batches'], 1):.1f} inputs/batch)"
+            )
+
+    def handle(self, *args, **options):
+        path = Path(options['socket'] or settings.INFERENCE_SOCKET or "")
+        if not path.name:
+            raise CommandError("No socket path, set INFERENCE_SOCKET or pass --socket")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if server_is_running(path):
+            raise CommandError(f"An inference server is already listening on {path}")
+        max_batch = options['max_batch'] or settings.INFERENCE_SERVER_MAX_BATCH
+        max_wait = (
+            options['max_wait_ms'] / 1000 if options['max_wait_ms'] is not None
+            else settings.INFERENCE_SERVER_MAX_WAIT
+        )
+        if options['threads']:
+            limit_threads(options['threads'])
+
+        registry.warmup(options['models'])
+        stats = registry.stats()
+        loaded = ", ".join(f"{name} in {stats['models'][name]['load_seconds']:.1f}s" for name in options['models'])
+        self.stdout.write(f"🔥 Loaded {loaded}, RSS {(stats['rss_bytes'] or 0) / 2**20:.0f} MiB")
+
+        server = InferenceServer(
+            path, {name: registry.get(name) for name in options['models']},
+            max_batch=max_batch, max_wait=max_wait,
+        )
+        # systemd / supervisor stop the server with SIGTERM
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+        self.stdout.write(
+            f"🚀 Serving {', '.join(options['models'])} on {path} "
+            f"(batches of up to {max_batch} inputs, {max_wait * 1000:.0f} ms max wait)"
+        )
+
+        reporter = threading.Thread(target=self.report_forever, args=(server,), daemon=True)
+        reporter.start()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        self.report(server)
+        self.stdout.write("Inference server stopped")
+
+    def report_forever(self, server):
+        while True:
+            time.sleep(REPORT_EVERY)
+            self.report(server)
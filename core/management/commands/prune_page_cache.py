@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import get_page_cache
+
+
+class Command(BaseCommand):
+    help = "Evict expired pages from the on-disk scraper page cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None,
+                            help='Evict entries older than this many seconds (default: SCRAPER_CACHE_TTL)')
+
+    def handle(self, *args, **options):
+        cache = get_page_cache()
+        if cache is None:
+            raise CommandError("SCRAPER_CACHE_DIR is not set")
+
+        entries, objects = cache.evict(max_age=options['max_age'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Evicted {entries} cache entries and {objects} page bodies from {settings.SCRAPER_CACHE_DIR}"
+        ))
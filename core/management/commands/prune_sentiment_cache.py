@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sentiment import get_sentiment_cache
+
+
+class Command(BaseCommand):
+    help = "Drop sentence scores of models other than the current sentiment model from the sentence cache"
+
+    def handle(self, *args, **options):
+        cache = get_sentiment_cache()
+        if cache is None:
+            raise CommandError("SENTIMENT_CACHE_PATH is not set")
+
+        removed = cache.evict_other_models()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Evicted {removed} sentence scores of other models from {settings.SENTIMENT_CACHE_PATH}"
+        ))
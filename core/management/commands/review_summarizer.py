@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from core.models import Review, Product
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+from core.scraper.cleaner import meaningful_word_count
+from core.ml import get_model
 import re
 from collections import defaultdict, Counter
 import random
@@ -34,22 +35,11 @@ class Command(BaseCommand):
         """Load summarization and text generation models"""
         self.stdout.write("🔄 Loading AI models...")
         try:
-            # Load summarization model
-            self.summarizer = pipeline(
-                "summarization", 
-                model="facebook/bart-large-cnn",
-                max_length=self.max_summary_length,
-                min_length=self.min_summary_length,
-                do_sample=True
-            )
+            # Load summarization model (shared per process, see core.ml)
+            self.summarizer = get_model("summarizer")
             
             # Load text generation model for enhancement
-            self.text_generator = pipeline(
-                "text2text-generation",
-                model="t5-small",
-                max_length=100,
-                num_return_sequences=1
-            )
+            self.text_generator = get_model("text2text")
             
             self.stdout.write("✅ Models loaded successfully")
             return True
@@ -61,9 +51,7 @@ class Command(BaseCommand):
         """Count meaningful words in text (excluding stopwords)"""
         if not text:
             return 0
-        words = word_tokenize(text.lower())
-        meaningful_words = [word for word in words if word.isalnum() and word not in self.stop_words]
-        return len(meaningful_words)
+        return meaningful_word_count(text)
 
     def extract_keywords(self, text):
         """Extract important keywords from text"""
@@ -110,7 +98,7 @@ class Command(BaseCommand):
     def enhance_short_review(self, review):
         """Enhance a short review by adding more descriptive content"""
         original_text = review.text
-        word_count = self.count_words(original_text)
+        word_count = review.word_count
         
         if word_count >= self.min_words_threshold:
             return original_text  # No enhancement needed
@@ -238,7 +226,8 @@ class Command(BaseCommand):
         processed_reviews = []
         
         for review in reviews:
-            original_word_count = self.count_words(review.text)
+            # precomputed at ingest
+            original_word_count = review.word_count
             
             if original_word_count < self.min_words_threshold:
                 enhanced_text = self.enhance_short_review(review)
@@ -367,7 +356,7 @@ class Command(BaseCommand):
                     try:
                         review = Review.objects.get(id=enhanced_review['id'])
                         review.text = enhanced_review['enhanced_text']
-                        review.save(update_fields=['text'])
+                        review.save(update_fields=['text'])  # save() refreshes the text features
                         saved_count += 1
                     except Review.DoesNotExist:
                         continue
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.ml import registry
+from core.services import claim_next_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (add-product scrapes and analysis)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=2.0,
+                            help='Seconds to wait before checking an empty queue again (default: 2)')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when the queue is empty instead of waiting for new jobs')
+        parser.add_argument('--requeue', action='store_true',
+                            help='Put jobs left running by a crashed worker back in the queue first')
+        parser.add_argument('--stale-after', type=float, default=None,
+                            help='With --requeue, only jobs started more than this many seconds ago '
+                                 '(default: JOB_STALE_AFTER)')
+        parser.add_argument('--warmup', action='store_true',
+                            help='Load and run the sentiment model before taking the first job')
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            requeued = requeue_stale_jobs(options['stale_after'])
+            self.stdout.write(f"🔁 Requeued {requeued} interrupted jobs")
+
+        if options['warmup']:
+            registry.warmup(["sentiment"])
+            stats = registry.stats()
+            self.stdout.write(
+                f"🔥 Sentiment model ready in {stats['models']['sentiment']['load_seconds']:.1f}s, "
+                f"RSS {(stats['rss_bytes'] or 0) / 2**20:.0f} MiB"
+            )
+
+        self.stdout.write("👷 Worker started, waiting for jobs...")
+        try:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                self.stdout.write(f"▶️ Running {job} for {job.product}")
+                start = time.perf_counter()
+                ok = run_job(job)
+                job.refresh_from_db()
+                elapsed = time.perf_counter() - start
+                if ok:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"✅ {job}: {job.reviews_scraped} reviews scraped, "
+                        f"{job.reviews_analyzed} analyzed in {elapsed:.1f}s"
+                    ))
+                else:
+                    self.stdout.write(self.style.ERROR(f"❌ {job}: {job.error}"))
+        except KeyboardInterrupt:
+            self.stdout.write("Worker stopped")
@@ -1,32 +1,51 @@
-from django.core.management.base import BaseCommand
-from core.models import Product, Review
-from core.scraper.amazon import scrape_amazon_reviews
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Product
+from core.scraper.amazon import asin_from_url
+from core.scraper.throttle import CircuitOpenError
+from core.services import iter_new_review_pages, save_review_page
 
 class Command(BaseCommand):
-    help = "Scrape Amazon reviews for a product"
+    help = "Scrape Amazon reviews for a product and save to DB"
 
     def add_arguments(self, parser):
-        parser.add_argument('product_url', type=str, help='Amazon product URL')
+        parser.add_argument('product', type=str, help='Amazon product URL or ASIN')
+        parser.add_argument('--name', type=str, default=None,
+                            help='Name of the product (default: the ASIN)')
+        parser.add_argument('--max-pages', type=int, default=2,
+                            help='Review pages to scrape (default: 2)')
+        parser.add_argument('--concurrency', type=int, default=settings.SCRAPER_CONCURRENCY,
+                            help='Review pages fetched in parallel')
+        parser.add_argument('--replay', action='store_true',
+                            help='Serve pages only from the on-disk page cache (offline)')
 
     def handle(self, *args, **options):
-        product_url = options['product_url']
-        self.stdout.write(f"[DEBUG] Starting scrape for: {product_url}")
+        asin = asin_from_url(options['product']) or options['product']
+        if not asin.isalnum():
+            raise CommandError(f"Could not find an ASIN in {options['product']}")
+        self.stdout.write(f"[DEBUG] Starting scrape for: {asin}")
 
-        reviews = scrape_amazon_reviews(product_url)
-        self.stdout.write(f"[DEBUG] Total reviews fetched: {len(reviews)}")
+        product, created = Product.objects.get_or_create(
+            pid=asin, source="amazon", defaults={"name": options['name'] or asin},
+        )
+        if created:
+            print(f"[DEBUG] Created new Product: {product.name}")
 
-        if not reviews:
-            self.stdout.write(self.style.WARNING("No reviews found"))
-            return
+        saved = 0
+        pages = iter_new_review_pages(
+            product,
+            max_pages=options['max_pages'],
+            replay=options['replay'] or None,
+            concurrency=options['concurrency'],
+        )
+        try:
+            for page_reviews in pages:
+                saved += len(save_review_page(product, page_reviews))
+        except CircuitOpenError as e:
+            raise CommandError(f"{e}: host circuit open, retry later ({saved} reviews saved)")
 
-        for r in reviews:
-            Review.objects.create(
-                product=None,  # set a Product instance if you want
-                reviewer=r.get("reviewer", ""),
-                text=r.get("text", ""),
-                rating=r.get("rating"),
-                date=r.get("date"),
-                verified=r.get("verified", False)
-            )
+        if not saved:
+            self.stdout.write(self.style.WARNING("No new reviews found"))
+            return
 
-        self.stdout.write(self.style.SUCCESS(f"Scraped {len(reviews)} reviews for {product_url}"))
+        self.stdout.write(self.style.SUCCESS(f"Scraped {saved} reviews for {product}"))
@@ -1,7 +1,9 @@
 # core/management/commands/scrape_flipkart.py
-from django.core.management.base import BaseCommand
-from core.models import Product, Review
-from core.scraper.flipkart import scrape_flipkart_reviews
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Product
+from core.scraper.throttle import CircuitOpenError
+from core.services import iter_new_review_pages, save_review_page
 
 class Command(BaseCommand):
     help = 'Scrape Flipkart reviews and save to DB'
@@ -9,27 +11,31 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('product_pid', type=str, help='Flipkart product PID')
         parser.add_argument('product_name', type=str, help='Name of the product')
+        parser.add_argument('--concurrency', type=int, default=settings.SCRAPER_CONCURRENCY,
+                            help='Review pages fetched in parallel')
+        parser.add_argument('--replay', action='store_true',
+                            help='Serve pages only from the on-disk page cache (offline)')
 
     def handle(self, *args, **kwargs):
         product_pid = kwargs['product_pid']
         product_name = kwargs['product_name']
 
-        product, created = Product.objects.get_or_create(name=product_name)
+        product, created = Product.objects.get_or_create(
+            pid=product_pid, source="flipkart", defaults={"name": product_name},
+        )
         if created:
             print(f"[DEBUG] Created new Product: {product_name}")
 
-        reviews = scrape_flipkart_reviews(product_pid, max_pages=4)
-
-        for r in reviews:
-            Review.objects.create(
-                product=product,
-                reviewer=r['reviewer_name'],
-                rating=r['rating'],
-                verified=True,
-                text=r['review_text'],
-                title=r['title'],
-                location=r['location'],
-                review_date=r['date'],
-                category="product",
-            )
-            print(f"[DEBUG] Saved review: {r['reviewer_name']} - {r['rating']}")
+        # Each page is committed as soon as it has been scraped
+        pages = iter_new_review_pages(
+            product,
+            max_pages=4,
+            replay=kwargs['replay'] or None,
+            concurrency=kwargs['concurrency'],
+        )
+        try:
+            for page_reviews in pages:
+                for review in save_review_page(product, page_reviews):
+                    print(f"[DEBUG] Saved review: {review.reviewer} - {review.rating}")
+        except CircuitOpenError as e:
+            raise CommandError(f"{e}: host circuit open, retry later")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_remove_product_created_at_remove_product_url_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='hwm_fingerprints',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
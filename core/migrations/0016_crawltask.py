@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_product_hwm_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('fetching', 'Fetching'), ('done', 'Done'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('reviews_saved', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'page'], name='core_crawlt_status_7ce4d2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'page'), name='unique_crawl_task')],
+            },
+        ),
+    ]
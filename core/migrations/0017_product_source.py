@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_crawltask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='source',
+            field=models.CharField(choices=[('flipkart', 'Flipkart'), ('amazon', 'Amazon')], default='flipkart', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_product_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
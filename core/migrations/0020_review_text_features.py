@@ -0,0 +1,80 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:36
+
+import hashlib
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of core.scraper.cleaner.text_features as of this migration, so
+# later changes to the cleaner don't change what the backfill computes
+STOP_WORDS = frozenset("""
+i me my myself we our ours ourselves you your yours yourself yourselves he him his himself
+she her hers herself it its itself they them their theirs themselves what which who whom
+this that these those am is are was were be been being have has had having do does did
+doing a an the and but if or because as until while of at by for with about against
+between into through during before after above below to from up down in out on off over
+under again further then once here there when where why how all any both each few more
+most other some such no nor not only own same so than too very s t can will just don
+should now d ll m o re ve y ain aren couldn didn doesn hadn hasn haven isn ma mightn
+mustn needn shan shouldn wasn weren won wouldn
+""".split())
+_TAG = re.compile(r"<[^>]*>")
+_WORD = re.compile(r"[^\W_]+")
+
+
+def text_features(text):
+    normalized = ""
+    if text:
+        normalized = " ".join((_TAG.sub(" ", text) if "<" in text else text).split())
+        if normalized[-9:].upper() == "READ MORE":
+            normalized = normalized[:-9].rstrip()
+    return {
+        "normalized_text": normalized,
+        "text_length": len(normalized),
+        "word_count": sum(1 for word in _WORD.findall(normalized.lower()) if word not in STOP_WORDS),
+        "content_hash": hashlib.sha256(normalized.encode("utf-8")).hexdigest(),
+    }
+
+
+def backfill_text_features(apps, schema_editor):
+    Review = apps.get_model("core", "Review")
+    batch = []
+    for review in Review.objects.only("id", "text").iterator(chunk_size=2000):
+        for name, value in text_features(review.text).items():
+            setattr(review, name, value)
+        batch.append(review)
+        if len(batch) >= 2000:
+            Review.objects.bulk_update(batch, ["normalized_text", "text_length", "word_count", "content_hash"])
+            batch = []
+    Review.objects.bulk_update(batch, ["normalized_text", "text_length", "word_count", "content_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='normalized_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='text_length',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_text_features, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_review_text_features'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='sentiment_model',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='sentiment_text_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
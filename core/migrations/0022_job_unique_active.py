@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    # keep the oldest queued/running job of each product, the others couldn't coexist
+    Job = apps.get_model("core", "Job")
+    seen = set()
+    duplicates = []
+    for job in Job.objects.filter(status__in=["queued", "running"]).order_by("id"):
+        key = (job.kind, job.product_id)
+        if key in seen:
+            duplicates.append(job.id)
+        seen.add(key)
+    Job.objects.filter(id__in=duplicates).update(status="failed", error="Duplicate of an earlier active job")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_review_sentiment_provenance'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('kind', 'product'), name='unique_active_job'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:44
+
+import hashlib
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of core.fingerprint.review_fingerprint as of this migration
+_RELATIVE_DATE = re.compile(r"\bago\b|\btoday\b|\byesterday\b", re.IGNORECASE)
+
+
+def review_fingerprint(product_key, reviewer, title, text, date):
+    if date and _RELATIVE_DATE.search(date):
+        date = ""
+    parts = [str(product_key), reviewer, title, text, date]
+    normalized = "\x1f".join(" ".join(str(p or "").split()).lower() for p in parts)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def merge_duplicate_products(apps, schema_editor):
+    """
+    Fold every product sharing a (pid, source) into the oldest one: reviews
+    are moved and re-fingerprinted (dropping those the kept product already
+    has), crawl tasks, jobs and critical issues follow, then the duplicate
+    is deleted.
+    """
+    Product = apps.get_model("core", "Product")
+    Review = apps.get_model("core", "Review")
+    CrawlTask = apps.get_model("core", "CrawlTask")
+    Job = apps.get_model("core", "Job")
+    CriticalIssue = apps.get_model("core", "CriticalIssue")
+
+    kept = {}
+    for product in Product.objects.filter(pid__isnull=False).order_by("id"):
+        keep = kept.setdefault((product.pid, product.source), product)
+        if keep.pk == product.pk:
+            continue
+
+        fingerprints = set(Review.objects.filter(product=keep).values_list("fingerprint", flat=True))
+        for review in Review.objects.filter(product=product):
+            review.fingerprint = review_fingerprint(
+                keep.pk, review.reviewer, review.title, review.text, review.review_date,
+            )
+            if review.fingerprint in fingerprints:
+                review.delete()
+                continue
+            fingerprints.add(review.fingerprint)
+            review.product = keep
+            review.save(update_fields=["product", "fingerprint"])
+
+        pages = set(CrawlTask.objects.filter(product=keep).values_list("page", flat=True))
+        CrawlTask.objects.filter(product=product, page__in=pages).delete()
+        CrawlTask.objects.filter(product=product).update(product=keep)
+
+        active = ["queued", "running"]
+        if Job.objects.filter(product=keep, status__in=active).exists():
+            Job.objects.filter(product=product, status__in=active).update(
+                status="failed", error="Duplicate of an earlier active job",
+            )
+        Job.objects.filter(product=product).update(product=keep)
+        CriticalIssue.objects.filter(product=product).update(product=keep)
+        product.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_job_unique_active'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_products, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('pid', 'source'), name='unique_product_pid_source'),
+        ),
+    ]
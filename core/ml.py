@@ -0,0 +1,197 @@
+"""
+Process-wide registry of the transformers models used by RevLens.
+
+Each model is built once per process, on first use, no matter how many
+threads ask for it at the same time; later calls get the same pipeline.
+Nothing is imported or loaded at import time, so importing services,
+views or management commands stays cheap.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+
+BACKENDS = ("torch", "onnx-int8")
+
+# name -> (pipeline task, model, extra pipeline kwargs)
+MODEL_SPECS = {
+    "sentiment": ("sentiment-analysis", "distilbert/distilbert-base-uncased-finetuned-sst-2-english", {"device": -1}),
+    "zero-shot": ("zero-shot-classification", "facebook/bart-large-mnli", {}),
+    "summarizer": ("summarization", "facebook/bart-large-cnn",
+                   {"max_length": 150, "min_length": 50, "do_sample": True}),
+    "text2text": ("text2text-generation", "t5-small", {"max_length": 100, "num_return_sequences": 1}),
+}
+
+# Tiny inputs that run each model once so the first real request doesn't
+# pay for lazy initialisation inside the pipeline
+WARMUP_CALLS = {
+    "sentiment": lambda m: m(["Works well."], truncation=True),
+    "zero-shot": lambda m: m("Works well.", ["product defect"]),
+    "summarizer": lambda m: m("Works well. " * 20, max_length=20, min_length=5, do_sample=False),
+    "text2text": lambda m: m("summarize: Works well."),
+}
+
+
+# Intra-op threads for models loaded in this process, see limit_threads()
+_threads = None
+
+
+def limit_threads(threads):
+    """
+    Cap the CPU threads each model in this process uses for inference, e.g.
+    in one of several worker processes sharing the machine. Call it before
+    the first model is loaded.
+    """
+    global _threads
+    _threads = threads
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def backend_for(name):
+    """Inference backend of model `name` (settings.SENTIMENT_BACKEND for "sentiment")."""
+    return settings.SENTIMENT_BACKEND if name == "sentiment" else "torch"
+
+
+def model_id(name, backend=None):
+    """
+    Identifies the weights behind `name`, e.g. for caching its outputs. The
+    quantized backend gives slightly different scores, so it gets its own id,
+    and so does every windowing of long inputs for the classifiers.
+    """
+    backend = backend or backend_for(name)
+    task, model, _ = MODEL_SPECS[name]
+    ident = model if backend == "torch" else f"{model}:{backend}"
+    if task in WINDOWED_TASKS:
+        w = windowing()
+        ident += f"@w{w['window'] or 'max'}o{w['overlap']}x{w['max_windows'] or 'all'}"
+    return ident
+
+
+# Tasks whose long inputs are scored in windows (core.chunking)
+WINDOWED_TASKS = {"sentiment-analysis", "zero-shot-classification"}
+
+
+def windowing():
+    """Sliding-window settings for long inputs (core.chunking), as keyword arguments."""
+    return {
+        "window": settings.INFERENCE_WINDOW_TOKENS,
+        "overlap": settings.INFERENCE_WINDOW_OVERLAP,
+        "max_windows": settings.INFERENCE_MAX_WINDOWS,
+    }
+
+
+def load_pipeline(name, backend=None):
+    backend = backend or backend_for(name)
+    task, model, kwargs = MODEL_SPECS[name]
+    if backend == "onnx-int8":
+        if task != "sentiment-analysis":
+            raise ValueError(f"The {backend} backend only supports sentiment-analysis models, not {name!r}")
+        from .onnx_backend import load_quantized
+        return load_quantized(
+            model, settings.ONNX_MODEL_DIR, threads=_threads or settings.ONNX_THREADS,
+            max_tokens=settings.INFERENCE_TOKEN_BUDGET, **windowing(),
+        )
+    if backend != "torch":
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}")
+
+    from transformers import pipeline
+    pipe = pipeline(task, model=model, **kwargs)
+    if task == "sentiment-analysis":
+        from .batching import TokenBudgetClassifier
+        return TokenBudgetClassifier(pipe, settings.INFERENCE_TOKEN_BUDGET, **windowing())
+    return pipe
+
+
+def current_rss():
+    """Resident set size of this process in bytes, None where unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def parameter_bytes(model):
+    """Bytes held by the weights of a pipeline's model, None if unknown."""
+    parameters = getattr(getattr(model, "model", None), "parameters", None)
+    if parameters is None:
+        return None
+    return sum(p.numel() * p.element_size() for p in parameters())
+
+
+class ModelRegistry:
+    """
+    Loads models lazily with `loader(name)` (default: a transformers pipeline
+    from MODEL_SPECS). A per-model lock makes concurrent first calls wait for
+    a single load instead of each building their own copy.
+    """
+
+    def __init__(self, loader=load_pipeline):
+        self.loader = loader
+        self.models = {}
+        self.stats_by_name = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        model = self.models.get(name)
+        if model is not None:
+            return model
+        with self.lock:
+            lock = self.locks.setdefault(name, threading.Lock())
+        with lock:
+            model = self.models.get(name)
+            if model is None:
+                rss_before = current_rss()
+                start = time.perf_counter()
+                model = self.loader(name)
+                rss_after = current_rss()
+                self.stats_by_name[name] = {
+                    "load_seconds": time.perf_counter() - start,
+                    "rss_delta_bytes": rss_after - rss_before if rss_before is not None else None,
+                    "parameter_bytes": parameter_bytes(model),
+                }
+                self.models[name] = model
+        return model
+
+    def is_loaded(self, name):
+        return name in self.models
+
+    def warmup(self, names=None):
+        """Load `names` (default: every known model) and run each one once."""
+        for name in names or MODEL_SPECS:
+            model = self.get(name)
+            call = WARMUP_CALLS.get(name)
+            if call is not None:
+                start = time.perf_counter()
+                call(model)
+                self.stats_by_name[name]["warmup_seconds"] = time.perf_counter() - start
+
+    def stats(self):
+        """Load time and memory use of every loaded model, plus process RSS."""
+        return {
+            "rss_bytes": current_rss(),
+            "models": {name: dict(stats) for name, stats in self.stats_by_name.items()},
+        }
+
+    def unload(self, name=None):
+        """Drop one model (or all of them) so it is loaded again on next use."""
+        with self.lock:
+            for key in [name] if name else list(self.models):
+                self.models.pop(key, None)
+                self.stats_by_name.pop(key, None)
+
+
+registry = ModelRegistry()
+
+
+def get_model(name):
+    return registry.get(name)
@@ -3,12 +3,33 @@ from django.db import models
 # core/models.py
 from django.db import models
 
+from .scraper.cleaner import text_features
+
 class Product(models.Model):
     # Temporarily allow null and blank
     pid = models.CharField(max_length=50, null=True, blank=True)
 
     name = models.CharField(max_length=255)
 
+    # Marketplace the pid belongs to, a key of core.scraper.sources.SOURCES
+    source = models.CharField(
+        max_length=20,
+        choices=[
+            ("flipkart", "Flipkart"),
+            ("amazon", "Amazon"),
+        ],
+        default="flipkart",
+    )
+
+    # Fingerprints of the newest reviews seen on the last scrape (newest first).
+    # A re-scrape stops as soon as it reaches one of these.
+    hwm_fingerprints = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["pid", "source"], name="unique_product_pid_source"),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.pid})"
 
@@ -27,6 +48,21 @@ class Review(models.Model):
     is_critical = models.BooleanField(default=False)
     sentiment = models.CharField(max_length=20, blank=True, null=True)
     sentiment_score = models.FloatField(blank=True, null=True)
+    # Provenance of sentiment: model + aggregation (core.sentiment.sentiment_version)
+    # and content_hash of the text it was computed from; see stale_reviews()
+    sentiment_model = models.CharField(max_length=255, blank=True, default="", editable=False)
+    sentiment_text_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+
+    # core.fingerprint.review_fingerprint of product, reviewer, title, text and
+    # date; re-scraped reviews are upserted on it instead of stored twice
+    fingerprint = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    # Text features computed from `text` at ingest and on every save()
+    # (core.scraper.cleaner.text_features)
+    normalized_text = models.TextField(blank=True, default="", editable=False)
+    text_length = models.PositiveIntegerField(default=0, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)  # non-stopword words
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True, editable=False)
 
     # ✅ NEW FIELD for aspect-based categorization
     category = models.CharField(
@@ -40,8 +76,21 @@ class Review(models.Model):
         default="other",
     )
 
+    def save(self, *args, **kwargs):
+        # Recompute the text features whatever edited the text (admin, shell,
+        # commands), so stale_reviews() sees the new content_hash
+        for name, value in text_features(self.text).items():
+            setattr(self, name, value)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "text" in update_fields:
+            kwargs["update_fields"] = {*update_fields, *TEXT_FEATURE_FIELDS}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.reviewer} - {self.title[:30]}..."
+
+
+TEXT_FEATURE_FIELDS = ["normalized_text", "text_length", "word_count", "content_hash"]
 from django.db import models
 
 from django.db import models
@@ -61,6 +110,90 @@ class CriticalIssue(models.Model):
         return f"{self.phrase or 'Unknown phrase'} ({self.frequency})"
 
 
+
+class CrawlTask(models.Model):
+    """
+    One (product, page) entry of the persistent crawl frontier used by the
+    `crawl` command, so an interrupted crawl can pick up where it stopped.
+    """
+    PENDING = "pending"
+    FETCHING = "fetching"
+    DONE = "done"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+    product = models.ForeignKey("Product", on_delete=models.CASCADE)
+    page = models.PositiveIntegerField()
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            (PENDING, "Pending"),
+            (FETCHING, "Fetching"),
+            (DONE, "Done"),
+            (SKIPPED, "Skipped"),
+            (FAILED, "Failed"),
+        ],
+        default=PENDING,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    reviews_saved = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "page"], name="unique_crawl_task"),
+        ]
+        indexes = [models.Index(fields=["status", "page"])]
+
+    def __str__(self):
+        return f"{self.product} p{self.page} ({self.status})"
+
+class Job(models.Model):
+    """
+    Background work queued by the web views and run by `manage.py run_worker`,
+    with progress counters the status endpoint reports.
+    """
+    ADD_PRODUCT = "add_product"
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    kind = models.CharField(max_length=30, choices=[(ADD_PRODUCT, "Scrape and analyze product")])
+    product = models.ForeignKey("Product", on_delete=models.CASCADE)
+    max_pages = models.PositiveIntegerField(default=10)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            (QUEUED, "Queued"),
+            (RUNNING, "Running"),
+            (DONE, "Done"),
+            (FAILED, "Failed"),
+        ],
+        default=QUEUED,
+    )
+    pages_done = models.PositiveIntegerField(default=0)
+    reviews_scraped = models.PositiveIntegerField(default=0)
+    reviews_analyzed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"])]
+        constraints = [
+            # at most one queued or running job of a kind per product
+            models.UniqueConstraint(
+                fields=["kind", "product"], condition=models.Q(status__in=["queued", "running"]),
+                name="unique_active_job",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
 # class Review(models.Model):
 #     product = models.ForeignKey("Product", on_delete=models.CASCADE)
 #     reviewer = models.CharField(max_length=255)
@@ -0,0 +1,162 @@
+"""
+ONNX Runtime backend for the sentiment model.
+
+The Hugging Face model is exported to ONNX once, its weights are quantized
+to int8 (dynamic quantization: activations stay float and are quantized on
+the fly), and the result is served by ONNX Runtime on the CPU. The exported
+files are reused by every later process. An export is written to a
+temporary directory and renamed into place when complete, so concurrent
+processes never load a half-written model.
+
+OnnxSentimentClassifier is a drop-in for the transformers
+"sentiment-analysis" pipeline as far as core.sentiment is concerned: called
+with a list of sentences it returns one {"label", "score"} dict per sentence.
+
+Needs the optional `onnx` and `onnxruntime` packages (and torch for the
+one-time export).
+"""
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from .batching import max_input_length, pad_batch, run_batched, softmax, token_lengths
+from .chunking import encode_windows, pool_windows
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+
+logger = logging.getLogger(__name__)
+
+
+def model_dir(base_dir, model):
+    return Path(base_dir) / model.replace("/", "--")
+
+
+def export_quantized(model, out_dir):
+    """
+    Export `model` (a Hugging Face sequence classification model id) to
+    ONNX under `out_dir` together with its tokenizer and config, then write
+    the int8-quantized copy next to it. Returns the quantized model path.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    hf_model = AutoModelForSequenceClassification.from_pretrained(model).eval()
+    tokenizer.save_pretrained(out_dir)
+    hf_model.config.save_pretrained(out_dir)
+
+    sample = tokenizer(["Works well.", "Stopped charging after a week."], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask") if name in sample]
+    dynamic = {"batch": 0, "sequence": 1}
+    with torch.no_grad():
+        torch.onnx.export(
+            hf_model,
+            tuple(sample[name] for name in input_names),
+            str(out_dir / FP32_FILE),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes={**{name: dynamic for name in input_names}, "logits": {0: "batch"}},
+            opset_version=17,
+            dynamo=False,
+        )
+
+    quantize_dynamic(str(out_dir / FP32_FILE), str(out_dir / INT8_FILE), weight_type=QuantType.QInt8)
+    return out_dir / INT8_FILE
+
+
+class OnnxSentimentClassifier:
+    """
+    Tokenizes with the model's own tokenizer and runs the int8 ONNX graph in
+    token-budget batches of at most `max_tokens` padded tokens. Long inputs
+    are windowed like in batching.TokenBudgetClassifier. `session` is an
+    onnxruntime.InferenceSession; load() builds one from an exported model.
+    """
+
+    def __init__(self, tokenizer, session, labels, max_length, max_tokens=8192, window=None, overlap=0,
+                 max_windows=None):
+        self.tokenizer = tokenizer
+        self.session = session
+        self.labels = labels
+        self.max_length = max_length
+        self.max_tokens = max_tokens
+        self.window = window or max_length
+        self.overlap = overlap
+        self.max_windows = max_windows
+        self.input_names = {i.name for i in session.get_inputs()}
+
+    @classmethod
+    def load(cls, path, threads=None, **kwargs):
+        """Classifier for the model exported under `path` (see export_quantized())."""
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        path = Path(path)
+        tokenizer = AutoTokenizer.from_pretrained(path)
+        config = AutoConfig.from_pretrained(path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        session = ort.InferenceSession(str(path / INT8_FILE), options, providers=["CPUExecutionProvider"])
+        return cls(
+            tokenizer, session, [config.id2label[i] for i in range(config.num_labels)],
+            max_input_length(tokenizer, config), **kwargs,
+        )
+
+    def __call__(self, sentences, batch_size=None, truncation=True):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        if not sentences:
+            return []
+        encoded, owners = encode_windows(
+            self.tokenizer, sentences, self.window, self.overlap, self.max_windows, self.max_length,
+        )
+
+        def run(indices):
+            batch = pad_batch(self.tokenizer, encoded, indices, "np")
+            feeds = {name: value.astype(np.int64) for name, value in batch.items() if name in self.input_names}
+            return self.session.run(None, feeds)[0]
+
+        probs = softmax(run_batched(encoded["input_ids"], run, self.max_tokens, batch_size))
+        probs = pool_windows(probs, owners, len(sentences), weights=token_lengths(encoded["input_ids"]))
+        best = probs.argmax(axis=1)
+        return [{"label": self.labels[label], "score": float(probs[row, label])} for row, label in enumerate(best)]
+
+
+def ensure_exported(model, base_dir):
+    """
+    Directory with the int8 export of `model` under `base_dir`, exporting it
+    first if needed. The export goes to a temporary directory next to it and
+    is renamed into place; when several processes export at once, the first
+    rename wins and the others throw their copy away.
+    """
+    path = model_dir(base_dir, model)
+    if (path / INT8_FILE).exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    logger.info("Exporting %s to ONNX (int8) under %s", model, path)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{path.name}.", dir=path.parent))
+    try:
+        export_quantized(model, tmp)
+        os.replace(tmp, path)
+    except OSError:
+        if not (path / INT8_FILE).exists():
+            raise  # e.g. an incomplete export left by an older version, delete it by hand
+        logger.info("%s was exported by another process meanwhile", model)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+def load_quantized(model, base_dir, threads=None, max_tokens=8192, **windowing):
+    """OnnxSentimentClassifier for `model`, exporting it first if needed."""
+    path = ensure_exported(model, base_dir)
+    return OnnxSentimentClassifier.load(path, threads=threads, max_tokens=max_tokens, **windowing)
@@ -1,66 +1,131 @@
-import requests
+import re
 from bs4 import BeautifulSoup
 from datetime import datetime
 
+from .base import ReviewSource
+
+try:
+    from . import fastparse
+except ImportError:  # lxml not installed
+    fastparse = None
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
 }
 
-def scrape_amazon_reviews(product_url, max_pages=2):
+def parse_review_date(raw):
+    # parse date like "Reviewed in India on 21 August 2025"
+    date_str = raw.split(" on ")[-1]
+    try:
+        return datetime.strptime(date_str, "%d %B %Y").date() if date_str else None
+    except Exception as e:
+        print(f"[DEBUG] Date parse error: {e}")
+        return None
+
+
+def _parse_with_bs4(content):
+    soup = BeautifulSoup(content, "html.parser")
+    review_blocks = soup.select("li[data-hook='review']")
+    if not review_blocks:
+        review_blocks = soup.select("div.a-section.celwidget")
+
+    reviews = []
+    for r in review_blocks:
+        reviewer_tag = r.select_one(".a-profile-name")
+        review_text_tag = r.select_one("span[data-hook='review-collapsed']") or r.select_one("span[data-hook='review-body']")
+        rating_tag = r.select_one("i[data-hook='review-star-rating'] span.a-icon-alt")
+        date_tag = r.select_one("span[data-hook='review-date']")
+        verified_tag = r.select_one("span[data-hook='avp-badge-linkless']")
+
+        reviews.append({
+            "reviewer": reviewer_tag.get_text(strip=True) if reviewer_tag else "",
+            "text": review_text_tag.get_text(strip=True) if review_text_tag else "",
+            "rating": float(rating_tag.get_text(strip=True).split()[0]) if rating_tag else None,
+            "date": parse_review_date(date_tag.get_text(strip=True)) if date_tag else None,
+            "verified": bool(verified_tag)
+        })
+
+    return reviews
+
+
+def _parse_with_lxml(content):
+    return fastparse.parse_amazon_page(content, parse_review_date)
+
+
+PARSERS = {"bs4": _parse_with_bs4}
+if fastparse is not None:
+    PARSERS["lxml"] = _parse_with_lxml
+
+DEFAULT_PARSER = "lxml" if "lxml" in PARSERS else "bs4"
+
+
+def parse_amazon_page(content, parser=None):
+    """
+    Parse one Amazon review page into dicts with reviewer, text, rating,
+    date, verified. `parser` picks a backend from PARSERS.
+    """
+    return PARSERS[parser or DEFAULT_PARSER](content)
+
+
+# Review list of an ASIN; page_url() also accepts a full review page URL instead
+AMAZON_REVIEWS_URL = "https://www.amazon.in/product-reviews/{pid}?reviewerType=all_reviews"
+
+# sortBy value that lists the newest reviews first
+NEWEST_FIRST = "recent"
+
+_ASIN = re.compile(r"/(?:dp|product-reviews|gp/product)/([A-Z0-9]{10})(?:[/?]|$)")
+
+
+def asin_from_url(url):
+    """ASIN of an Amazon product or review page URL, or None."""
+    match = _ASIN.search(url)
+    return match.group(1) if match else None
+
+
+class AmazonSource(ReviewSource):
+    name = "amazon"
+    headers = HEADERS
+    newest_first = NEWEST_FIRST
+
+    def __init__(self, base_url=AMAZON_REVIEWS_URL):
+        self.base_url = base_url
+
+    def page_url(self, key, page, sort=None):
+        url = key if key.startswith(("http://", "https://")) else self.base_url.format(pid=key)
+        if sort:
+            url = f"{url}&sortBy={sort}"
+        return f"{url}&pageNumber={page}"
+
+    def parse(self, content, parser=None):
+        return parse_amazon_page(content, parser)
+
+    def review_fields(self, r):
+        return {
+            "reviewer": r.get("reviewer") or "Anonymous",
+            "rating": float(r.get("rating") or 0),
+            "verified": bool(r.get("verified")),
+            "text": r.get("text") or "",
+            "title": r.get("title") or "",
+            "location": "",
+            "review_date": r["date"].isoformat() if r.get("date") else "",
+            "category": "product",
+        }
+
+
+def iter_amazon_pages(product_url, max_pages=2, **kwargs):
+    """
+    Yield (page, reviews) for each Amazon review page of a product (ASIN or
+    review page URL). Takes the same options as ReviewSource.iter_pages().
+    """
+    yield from AmazonSource().iter_pages(product_url, max_pages=max_pages, **kwargs)
+
+
+def scrape_amazon_reviews(product_url, max_pages=2, **kwargs):
     """
     Scrapes Amazon reviews for a given product URL.
     Returns a list of dictionaries with reviewer, text, rating, date, verified.
     """
     reviews = []
-
-    for page in range(1, max_pages + 1):
-        url = f"{product_url}&pageNumber={page}"
-        print(f"[DEBUG] Fetching page: {url}")
-        res = requests.get(url, headers=HEADERS)
-        print(f"[DEBUG] Status code: {res.status_code}")
-
-        if res.status_code != 200:
-            print(f"[DEBUG] Failed to fetch page {page}")
-            continue
-
-        soup = BeautifulSoup(res.content, "html.parser")
-        review_blocks = soup.select("li[data-hook='review']")
-        if not review_blocks:
-            print(f"[DEBUG] No reviews found with main selector, trying fallback")
-            review_blocks = soup.select("div.a-section.celwidget")
-
-        print(f"[DEBUG] Found {len(review_blocks)} review blocks on page {page}")
-
-        for r in review_blocks:
-            reviewer_tag = r.select_one(".a-profile-name")
-            review_text_tag = r.select_one("span[data-hook='review-collapsed']") or r.select_one("span[data-hook='review-body']")
-            rating_tag = r.select_one("i[data-hook='review-star-rating'] span.a-icon-alt")
-            date_tag = r.select_one("span[data-hook='review-date']")
-            verified_tag = r.select_one("span[data-hook='avp-badge-linkless']")
-
-            reviewer = reviewer_tag.get_text(strip=True) if reviewer_tag else ""
-            text = review_text_tag.get_text(strip=True) if review_text_tag else ""
-            rating = float(rating_tag.get_text(strip=True).split()[0]) if rating_tag else None
-
-            # parse date like "Reviewed in India on 21 August 2025"
-            date_str = date_tag.get_text(strip=True).split(" on ")[-1] if date_tag else None
-            try:
-                date = datetime.strptime(date_str, "%d %B %Y").date() if date_str else None
-            except Exception as e:
-                print(f"[DEBUG] Date parse error: {e}")
-                date = None
-
-            verified = bool(verified_tag)
-
-            print(f"[DEBUG] Review parsed: reviewer={reviewer}, rating={rating}, verified={verified}")
-            print(f"[DEBUG] Review text: {text[:60]}...")  # first 60 chars
-
-            reviews.append({
-                "reviewer": reviewer,
-                "text": text,
-                "rating": rating,
-                "date": date,
-                "verified": verified
-            })
-
+    for _, page_reviews in iter_amazon_pages(product_url, max_pages, **kwargs):
+        reviews.extend(page_reviews)
     return reviews
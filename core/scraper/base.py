@@ -0,0 +1,77 @@
+"""
+Review sources: a marketplace only says how to build its review page URLs,
+how to parse a page and how a parsed review maps onto Review fields.
+Fetching (pooling, concurrency, throttling, caching) and the crawl stop
+rules are shared by every source through ReviewSource.iter_pages().
+"""
+from abc import ABC, abstractmethod
+
+from .http import fetch_in_order, make_session
+
+
+class ReviewSource(ABC):
+    """
+    Base class for a marketplace. Subclasses set `name` and implement
+    page_url(), parse() and review_fields(); a source missing one of them
+    can't be instantiated.
+    """
+    name = None
+    # Session headers, None for DEFAULT_HEADERS
+    headers = None
+    # Sort value that lists the newest reviews first, None if the site has none
+    newest_first = None
+
+    @abstractmethod
+    def page_url(self, key, page, sort=None):
+        """URL of review page `page` (1-based) for product `key`."""
+
+    @abstractmethod
+    def parse(self, content, parser=None):
+        """Parse one review page into review dicts, [] past the last page."""
+
+    @abstractmethod
+    def review_fields(self, r):
+        """Map one parsed review dict to Review field values."""
+
+    def iter_pages(self, key, max_pages=4, concurrency=1, session=None, sort=None,
+                   seen=None, cache=None, parser=None):
+        """
+        Yield (page, reviews) for each review page of `key` as soon as it has
+        been fetched and parsed, so callers can store a page before the next
+        one arrives.
+
+        With `concurrency` > 1 that many pages are kept in flight over one pooled
+        keep-alive session. Pages are still yielded in order and the crawl stops
+        at the first page that fails to load or has no reviews.
+
+        `seen` is an optional predicate over review dicts; the crawl stops at the
+        first review it accepts (only the reviews before it are yielded). Combine
+        it with sort=self.newest_first to re-scrape only what is new.
+
+        `cache` is an optional PageCache (see core.scraper.cache).
+        """
+        own_session = session is None
+        if own_session:
+            session = make_session(pool_size=concurrency, headers=self.headers)
+
+        urls = [self.page_url(key, page, sort) for page in range(1, max_pages + 1)]
+        try:
+            for index, resp in fetch_in_order(session, urls, concurrency=concurrency, cache=cache):
+                if resp.status_code != 200:
+                    print(f"[DEBUG] Failed to fetch {self.name} page {index + 1} (status {resp.status_code}), stopping")
+                    break
+                page_reviews = self.parse(resp.content, parser)
+                print(f"[DEBUG] Found {len(page_reviews)} {self.name} reviews on page {index + 1}")
+                if not page_reviews:
+                    break
+                if seen is not None:
+                    known_at = next((i for i, r in enumerate(page_reviews) if seen(r)), None)
+                    if known_at is not None:
+                        print("[DEBUG] Reached already stored reviews, stopping")
+                        if known_at:
+                            yield index + 1, page_reviews[:known_at]
+                        break
+                yield index + 1, page_reviews
+        finally:
+            if own_session:
+                session.close()
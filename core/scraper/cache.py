@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response for pages served from the cache."""
+
+    def __init__(self, status_code, content=b"", headers=None, from_cache=True):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.from_cache = from_cache
+
+
+def _url_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class PageCache:
+    """
+    Content-addressed, gzip-compressed on-disk cache of fetched pages.
+
+    Bodies are stored once per content hash under objects/. Every URL gets one
+    index entry per fetch date under index/<url hash>/<YYYY-MM-DD>.json that
+    points at its body and keeps the ETag / Last-Modified validators.
+
+    Entries younger than `ttl` seconds are served without touching the
+    network; older ones are revalidated with a conditional GET. In `replay`
+    mode only the cache is used and a miss answers 504, like only-if-cached.
+    """
+
+    def __init__(self, root, ttl=None, replay=False):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.replay = replay
+
+    def _object_path(self, digest):
+        return self.root / "objects" / digest[:2] / f"{digest}.gz"
+
+    def _index_dir(self, url):
+        return self.root / "index" / _url_key(url)
+
+    def lookup(self, url):
+        """Latest index entry for `url`, or None."""
+        index_dir = self._index_dir(url)
+        try:
+            dates = sorted(p.name for p in index_dir.iterdir() if p.suffix == ".json")
+        except FileNotFoundError:
+            return None
+        if not dates:
+            return None
+        with open(index_dir / dates[-1], encoding="utf-8") as f:
+            return json.load(f)
+
+    def is_fresh(self, entry, now=None):
+        if self.ttl is None:
+            return True
+        return (now or time.time()) - entry["fetched_at"] < self.ttl
+
+    def validators(self, entry):
+        """Conditional request headers for revalidating `entry`."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def response(self, entry):
+        with gzip.open(self._object_path(entry["sha256"]), "rb") as f:
+            content = f.read()
+        headers = {"Content-Type": entry.get("content_type") or "text/html"}
+        return CachedResponse(entry["status"], content, headers)
+
+    def _write_entry(self, url, entry):
+        day = datetime.fromtimestamp(entry["fetched_at"], tz=timezone.utc).strftime("%Y-%m-%d")
+        _write_atomic(self._index_dir(url) / f"{day}.json", json.dumps(entry).encode("utf-8"))
+
+    def store(self, url, resp):
+        digest = hashlib.sha256(resp.content).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            _write_atomic(path, gzip.compress(resp.content, compresslevel=6))
+
+        entry = {
+            "url": url,
+            "status": resp.status_code,
+            "sha256": digest,
+            "fetched_at": time.time(),
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "content_type": resp.headers.get("Content-Type"),
+        }
+        self._write_entry(url, entry)
+        return entry
+
+    def revalidated(self, url, entry):
+        """Record that the origin answered 304 Not Modified for `entry`."""
+        entry = dict(entry, fetched_at=time.time())
+        self._write_entry(url, entry)
+        return entry
+
+    def iter_entries(self):
+        """Latest index entry of every cached URL."""
+        index_root = self.root / "index"
+        if not index_root.exists():
+            return
+        for index_dir in index_root.iterdir():
+            dates = sorted(p for p in index_dir.iterdir() if p.suffix == ".json")
+            if dates:
+                with open(dates[-1], encoding="utf-8") as f:
+                    yield json.load(f)
+
+    def evict(self, max_age=None, now=None):
+        """
+        Drop index entries older than `max_age` seconds (default: the TTL) and
+        any body no longer referenced. Returns (entries, objects) removed.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        if max_age is None:
+            return 0, 0
+        now = now or time.time()
+
+        removed_entries = 0
+        referenced = set()
+        for path in (self.root / "index").glob("*/*.json"):
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            if now - entry["fetched_at"] >= max_age:
+                path.unlink()
+                removed_entries += 1
+            else:
+                referenced.add(entry["sha256"])
+
+        removed_objects = 0
+        for path in (self.root / "objects").glob("*/*.gz"):
+            if path.name[:-len(".gz")] not in referenced:
+                path.unlink()
+                removed_objects += 1
+
+        for index_dir in (self.root / "index").glob("*"):
+            if index_dir.is_dir() and not any(index_dir.iterdir()):
+                index_dir.rmdir()
+
+        return removed_entries, removed_objects
@@ -1,4 +1,5 @@
 # cleaner.py
+import hashlib
 import re
 from typing import List, Dict
 
@@ -50,3 +51,78 @@ def clean_text(text: str) -> str:
     text = re.sub(r'\s+', ' ', text)
 
     return text
+
+
+# -----------------------------
+# Ingest-time text features
+# -----------------------------
+# NLTK's English stopword list (apostrophe forms dropped, tokens are alphanumeric)
+STOP_WORDS = frozenset("""
+i me my myself we our ours ourselves you your yours yourself yourselves he him his himself
+she her hers herself it its itself they them their theirs themselves what which who whom
+this that these those am is are was were be been being have has had having do does did
+doing a an the and but if or because as until while of at by for with about against
+between into through during before after above below to from up down in out on off over
+under again further then once here there when where why how all any both each few more
+most other some such no nor not only own same so than too very s t can will just don
+should now d ll m o re ve y ain aren couldn didn doesn hadn hasn haven isn ma mightn
+mustn needn shan shouldn wasn weren won wouldn
+""".split())
+
+_TAG = re.compile(r"<[^>]*>")
+_WORD = re.compile(r"[^\W_]+")
+
+# ASCII fast path of meaningful_word_count: one bytes.translate() lowercases
+# letters and blanks everything that isn't [a-z0-9], so split() yields the
+# same words as _WORD without running the regex
+_ASCII_WORDS = bytes(
+    ord(chr(b).lower()) if b < 128 and chr(b).isalnum() else ord(" ") for b in range(256)
+)
+_ASCII_STOP_WORDS = frozenset(word.encode("ascii") for word in STOP_WORDS)
+
+
+def normalize_text(text: str, keep_lines: bool = False) -> str:
+    """
+    Review text without HTML tags, extra whitespace and the "READ MORE" link
+    text Flipkart appends to truncated reviews. With `keep_lines` each line
+    break survives as one "\n" (blank lines dropped), for sentence
+    segmentation; content_hash is always of the single-line form.
+    """
+    if not text:
+        return ""
+    if "<" in text:
+        text = _TAG.sub(" ", text)
+    if keep_lines:
+        text = "\n".join(filter(None, (" ".join(line.split()) for line in text.splitlines())))
+    else:
+        text = " ".join(text.split())
+    if text[-9:].upper() == "READ MORE":
+        text = text[:-9].rstrip()
+    return text
+
+
+def meaningful_word_count(text: str) -> int:
+    """Number of alphanumeric words in `text` that are not stopwords."""
+    if text.isascii():
+        words = text.encode("ascii").translate(_ASCII_WORDS).split()
+        return len(words) - sum(map(_ASCII_STOP_WORDS.__contains__, words))
+    words = _WORD.findall(text.lower())
+    return len(words) - sum(map(STOP_WORDS.__contains__, words))
+
+
+def content_hash(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def text_features(text: str) -> dict:
+    """
+    Review columns precomputed once at ingest so later stages don't clean
+    and tokenize the same text again.
+    """
+    normalized = normalize_text(text)
+    return {
+        "normalized_text": normalized,
+        "text_length": len(normalized),
+        "word_count": meaningful_word_count(normalized),
+        "content_hash": content_hash(normalized),
+    }
@@ -0,0 +1,158 @@
+"""
+lxml fast path for the review page parsers.
+
+Each function returns exactly what the BeautifulSoup parser of the same
+scraper returns, but parses with libxml2 and looks fields up with
+precompiled XPath expressions instead of walking the tree with find().
+Only the review part of the page is parsed: the markup is cut at the start
+tag of the first review block (all later blocks, nested or not, follow it
+in the source), which skips the <head> and the large inline state scripts
+in front of the reviews. Script/style elements are dropped right after
+parsing, since BeautifulSoup's get_text() never includes their contents.
+"""
+import re
+
+from lxml import etree
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Start of a part of the page that holds no markup, and how each one ends
+_RAW_TEXT = re.compile(r"<(?:!--|(?i:script|style)\b)")
+_RAW_TEXT_END = {
+    "<!--": re.compile(r"-->"),
+    "<script": re.compile(r"</(?i:script)"),
+    "<style": re.compile(r"</(?i:style)"),
+}
+
+
+def _block_start(content, first_block):
+    """
+    Offset of the first match of `first_block` outside scripts, styles and
+    comments (0 when there is none).
+    """
+    pos = 0
+    match = first_block.search(content)
+    while match is not None:
+        raw = _RAW_TEXT.search(content, pos, match.start())
+        if raw is None:
+            return match.start()
+        end = _RAW_TEXT_END[raw.group().lower()].search(content, raw.end())
+        if end is None:
+            return 0
+        pos = end.end()
+        if match.start() < pos:
+            match = first_block.search(content, pos)
+    return 0
+
+
+def _parse(content, first_block=None):
+    """
+    Parse `content` from the first match of `first_block` (a regex for the
+    start tag of a review block) on, or whole if there is no match.
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", "replace")
+    if first_block is not None and content:
+        content = content[_block_start(content, first_block):]
+    root = etree.HTML(content or "<html></html>")
+    if root is not None:
+        etree.strip_elements(root, "script", "style", "template", with_tail=False)
+    return root
+
+
+def _first(xpath, node):
+    found = xpath(node)
+    return found[0] if found else None
+
+
+def _text(node):
+    return "".join(node.itertext())
+
+
+def _stripped_text(node):
+    return "".join(s.strip() for s in node.itertext())
+
+
+# -----------------------------
+# Flipkart
+# -----------------------------
+_FK_FIRST_BLOCK = re.compile(r"""<div\b[^>]*\bclass=["'](?:[^"']*\s)?col-12-12[\s"']""")
+# The review blocks and review text of a page are public: core.scraper.synth
+# uses them to build scaled-up benchmark pages
+FLIPKART_REVIEW_BLOCKS = etree.XPath(f"//div[{_has_class('col-12-12')}]")
+_FK_TITLE = etree.XPath(f".//p[{_has_class('z9E0IG')}]")
+FLIPKART_REVIEW_TEXT = etree.XPath(f".//div[{_has_class('ZmyHeo')}]")
+_FK_REVIEWER = etree.XPath(".//p[normalize-space(@class)='_2NsDsF AwS1CA']")
+_FK_LOCATION = etree.XPath(f".//p[{_has_class('MztJPv')}]")
+_FK_RATING = etree.XPath(".//div[normalize-space(@class)='XQDdHH Ga3i8K']")
+_FK_DATE = etree.XPath(f".//p[{_has_class('_2NsDsF')}]")
+
+
+def parse_flipkart_page(content):
+    root = _parse(content, _FK_FIRST_BLOCK)
+    if root is None:
+        return []
+
+    reviews = []
+    for block in FLIPKART_REVIEW_BLOCKS(root):
+        title = _first(_FK_TITLE, block)
+        text = _first(FLIPKART_REVIEW_TEXT, block)
+        reviewer_name = _first(_FK_REVIEWER, block)
+        location = _first(_FK_LOCATION, block)
+        rating_div = _first(_FK_RATING, block)
+        review_date = _first(_FK_DATE, block)
+
+        reviews.append({
+            'title': _text(title) if title is not None else 'No title',
+            'review_text': _stripped_text(text) if text is not None else 'No text',
+            'reviewer_name': _text(reviewer_name) if reviewer_name is not None else 'No name',
+            'location': _text(location) if location is not None else 'No location',
+            'rating': float(_stripped_text(rating_div)) if rating_div is not None else 0,
+            'date': _text(review_date) if review_date is not None else 'No date'
+        })
+
+    return reviews
+
+
+# -----------------------------
+# Amazon
+# -----------------------------
+_AMZ_FIRST_BLOCK = re.compile(r"""<li\b[^>]*\bdata-hook=["']review["']""")
+AMAZON_REVIEW_BLOCKS = etree.XPath("//li[@data-hook='review']")
+_AMZ_FALLBACK_BLOCKS = etree.XPath(f"//div[{_has_class('a-section')} and {_has_class('celwidget')}]")
+_AMZ_REVIEWER = etree.XPath(f".//*[{_has_class('a-profile-name')}]")
+_AMZ_COLLAPSED = etree.XPath(".//span[@data-hook='review-collapsed']")
+AMAZON_REVIEW_BODY = etree.XPath(".//span[@data-hook='review-body']")
+_AMZ_RATING = etree.XPath(f".//i[@data-hook='review-star-rating']//span[{_has_class('a-icon-alt')}]")
+_AMZ_DATE = etree.XPath(".//span[@data-hook='review-date']")
+_AMZ_VERIFIED = etree.XPath(".//span[@data-hook='avp-badge-linkless']")
+
+
+def parse_amazon_page(content, parse_date):
+    # without review <li>s the fallback blocks can be anywhere, parse it all
+    root = _parse(content, _AMZ_FIRST_BLOCK)
+    if root is None:
+        return []
+
+    blocks = AMAZON_REVIEW_BLOCKS(root) or _AMZ_FALLBACK_BLOCKS(root)
+    reviews = []
+    for r in blocks:
+        reviewer_tag = _first(_AMZ_REVIEWER, r)
+        review_text_tag = _first(_AMZ_COLLAPSED, r)
+        if review_text_tag is None:
+            review_text_tag = _first(AMAZON_REVIEW_BODY, r)
+        rating_tag = _first(_AMZ_RATING, r)
+        date_tag = _first(_AMZ_DATE, r)
+
+        reviews.append({
+            "reviewer": _stripped_text(reviewer_tag) if reviewer_tag is not None else "",
+            "text": _stripped_text(review_text_tag) if review_text_tag is not None else "",
+            "rating": float(_stripped_text(rating_tag).split()[0]) if rating_tag is not None else None,
+            "date": parse_date(_stripped_text(date_tag)) if date_tag is not None else None,
+            "verified": bool(_AMZ_VERIFIED(r)),
+        })
+
+    return reviews
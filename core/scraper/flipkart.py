@@ -1,42 +1,110 @@
-import requests
 from bs4 import BeautifulSoup
 
-def scrape_flipkart_reviews(product_pid, max_pages=4):
+from .base import ReviewSource
+
+try:
+    from . import fastparse
+except ImportError:  # lxml not installed
+    fastparse = None
+
+FLIPKART_REVIEWS_URL = (
+    "https://www.flipkart.com/flostrain-manual-nose-ear-hair-trimmer-portable-stainless-steel-remover-10-min-runtime-2-length-settings/product-reviews/itm77372ab994526"
+    "?pid={pid}&lid=LST{pid}B7LBYA&marketplace=FLIPKART&page=1"
+)
+
+# sortOrder value that lists the newest reviews first
+NEWEST_FIRST = "MOST_RECENT"
+
+
+def flipkart_page_url(product_pid, page, base_url=FLIPKART_REVIEWS_URL, sort=None):
+    url = base_url.format(pid=product_pid)
+    if sort:
+        url = f"{url}&sortOrder={sort}"
+    return f"{url}&page={page}"
+
+
+def _parse_with_bs4(content):
+    soup = BeautifulSoup(content, 'html.parser')
     reviews = []
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                      '(KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
-    }
-
-    base_url = f"https://www.flipkart.com/flostrain-manual-nose-ear-hair-trimmer-portable-stainless-steel-remover-10-min-runtime-2-length-settings/product-reviews/itm77372ab994526?pid={product_pid}&lid=LST{product_pid}B7LBYA&marketplace=FLIPKART&page=1"
-
-    for page in range(1, max_pages + 1):
-        url = f"{base_url}&page={page}"
-        print(f"[DEBUG] Fetching page: {url}")
-        resp = requests.get(url, headers=headers)
-        soup = BeautifulSoup(resp.content, 'html.parser')
-
-        review_blocks = soup.find_all('div', class_='col-12-12')
-        if not review_blocks:
-            break
-
-        for block in review_blocks:
-            title = block.find('p', class_='z9E0IG')
-            text = block.find('div', class_='ZmyHeo')
-            reviewer_name = block.find('p', class_='_2NsDsF AwS1CA')
-            location = block.find('p', class_='MztJPv')
-            rating_div = block.find('div', class_='XQDdHH Ga3i8K')
-            review_date = block.find('p', class_='_2NsDsF')
-
-            reviews.append({
-                'title': title.get_text() if title else 'No title',
-                'review_text': text.get_text(strip=True) if text else 'No text',
-                'reviewer_name': reviewer_name.get_text() if reviewer_name else 'No name',
-                'location': location.get_text() if location else 'No location',
-                'rating': float(rating_div.get_text(strip=True)) if rating_div else 0,
-                'date': review_date.get_text() if review_date else 'No date'
-            })
 
-    print(f"[DEBUG] Total reviews fetched: {len(reviews)}")
+    for block in soup.find_all('div', class_='col-12-12'):
+        title = block.find('p', class_='z9E0IG')
+        text = block.find('div', class_='ZmyHeo')
+        reviewer_name = block.find('p', class_='_2NsDsF AwS1CA')
+        location = block.find('p', class_='MztJPv')
+        rating_div = block.find('div', class_='XQDdHH Ga3i8K')
+        review_date = block.find('p', class_='_2NsDsF')
+
+        reviews.append({
+            'title': title.get_text() if title else 'No title',
+            'review_text': text.get_text(strip=True) if text else 'No text',
+            'reviewer_name': reviewer_name.get_text() if reviewer_name else 'No name',
+            'location': location.get_text() if location else 'No location',
+            'rating': float(rating_div.get_text(strip=True)) if rating_div else 0,
+            'date': review_date.get_text() if review_date else 'No date'
+        })
+
     return reviews
 
+
+PARSERS = {"bs4": _parse_with_bs4}
+if fastparse is not None:
+    PARSERS["lxml"] = fastparse.parse_flipkart_page
+
+DEFAULT_PARSER = "lxml" if "lxml" in PARSERS else "bs4"
+
+
+def parse_flipkart_page(content, parser=None):
+    """
+    Parse one Flipkart review page into review dicts. Returns [] when the
+    page has no review blocks (i.e. we ran past the last page).
+    `parser` picks a backend from PARSERS.
+    """
+    return PARSERS[parser or DEFAULT_PARSER](content)
+
+
+class FlipkartSource(ReviewSource):
+    name = "flipkart"
+    newest_first = NEWEST_FIRST
+
+    def __init__(self, base_url=FLIPKART_REVIEWS_URL):
+        self.base_url = base_url
+
+    def page_url(self, key, page, sort=None):
+        return flipkart_page_url(key, page, self.base_url, sort)
+
+    def parse(self, content, parser=None):
+        return parse_flipkart_page(content, parser)
+
+    def review_fields(self, r):
+        return {
+            "reviewer": r.get('reviewer_name') or 'Anonymous',
+            "rating": float(r.get('rating') or 0),
+            "verified": True,
+            "text": r.get('review_text') or '',
+            "title": r.get('title') or '',
+            "location": r.get('location') or '',
+            "review_date": r.get('date') or '',
+            "category": "product",
+        }
+
+
+def iter_flipkart_pages(product_pid, max_pages=4, base_url=FLIPKART_REVIEWS_URL, **kwargs):
+    """
+    Yield (page, reviews) for each Flipkart review page of a PID. Takes the
+    same options as ReviewSource.iter_pages().
+    """
+    yield from FlipkartSource(base_url).iter_pages(product_pid, max_pages=max_pages, **kwargs)
+
+
+def scrape_flipkart_reviews(product_pid, max_pages=4, **kwargs):
+    """
+    Scrape up to `max_pages` review pages for a Flipkart PID and return all
+    reviews in page order. Takes the same options as iter_flipkart_pages().
+    """
+    reviews = []
+    for _, page_reviews in iter_flipkart_pages(product_pid, max_pages=max_pages, **kwargs):
+        reviews.extend(page_reviews)
+
+    print(f"[DEBUG] Total reviews fetched: {len(reviews)}")
+    return reviews
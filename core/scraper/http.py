@@ -0,0 +1,121 @@
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache import CachedResponse
+from .throttle import RETRY_STATUSES, throttles
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
+}
+
+REQUEST_TIMEOUT = 20
+
+
+def make_session(pool_size=1, headers=None):
+    """
+    Build a requests.Session whose connection pool can keep `pool_size`
+    keep-alive connections per host, so concurrent page fetches reuse sockets
+    instead of opening a new connection for every page.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(headers or DEFAULT_HEADERS)
+    return session
+
+
+def send(session, url, headers=None):
+    """
+    GET `url` through the shared per-host throttle: wait for a token, retry
+    429/5xx answers and connection errors with jittered exponential backoff,
+    and give up immediately while the host's circuit breaker is open
+    (CircuitOpenError). Returns the last response once retries run out.
+    """
+    throttle = throttles.for_host(urlsplit(url).netloc)
+    attempt = 0
+    while True:
+        throttle.wait_turn()
+        print(f"[DEBUG] Fetching page: {url}")
+        try:
+            resp = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            throttle.breaker.record_failure()
+            if attempt >= throttles.max_retries:
+                raise
+            delay = throttles.backoff(attempt)
+            print(f"[DEBUG] {e.__class__.__name__} for {url}, retrying in {delay:.1f}s")
+        else:
+            if resp.status_code not in RETRY_STATUSES:
+                throttle.breaker.record_success()
+                return resp
+            throttle.breaker.record_failure()
+            if attempt >= throttles.max_retries:
+                return resp
+            delay = throttles.backoff(attempt, resp.headers.get("Retry-After"))
+            print(f"[DEBUG] Status {resp.status_code} for {url}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+        attempt += 1
+
+
+def fetch(session, url, cache=None):
+    """
+    GET `url`, going through `cache` (a PageCache) when one is given: fresh
+    entries are served from disk, stale ones are revalidated with a
+    conditional request, and in replay mode the network is never used.
+    """
+    if cache is None:
+        return send(session, url)
+
+    entry = cache.lookup(url)
+    if cache.replay:
+        if entry is None:
+            print(f"[DEBUG] Replay miss: {url}")
+            return CachedResponse(504, from_cache=False)
+        return cache.response(entry)
+    if entry is not None and cache.is_fresh(entry):
+        return cache.response(entry)
+
+    resp = send(session, url, headers=cache.validators(entry))
+    if resp.status_code == 304 and entry is not None:
+        cache.revalidated(url, entry)
+        return cache.response(entry)
+    if resp.status_code == 200:
+        cache.store(url, resp)
+    return resp
+
+
+def fetch_in_order(session, urls, concurrency=1, cache=None):
+    """
+    Yield (index, response) for each url in order, keeping up to `concurrency`
+    requests in flight. Pages that were scheduled but not yet consumed are
+    cancelled as soon as the caller stops iterating (e.g. on an empty page).
+    """
+    if concurrency <= 1:
+        for index, url in enumerate(urls):
+            yield index, fetch(session, url, cache)
+        return
+
+    todo = enumerate(urls)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            for index, url in itertools.islice(todo, concurrency):
+                pending.append((index, pool.submit(fetch, session, url, cache)))
+
+            while pending:
+                index, future = pending.popleft()
+                resp = future.result()
+                for next_index, next_url in itertools.islice(todo, 1):
+                    pending.append((next_index, pool.submit(fetch, session, next_url, cache)))
+                yield index, resp
+        finally:
+            for _, future in pending:
+                future.cancel()
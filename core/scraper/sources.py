@@ -0,0 +1,14 @@
+"""
+Registry of the marketplaces reviews can be scraped from.
+"""
+from .amazon import AmazonSource
+from .flipkart import FlipkartSource
+
+SOURCES = {source.name: source for source in (FlipkartSource(), AmazonSource())}
+
+DEFAULT_SOURCE = "flipkart"
+
+
+def get_source(name=None):
+    """The ReviewSource registered as `name` (KeyError if unknown)."""
+    return SOURCES[name or DEFAULT_SOURCE]
@@ -0,0 +1,55 @@
+"""
+Synthetic review pages for benchmarks: take a recorded page and repeat its
+review blocks so parsers and the ingest pipeline can be timed on pages far
+bigger than anything the live sites serve.
+"""
+import copy
+
+try:
+    from lxml import etree
+
+    from . import fastparse
+except ImportError:  # lxml not installed
+    etree = fastparse = None
+
+# (review block, review text element) per site
+SITE_XPATHS = {
+    "flipkart": (fastparse.FLIPKART_REVIEW_BLOCKS, fastparse.FLIPKART_REVIEW_TEXT),
+    "amazon": (fastparse.AMAZON_REVIEW_BLOCKS, fastparse.AMAZON_REVIEW_BODY),
+} if fastparse is not None else {}
+
+
+def _outermost(blocks):
+    inside = set(blocks)
+    return [b for b in blocks if not any(a in inside for a in b.iterancestors())]
+
+
+def scale_page(content, site, factor):
+    """
+    Return `content` with every review block repeated `factor` times. Each
+    copy gets a numbered suffix on its review text so copies stay distinct
+    reviews (and distinct fingerprints). Scaling needs lxml.
+    """
+    if factor <= 1:
+        return content
+    if etree is None:
+        raise ImportError("Scaling review pages needs lxml")
+
+    blocks_xpath, text_xpath = SITE_XPATHS[site]
+    root = etree.HTML(content)
+    blocks = _outermost(blocks_xpath(root))
+    if not blocks:
+        return content
+
+    last = blocks[-1]
+    for k in range(1, factor):
+        for block in blocks:
+            clone = copy.deepcopy(block)
+            clone.tail = "\n"
+            for text_el in text_xpath(clone)[:1]:
+                leaf = [el for el in text_el.iter() if el.text and el.text.strip()] or [text_el]
+                leaf[0].text = f"{leaf[0].text or ''} #{k}"
+            last.addnext(clone)
+            last = clone
+
+    return etree.tostring(root, method="html", encoding="utf-8")
@@ -0,0 +1,151 @@
+"""
+Per-host request throttling shared by every scraper.
+
+Each host gets a token bucket (steady request rate + burst) and a circuit
+breaker. fetch() in core.scraper.http goes through `throttles`, retrying
+429/5xx answers and connection errors with jittered exponential backoff.
+"""
+import random
+import threading
+import time
+
+# Answers worth retrying: rate limited or a transient server-side failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() blocks until a request may be sent,
+    so any number of threads together stay under `rate` requests/second
+    (after an initial burst of up to `burst` requests). rate=None disables it.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # take the token now (possibly going negative) so waiters queue up fairly
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures and rejects requests for
+    `reset_timeout` seconds, then lets a single trial request through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failures=5, reset_timeout=60.0, clock=time.monotonic):
+        self.failure_threshold = failures
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def before_request(self, host=""):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if self.clock() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                raise CircuitOpenError(f"Circuit open for {host}, not sending request")
+            self.trial_in_flight = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+
+class HostThrottle:
+    def __init__(self, host, bucket, breaker):
+        self.host = host
+        self.bucket = bucket
+        self.breaker = breaker
+
+    def wait_turn(self):
+        self.breaker.before_request(self.host)
+        self.bucket.acquire()
+
+
+class ThrottleRegistry:
+    """Hands out one shared HostThrottle per host, built from configure()."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hosts = {}
+        self.configure()
+
+    def configure(self, rate=2.0, burst=4, hosts=None, max_retries=3, backoff_base=1.0,
+                  backoff_max=30.0, circuit_failures=5, circuit_reset=60.0):
+        """
+        `rate`/`burst` apply to every host unless `hosts` maps that host
+        (netloc) to its own {"rate": ..., "burst": ...}. Resets all state.
+        """
+        with self.lock:
+            self.rate = rate
+            self.burst = burst
+            self.host_limits = dict(hosts or {})
+            self.max_retries = max_retries
+            self.backoff_base = backoff_base
+            self.backoff_max = backoff_max
+            self.circuit_failures = circuit_failures
+            self.circuit_reset = circuit_reset
+            self.hosts = {}
+
+    def set_limit(self, host, rate, burst=1):
+        with self.lock:
+            self.host_limits[host] = {"rate": rate, "burst": burst}
+            self.hosts.pop(host, None)
+
+    def for_host(self, host):
+        with self.lock:
+            throttle = self.hosts.get(host)
+            if throttle is None:
+                limits = self.host_limits.get(host, {})
+                bucket = TokenBucket(limits.get("rate", self.rate), limits.get("burst", self.burst))
+                breaker = CircuitBreaker(self.circuit_failures, self.circuit_reset)
+                throttle = self.hosts[host] = HostThrottle(host, bucket, breaker)
+            return throttle
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass  # HTTP-date form, fall back to our own schedule
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        # "equal jitter": keep half the delay, randomize the other half
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+throttles = ThrottleRegistry()
@@ -0,0 +1,122 @@
+"""
+Sentence segmentation for review text.
+
+The default "rules" segmenter is a compiled regex rule set tuned for
+marketplace reviews: it splits after ., ! and ? (also without a space
+before the next capitalised word, "Good.Value for money"), on line breaks
+and on Flipkart's "READ MORE" link text, and keeps common abbreviations
+("Rs. 500", "e.g.") and decimals ("4.5 stars") intact. It needs no
+downloaded data and segments a whole list of texts with one regex split.
+
+"punkt" is nltk's sent_tokenize, kept as the reference (see the
+bench_segmenter command) and for anyone who prefers it.
+"""
+import re
+
+from django.conf import settings
+
+# Sentence boundaries; the matched text itself is dropped
+_BOUNDARY = re.compile(
+    r"\s*READ MORE\s*"               # Flipkart's truncation link, also mid-text
+    r"|\s*\n\s*"                     # line breaks
+    r"|(?<=[.!?])\s+"                # end punctuation + whitespace
+    r"|(?<=[.!?])(?=[A-Z][a-z'\s])"  # end punctuation glued to the next sentence
+)
+# segment_many() joins the texts with _TEXT_END and splits them all at once;
+# the captured boundaries tell where a text ends
+_TEXT_END = "\x00"
+_SPLIT = re.compile(f"({_TEXT_END}|{_BOUNDARY.pattern})")
+
+# Lower-cased words whose trailing period doesn't end a sentence
+ABBREVIATIONS = frozenset("""
+rs mr mrs ms dr st vs etc eg e.g ie i.e approx qty min max hrs mins kg gm ml pcs
+""".split())
+
+
+def _last_word(text):
+    words = text.rsplit(None, 1)
+    return words[-1].lower() if words else ""
+
+
+class Segmenter:
+    name = None
+
+    def split(self, text: str) -> list:
+        raise NotImplementedError
+
+    def segment_many(self, texts) -> tuple:
+        """
+        Split every text into sentences. Returns (sentences, counts) where
+        counts[i] is the number of sentences of texts[i].
+        """
+        split = self.split
+        sentences = []
+        counts = []
+        for text in texts:
+            parts = split(text) if text else []
+            sentences.extend(parts)
+            counts.append(len(parts))
+        return sentences, counts
+
+
+class RuleSegmenter(Segmenter):
+    name = "rules"
+
+    def split(self, text: str) -> list:
+        return self.segment_many([text])[0]
+
+    def segment_many(self, texts) -> tuple:
+        texts = [text or "" for text in texts]
+        if not texts:
+            return [], []
+        joined = _TEXT_END.join(texts)
+        if joined.count(_TEXT_END) != len(texts) - 1:  # a text contains the separator itself
+            joined = _TEXT_END.join(text.replace(_TEXT_END, " ") for text in texts)
+
+        sentences = []
+        counts = []
+        # pieces at even indexes, the boundaries between them at odd ones
+        parts = _SPLIT.split(joined)
+        end = len(parts) - 1
+        start = None  # index of the piece where a sentence cut short by an abbreviation began
+        text_start = 0  # len(sentences) when the current text began
+        for i in range(0, len(parts), 2):
+            piece = parts[i].strip()
+            if piece:
+                if start is None:
+                    start = i
+                last = i
+                if piece[-1] != "." or _last_word(piece[:-1]) not in ABBREVIATIONS:
+                    # merged pieces keep the boundary text that separated them
+                    sentences.append(piece if start == i else "".join(parts[start:i + 1]).strip())
+                    start = None
+            if i == end or parts[i + 1] == _TEXT_END:
+                if start is not None:
+                    sentences.append("".join(parts[start:last + 1]).strip())
+                    start = None
+                counts.append(len(sentences) - text_start)
+                text_start = len(sentences)
+        return sentences, counts
+
+
+class PunktSegmenter(Segmenter):
+    name = "punkt"
+
+    def split(self, text: str) -> list:
+        from nltk.tokenize import sent_tokenize
+        return sent_tokenize(text)
+
+
+SEGMENTERS = {
+    RuleSegmenter.name: RuleSegmenter(),
+    PunktSegmenter.name: PunktSegmenter(),
+}
+
+
+def get_segmenter(name=None):
+    """Segmenter `name`, by default settings.SENTENCE_SEGMENTER."""
+    name = name or settings.SENTENCE_SEGMENTER
+    try:
+        return SEGMENTERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown sentence segmenter {name!r}, expected one of {sorted(SEGMENTERS)}")
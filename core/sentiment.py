@@ -0,0 +1,293 @@
+"""
+Batched sentence-level sentiment: sentences from many reviews are flattened
+into one list, classified in large fixed-size batches and the per-sentence
+scores are reduced back to one sentiment per review with NumPy segment
+reductions (one segment = the sentences of one review).
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from .ml import model_id
+from .models import Review
+from .scraper.cleaner import content_hash, normalize_text
+from .segment import get_segmenter
+from .sentiment_cache import SentimentCache, sentence_key
+
+POLICIES = ("median", "majority")
+
+
+def split_sentences(text: str) -> list:
+    return get_segmenter().split(text)
+
+
+def flatten_sentences(texts, split=None):
+    """
+    Split every text into sentences, with the configured segmenter unless a
+    `split(text)` function is given. Returns (sentences, counts) where
+    counts[i] is the number of sentences of texts[i].
+    """
+    if split is None:
+        sentences, counts = get_segmenter().segment_many(texts)
+        return sentences, np.array(counts, dtype=np.int64)
+    sentences = []
+    counts = np.zeros(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        parts = split(text) if text else []
+        sentences.extend(parts)
+        counts[i] = len(parts)
+    return sentences, counts
+
+
+def _run_classifier(classifier, sentences, batch_size) -> np.ndarray:
+    """
+    Probability that each sentence is positive. Sentences are classified
+    shortest first so each batch pads to similar lengths, then put back in
+    their original order.
+    """
+    order = np.argsort(np.fromiter(map(len, sentences), dtype=np.int64, count=len(sentences)), kind="stable")
+    results = classifier([sentences[i] for i in order], batch_size=batch_size, truncation=True)
+
+    scores = np.fromiter((r["score"] for r in results), dtype=np.float64, count=len(order))
+    positive = np.fromiter((r["label"] == "POSITIVE" for r in results), dtype=bool, count=len(order))
+    pos = np.empty(len(order))
+    pos[order] = np.where(positive, scores, 1.0 - scores)
+    return pos
+
+
+def classify_sentences(classifier, sentences, batch_size=None, cache=None) -> np.ndarray:
+    """
+    Probability that each sentence is positive. Repeated sentences are only
+    classified once, and sentences already in `cache` (a SentimentCache) not
+    at all; new results are added to the cache.
+    """
+    if not sentences:
+        return np.zeros(0)
+    keys = [sentence_key(s) for s in sentences]
+    todo = {}
+    for key, sentence in zip(keys, sentences):
+        todo.setdefault(key, sentence)
+    known = cache.get_many(list(todo)) if cache is not None else {}
+    for key in known:
+        del todo[key]
+
+    if todo:
+        new = dict(zip(todo, _run_classifier(
+            classifier, list(todo.values()), batch_size or settings.SENTIMENT_BATCH_SIZE,
+        ).tolist()))
+        if cache is not None:
+            cache.put_many(new)
+        known.update(new)
+    return np.fromiter((known[key] for key in keys), dtype=np.float64, count=len(keys))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_sentiment_cache():
+    """
+    Process-wide SentimentCache for the sentiment model, or None when
+    settings.SENTIMENT_CACHE_PATH is unset.
+    """
+    global _cache
+    if not settings.SENTIMENT_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SentimentCache(
+                settings.SENTIMENT_CACHE_PATH, model_id("sentiment"),
+                max_entries=settings.SENTIMENT_CACHE_SIZE,
+            )
+    return _cache
+
+
+def segment_stats(pos: np.ndarray, counts: np.ndarray) -> dict:
+    """
+    Per-segment reductions of the sentence scores `pos`, split into
+    consecutive segments of `counts` sentences (every count must be > 0):
+    mean, median, positive sentence count, and the mean confidence of the
+    positive / negative sentences (0 where there are none).
+    """
+    starts = np.cumsum(counts) - counts
+    segments = np.repeat(np.arange(len(counts)), counts)
+    is_pos = pos >= 0.5
+
+    mean = np.add.reduceat(pos, starts) / counts
+    # sort by value within each segment, the median is then the middle element(s)
+    ordered = pos[np.lexsort((pos, segments))]
+    median = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+
+    n_pos = np.bincount(segments, weights=is_pos, minlength=len(counts))
+    pos_sum = np.bincount(segments, weights=np.where(is_pos, pos, 0.0), minlength=len(counts))
+    neg_sum = np.bincount(segments, weights=np.where(is_pos, 0.0, 1.0 - pos), minlength=len(counts))
+    n_neg = counts - n_pos
+    return {
+        "mean": mean,
+        "median": median,
+        "positive": n_pos,
+        "pos_confidence": np.divide(pos_sum, n_pos, out=np.zeros(len(counts)), where=n_pos > 0),
+        "neg_confidence": np.divide(neg_sum, n_neg, out=np.zeros(len(counts)), where=n_neg > 0),
+    }
+
+
+def review_sentiments(stats: dict, counts: np.ndarray, policy: str = "median"):
+    """
+    Review-level (is_positive, score) arrays from segment_stats().
+
+    "median": positive if the median sentence is, otherwise by majority vote;
+    the score is the mean positive probability.
+    "majority": positive if at least half the sentences are; the score is the
+    mean confidence of the winning class.
+    """
+    majority = stats["positive"] >= counts / 2
+    if policy == "median":
+        return np.where(stats["median"] >= 0.5, True, majority), np.round(stats["mean"], 3)
+    if policy == "majority":
+        return majority, np.where(majority, stats["pos_confidence"], stats["neg_confidence"])
+    raise ValueError(f"Unknown sentiment policy {policy!r}, expected one of {POLICIES}")
+
+
+def sentiment_version(policy="median") -> str:
+    """
+    Stamped into Review.sentiment_model: the model (backend and windowing
+    included) plus the aggregation policy.
+    """
+    return f"{model_id('sentiment')}/{policy}"
+
+
+def stale_reviews(queryset, policy="median"):
+    """
+    Reviews of `queryset` whose sentiment is missing, was computed by another
+    model or policy, or from a different text than the current one.
+    Review.save() keeps content_hash in step with the text; bulk writes
+    (QuerySet.update(), bulk_update()) must set it themselves.
+    """
+    return queryset.filter(
+        Q(sentiment__isnull=True)
+        | ~Q(sentiment_model=sentiment_version(policy))
+        | ~Q(sentiment_text_hash=F("content_hash"))
+    )
+
+
+def is_stale(review, version) -> bool:
+    """stale_reviews() for a single Review instance."""
+    return (
+        review.sentiment is None
+        or review.sentiment_model != version
+        or review.sentiment_text_hash != review.content_hash
+    )
+
+
+def iter_scored_chunks(reviews, classifier, batch_size=None, chunk_size=None, policy="median",
+                       split=None, on_review=None, cache=None, only_stale=False):
+    """
+    Set sentiment + sentiment_score (and their provenance) on `reviews` (a
+    queryset or list) without saving them, yielding the analyzed reviews
+    `chunk_size` at a time. The sentences of a whole chunk go through the
+    classifier together. With `only_stale` reviews that are up to date (see
+    stale_reviews()) are skipped.
+    `on_review(review, mean, median)` is called for every analyzed review.
+    `cache` is an optional SentimentCache (see get_sentiment_cache()).
+    """
+    chunk_size = chunk_size or settings.SENTIMENT_CHUNK_SIZE
+    version = sentiment_version(policy)
+    if hasattr(reviews, "iterator"):
+        if only_stale:
+            reviews = stale_reviews(reviews, policy)
+        reviews = reviews.iterator(chunk_size=chunk_size)
+    elif only_stale:
+        reviews = [r for r in reviews if is_stale(r, version)]
+
+    chunk = []
+    for review in reviews:
+        if review.text:
+            chunk.append(review)
+        if len(chunk) >= chunk_size:
+            yield _score_chunk(chunk, classifier, batch_size, policy, version, split, on_review, cache)
+            chunk = []
+    if chunk:
+        yield _score_chunk(chunk, classifier, batch_size, policy, version, split, on_review, cache)
+
+
+def _score_chunk(chunk, classifier, batch_size, policy, version, split, on_review, cache) -> list:
+    # segmented with its line breaks (normalized_text has none, and the rule
+    # segmenter splits on them); the provenance hash is of normalized_text
+    sentences, counts = flatten_sentences([normalize_text(r.text, keep_lines=True) for r in chunk], split)
+    has_sentences = counts > 0
+    chunk = [r for r, keep in zip(chunk, has_sentences) if keep]
+    texts = [r.normalized_text or r.text for r in chunk]
+    if not chunk:
+        return []
+    counts = counts[has_sentences]
+
+    pos = classify_sentences(classifier, sentences, batch_size, cache)
+    stats = segment_stats(pos, counts)
+    positive, scores = review_sentiments(stats, counts, policy)
+
+    for i, review in enumerate(chunk):
+        review.sentiment = "positive" if positive[i] else "negative"
+        review.sentiment_score = float(scores[i])
+        review.sentiment_model = version
+        review.sentiment_text_hash = content_hash(texts[i])
+        if on_review is not None:
+            on_review(review, float(stats["mean"][i]), float(stats["median"][i]))
+    return chunk
+
+
+# Review columns written by save_sentiments(), in row order (before the id)
+SAVED_FIELDS = ["sentiment", "sentiment_score", "sentiment_model", "sentiment_text_hash"]
+
+
+def sentiment_rows(reviews) -> list:
+    """Rows for save_sentiments() from analyzed reviews."""
+    return [(r.sentiment, r.sentiment_score, r.sentiment_model, r.sentiment_text_hash, r.pk) for r in reviews]
+
+
+def save_sentiments(rows, batch_size=None) -> int:
+    """
+    Write (sentiment, sentiment_score, sentiment_model, sentiment_text_hash,
+    id) rows with one executemany() per batch, in a single transaction.
+    Returns the number of rows written.
+    """
+    qn = connection.ops.quote_name
+    sql = (
+        f"UPDATE {qn(Review._meta.db_table)} SET "
+        + ", ".join(f"{qn(name)} = %s" for name in SAVED_FIELDS)
+        + f" WHERE {qn('id')} = %s"
+    )
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[i:i + batch_size])
+    return len(rows)
+
+
+def analyze_reviews(reviews, classifier, batch_size=None, chunk_size=None, policy="median",
+                    split=None, on_review=None, cache=None, only_stale=False) -> int:
+    """
+    Analyze and save `reviews` (see iter_scored_chunks()), one batched write
+    per chunk. Returns the number of reviews updated.
+    """
+    updated = 0
+    for chunk in iter_scored_chunks(reviews, classifier, batch_size, chunk_size, policy, split, on_review, cache,
+                                    only_stale):
+        updated += save_sentiments(sentiment_rows(chunk))
+    return updated
+
+
+def id_shards(queryset, shards: int) -> list:
+    """
+    Split the ids of `queryset` into at most `shards` contiguous, inclusive
+    (first_id, last_id) ranges holding about the same number of rows each.
+    """
+    ids = queryset.order_by("id").values_list("id", flat=True)
+    total = ids.count()
+    shards = max(min(shards, total), 1)
+    if not total:
+        return []
+    bounds = [ids[total * k // shards] for k in range(shards)] + [ids[total - 1] + 1]
+    return [(lo, hi - 1) for lo, hi in zip(bounds, bounds[1:])]
@@ -0,0 +1,123 @@
+"""
+Persistent cache of sentence sentiment scores.
+
+Review text repeats the same short sentences ("Awesome", "Good product",
+"Value for money") thousands of times, so each distinct sentence is only
+classified once per model: results live in a SQLite file keyed by model id
+and sentence hash, with a bounded in-memory LRU in front of it.
+"""
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+def sentence_key(sentence: str) -> bytes:
+    """
+    Cache key of a sentence: case and whitespace are normalized away, which
+    doesn't change the output of an uncased model.
+    """
+    return hashlib.sha256(" ".join(sentence.lower().split()).encode("utf-8")).digest()
+
+
+class SentimentCache:
+    """
+    Maps sentence keys to the probability that the sentence is positive,
+    for one `model_id`. Safe to share between threads; several processes
+    may use the same file (SQLite WAL).
+    """
+
+    def __init__(self, path, model_id, max_entries=100_000):
+        self.path = Path(path)
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = self.disk_hits = self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sentence_sentiment ("
+            " model TEXT NOT NULL, key BLOB NOT NULL, positive REAL NOT NULL,"
+            " PRIMARY KEY (model, key)) WITHOUT ROWID"
+        )
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys) -> dict:
+        """Cached scores of `keys` (an iterable of distinct keys); misses are left out."""
+        found = {}
+        missing = []
+        with self.lock:
+            for key in keys:
+                value = self.memory.get(key)
+                if value is None:
+                    missing.append(key)
+                else:
+                    self.memory.move_to_end(key)
+                    found[key] = value
+            self.memory_hits += len(found)
+
+            on_disk = 0
+            for i in range(0, len(missing), 500):
+                batch = missing[i:i + 500]
+                rows = self.db.execute(
+                    f"SELECT key, positive FROM sentence_sentiment WHERE model = ? "
+                    f"AND key IN ({','.join('?' * len(batch))})",
+                    [self.model_id, *batch],
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = value
+                    self._remember(key, value)
+                on_disk += len(rows)
+            self.disk_hits += on_disk
+            self.misses += len(missing) - on_disk
+        return found
+
+    def put_many(self, scores: dict) -> None:
+        if not scores:
+            return
+        with self.lock:
+            for key, value in scores.items():
+                self._remember(key, value)
+            with self.db:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO sentence_sentiment (model, key, positive) VALUES (?, ?, ?)",
+                    [(self.model_id, key, float(value)) for key, value in scores.items()],
+                )
+
+    def evict_other_models(self) -> int:
+        """
+        Drop the scores of every model but this one, e.g. those left behind by
+        a model or backend change, and give the space back. Returns rows removed.
+        """
+        with self.lock:
+            with self.db:
+                removed = self.db.execute(
+                    "DELETE FROM sentence_sentiment WHERE model != ?", [self.model_id],
+                ).rowcount
+            if removed:
+                self.db.execute("VACUUM")
+        return removed
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "lookups": lookups,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,39 @@
+"""
+Entry point of the worker processes started by `analyze_sentiments --workers`.
+
+Each worker sets up Django itself (workers are spawned, not forked), loads
+its own copy of the sentiment model limited to `threads` CPU threads and
+analyzes the reviews of one id range. Nothing is written to the database
+here: scores go back to the parent over `queue`, which merges them with
+batched writes, so the workers never compete for the SQLite write lock.
+
+Messages put on `queue`:
+    ("rows", shard, [(sentiment, sentiment_score, sentiment_model,
+                      sentiment_text_hash, id), ...])  # see sentiment_rows()
+    ("done", shard, cache stats or None)
+    ("error", shard, traceback text)
+"""
+import traceback
+
+
+def analyze_shard(shard, first_id, last_id, threads, options, queue):
+    try:
+        import django
+        django.setup()
+
+        from .ml import get_model, limit_threads
+        from .models import Review
+        from .sentiment import get_sentiment_cache, iter_scored_chunks, sentiment_rows
+
+        limit_threads(threads)
+        cache = None if options.get("no_cache") else get_sentiment_cache()
+        reviews = Review.objects.filter(id__gte=first_id, id__lte=last_id).exclude(text="").order_by("id")
+        for chunk in iter_scored_chunks(
+            reviews, get_model("sentiment"),
+            batch_size=options.get("batch_size"), chunk_size=options.get("chunk_size"), cache=cache,
+            only_stale=options.get("only_stale", False),
+        ):
+            queue.put(("rows", shard, sentiment_rows(chunk)))
+        queue.put(("done", shard, cache.stats() if cache is not None else None))
+    except BaseException:
+        queue.put(("error", shard, traceback.format_exc()))
@@ -1,67 +1,358 @@
-from .models import Product, Review, CriticalIssue
-from .scraper.flipkart import scrape_flipkart_reviews
-from django.db.models import Avg, Count
-from transformers import pipeline
-from nltk.tokenize import sent_tokenize
-import nltk
+from datetime import timedelta
 
-# Safe on Windows: download quietly
-try:
-    nltk.data.find("tokenizers/punkt")
-except LookupError:
-    nltk.download("punkt", quiet=True)
+from .models import Product, Review, CriticalIssue, Job
+from .fingerprint import review_fingerprint
+from .inference import get_classifier
+from .scraper.cache import PageCache
+from .scraper.cleaner import text_features
+from .scraper.sources import get_source
+from .scraper.throttle import CircuitOpenError
+from .sentiment import analyze_reviews, get_sentiment_cache
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Avg, Count, F
+from django.utils import timezone
 
-def ingest_reviews_for_pid(product: Product, pid: str, max_pages: int = 4) -> int:
+def get_page_cache(replay=None, ttl=None):
     """
-    Scrape reviews by PID and store them. Returns count saved.
+    PageCache configured from settings, or None when caching is disabled.
+    `replay` overrides settings.SCRAPER_REPLAY and `ttl` settings.SCRAPER_CACHE_TTL.
     """
-    data = scrape_flipkart_reviews(pid, max_pages=max_pages)
-    saved = 0
-    for r in data:
-        Review.objects.create(
-            product=product,
-            reviewer=r.get('reviewer_name') or 'No name',
-            rating=float(r.get('rating') or 0) or 0.0,
-            verified=True,
-            text=r.get('review_text') or '',
-            title=r.get('title') or '',
-            location=r.get('location') or '',
-            review_date=r.get('date') or '',
-        )
-        saved += 1
-    return saved
+    if not settings.SCRAPER_CACHE_DIR:
+        return None
+    if replay is None:
+        replay = settings.SCRAPER_REPLAY
+    if ttl is None:
+        ttl = settings.SCRAPER_CACHE_TTL
+    return PageCache(settings.SCRAPER_CACHE_DIR, ttl=ttl, replay=replay)
+
+
+def get_refresh_page_cache(replay=None):
+    """
+    PageCache for re-scraping a known product: every page is revalidated with
+    the origin (an unchanged one still comes from disk on a 304), since a page
+    served fresh from the cache would hide the reviews posted since.
+    """
+    return get_page_cache(replay, ttl=0)
+
+
+# How many of the newest review fingerprints a product keeps as its high-water mark
+HWM_SIZE = 20
+
+
+def source_for(product: Product):
+    return get_source(product.source)
+
+
+def scraped_review_fingerprint(product: Product, fields: dict) -> str:
+    """Fingerprint of a review given as Review field values."""
+    return review_fingerprint(
+        product.pk, fields.get('reviewer'), fields.get('title'), fields.get('text'), fields.get('review_date'),
+    )
+
+
+def iter_new_review_pages(product: Product, max_pages: int = 4, replay=None, concurrency=None):
+    """
+    Yield pages of newly scraped reviews (as Review field dicts) from the
+    product's source, newest first, stopping at the product's high-water
+    mark so a re-scrape of a known product only fetches the pages with new
+    reviews. The mark is advanced once the crawl has been consumed to the end.
+    """
+    source = source_for(product)
+    known = set(product.hwm_fingerprints or [])
+    concurrency = concurrency or settings.SCRAPER_CONCURRENCY
+    if known:
+        # new reviews usually fit on the first page, so don't prefetch pages
+        # we will most likely never read
+        concurrency = 1
+
+    newest = None
+    for _, page_reviews in source.iter_pages(
+        product.pid,
+        max_pages=max_pages,
+        concurrency=concurrency,
+        sort=source.newest_first,
+        seen=lambda r: scraped_review_fingerprint(product, source.review_fields(r)) in known,
+        cache=get_refresh_page_cache(replay) if known else get_page_cache(replay),
+    ):
+        rows = [source.review_fields(r) for r in page_reviews]
+        if newest is None:
+            newest = rows
+        yield rows
+
+    advance_high_water_mark(product, newest or [])
 
-def run_sentiment_for_product(product: Product) -> int:
+
+def advance_high_water_mark(product: Product, rows: list) -> None:
+    if not rows:
+        return
+    newest = [scraped_review_fingerprint(product, fields) for fields in rows]
+    product.hwm_fingerprints = list(dict.fromkeys(newest + list(product.hwm_fingerprints or [])))[:HWM_SIZE]
+    product.save(update_fields=["hwm_fingerprints"])
+
+
+# Review columns a scraped/imported review may set
+REVIEW_FIELDS = ["reviewer", "rating", "verified", "text", "title", "location", "review_date", "category"]
+_MAX_LENGTHS = {name: Review._meta.get_field(name).max_length for name in REVIEW_FIELDS}
+
+
+def clean_review_fields(fields: dict):
     """
-    Run sentence-level aggregation -> store review-level sentiment + score.
+    Validate one Review field dict before it is written: returns a cleaned
+    copy (unknown keys dropped, text fields stripped and cut to the column
+    size, rating a float within 0-5, text features added) or None if the
+    review can't be stored.
     """
-    clf = pipeline("sentiment-analysis", device=-1)
+    if not isinstance(fields, dict):
+        return None
 
-    updated = 0
-    for review in Review.objects.filter(product=product):
-        if not review.text:
+    cleaned = {}
+    for name in REVIEW_FIELDS:
+        if name not in fields:
             continue
-        sents = sent_tokenize(review.text)
-        if not sents:
+        value = fields[name]
+        if isinstance(value, str):
+            value = value.strip()
+            if _MAX_LENGTHS[name]:
+                value = value[:_MAX_LENGTHS[name]]
+        cleaned[name] = value
+
+    try:
+        cleaned["rating"] = float(cleaned.get("rating") or 0)
+    except (TypeError, ValueError):
+        return None
+    if not 0 <= cleaned["rating"] <= 5:
+        return None
+    if not cleaned.get("text") and not cleaned.get("title"):
+        return None
+    if isinstance(cleaned.get("verified"), str):
+        # CSV/JSON dumps spell booleans in many ways
+        cleaned["verified"] = cleaned["verified"].lower() in ("1", "true", "t", "yes", "y")
+    cleaned["reviewer"] = cleaned.get("reviewer") or "Anonymous"
+    for name in ["text", "title", "review_date"]:
+        cleaned[name] = cleaned.get(name) or ""
+    cleaned.update(text_features(cleaned["text"]))
+    return cleaned
+
+
+# Columns refreshed when a scraped review is already stored
+UPSERT_FIELDS = ["rating", "verified", "location", "category"]
+
+
+def insert_reviews(product: Product, rows: list, batch_size: int = None) -> list:
+    """
+    Validate Review field dicts and store them for a product with batched
+    INSERTs (settings.INGEST_BATCH_SIZE rows per statement) inside one
+    transaction. Invalid rows are skipped.
+
+    Reviews are upserted on their fingerprint (INSERT ... ON CONFLICT DO
+    UPDATE), so storing a review that is already in the DB only refreshes
+    UPSERT_FIELDS. Returns the newly created Review rows, with their primary
+    keys set.
+    """
+    reviews = {}
+    for fields in rows:
+        cleaned = clean_review_fields(fields)
+        if cleaned is None:
+            print(f"[DEBUG] Skipping invalid review: {fields!r:.80}")
             continue
+        fingerprint = scraped_review_fingerprint(product, cleaned)
+        reviews[fingerprint] = Review(product=product, fingerprint=fingerprint, **cleaned)
+
+    if not reviews:
+        return []
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    fingerprints = list(reviews)
+    with transaction.atomic():
+        stored = set()
+        for i in range(0, len(fingerprints), batch_size):
+            stored.update(
+                Review.objects.filter(fingerprint__in=fingerprints[i:i + batch_size])
+                .values_list("fingerprint", flat=True)
+            )
+        saved = Review.objects.bulk_create(
+            list(reviews.values()),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["fingerprint"],
+            update_fields=UPSERT_FIELDS,
+        )
+    return [r for r in saved if r.fingerprint not in stored]
+
+
+_UPSERT_COLUMNS = [f for f in Review._meta.concrete_fields if not f.primary_key]
+_UPSERT_DEFAULTS = [f.get_default() for f in _UPSERT_COLUMNS]
+
+
+def review_upsert_values(product: Product, fields: dict):
+    """
+    Validated and fingerprinted column values of one review for
+    upsert_review_values(), or None if the review can't be stored.
+    """
+    cleaned = clean_review_fields(fields)
+    if cleaned is None:
+        return None
+    cleaned["product_id"] = product.pk
+    cleaned["fingerprint"] = scraped_review_fingerprint(product, cleaned)
+    return [cleaned.get(f.attname, default) for f, default in zip(_UPSERT_COLUMNS, _UPSERT_DEFAULTS)]
+
 
-        results = clf(sents)
-        # majority + mean confidence of winning class
-        pos_scores = [r["score"] for r in results if r["label"] == "POSITIVE"]
-        neg_scores = [r["score"] for r in results if r["label"] == "NEGATIVE"]
-        positive = len(pos_scores)
-        negative = len(neg_scores)
-
-        if positive >= negative:
-            review.sentiment = "positive"
-            review.sentiment_score = sum(pos_scores)/len(pos_scores) if pos_scores else 0.0
-        else:
-            review.sentiment = "negative"
-            review.sentiment_score = sum(neg_scores)/len(neg_scores) if neg_scores else 0.0
-
-        review.save(update_fields=["sentiment", "sentiment_score"])
-        updated += 1
-    return updated
+def upsert_review_values(values: list, batch_size: int = None) -> int:
+    """
+    Write path for large imports: upsert rows built by review_upsert_values()
+    with one executemany() per batch instead of building model instances
+    (INSERT ... ON CONFLICT(fingerprint) DO UPDATE, like insert_reviews()).
+    The caller owns the transaction. Returns (created, updated) counts;
+    rows other connections insert meanwhile would be counted as created.
+    """
+    qn = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {qn(Review._meta.db_table)} ({', '.join(qn(f.column) for f in _UPSERT_COLUMNS)}) "
+        f"VALUES ({', '.join(['%s'] * len(_UPSERT_COLUMNS))}) "
+        f"ON CONFLICT ({qn('fingerprint')}) DO UPDATE SET "
+        + ", ".join(f"{qn(name)} = EXCLUDED.{qn(name)}" for name in UPSERT_FIELDS)
+    )
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    table, pk = qn(Review._meta.db_table), qn(Review._meta.pk.column)
+    with connection.cursor() as cursor:
+        # updated rows keep their id, so the ids past the current maximum are the new rows
+        cursor.execute(f"SELECT MAX({pk}) FROM {table}")
+        last_id = cursor.fetchone()[0] or 0
+        for i in range(0, len(values), batch_size):
+            cursor.executemany(sql, values[i:i + batch_size])
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {pk} > %s", [last_id])
+        created = cursor.fetchone()[0]
+    return created, len(values) - created
+
+
+def save_review_page(product: Product, rows: list) -> list:
+    """
+    Store one page of scraped reviews (Review field dicts, as yielded by
+    iter_new_review_pages) and return the created Review rows.
+    """
+    return insert_reviews(product, rows)
+
+
+def ingest_reviews(product: Product, max_pages: int = 4) -> int:
+    """
+    Scrape new reviews for a product from its source and store them,
+    committing each page as it arrives. Returns count saved.
+    """
+    saved = 0
+    for rows in iter_new_review_pages(product, max_pages=max_pages):
+        saved += len(save_review_page(product, rows))
+    return saved
+
+
+def enqueue_add_product(product: Product, max_pages: int = 10) -> Job:
+    """
+    Queue a scrape + sentiment analysis of `product` for run_worker. While
+    one is already queued or running for the product, that job is returned
+    instead, so two workers never scrape the same product at once.
+    """
+    active = Job.objects.filter(kind=Job.ADD_PRODUCT, product=product, status__in=[Job.QUEUED, Job.RUNNING])
+    job = active.first()
+    if job is not None:
+        return job
+    try:
+        with transaction.atomic():
+            return Job.objects.create(kind=Job.ADD_PRODUCT, product=product, max_pages=max_pages)
+    except IntegrityError:  # a concurrent request queued it first
+        return active.get()
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued job as running and return it, or None when the
+    queue is empty. Safe with several workers: the queued -> running update
+    only succeeds for one of them.
+    """
+    while True:
+        job = Job.objects.filter(status=Job.QUEUED).order_by("id").first()
+        if job is None:
+            return None
+        now = timezone.now()
+        if Job.objects.filter(id=job.id, status=Job.QUEUED).update(status=Job.RUNNING, started_at=now):
+            job.status, job.started_at = Job.RUNNING, now
+            return job
+
+
+def requeue_stale_jobs(stale_after=None) -> int:
+    """
+    Put running jobs started more than `stale_after` seconds ago (default:
+    settings.JOB_STALE_AFTER) back in the queue, e.g. those a crashed worker
+    left behind. Returns how many were requeued.
+    """
+    if stale_after is None:
+        stale_after = settings.JOB_STALE_AFTER
+    started_before = timezone.now() - timedelta(seconds=stale_after)
+    return Job.objects.filter(status=Job.RUNNING, started_at__lt=started_before).update(status=Job.QUEUED)
+
+
+def run_add_product_job(job: Job) -> None:
+    """
+    Scrape new reviews for the job's product page by page and analyze each
+    page as soon as it is stored, updating the job's progress counters.
+    """
+    for rows in iter_new_review_pages(job.product, max_pages=job.max_pages):
+        saved_reviews = save_review_page(job.product, rows)
+        analyzed = analyze_reviews(saved_reviews, get_classifier("sentiment"), cache=get_sentiment_cache())
+        Job.objects.filter(id=job.id).update(
+            pages_done=F("pages_done") + 1,
+            reviews_scraped=F("reviews_scraped") + len(saved_reviews),
+            reviews_analyzed=F("reviews_analyzed") + analyzed,
+        )
+
+
+JOB_RUNNERS = {
+    Job.ADD_PRODUCT: run_add_product_job,
+}
+
+
+def run_job(job: Job) -> bool:
+    """Run a claimed job and record how it ended. Returns True on success."""
+    try:
+        JOB_RUNNERS[job.kind](job)
+    except CircuitOpenError as e:
+        # the source is refusing requests for now; the pages stored so far are
+        # kept and the product can be queued again once the host recovers
+        Job.objects.filter(id=job.id).update(
+            status=Job.FAILED, error=f"{e}: host circuit open, retry later", finished_at=timezone.now(),
+        )
+        return False
+    except Exception as e:
+        Job.objects.filter(id=job.id).update(status=Job.FAILED, error=repr(e), finished_at=timezone.now())
+        return False
+    Job.objects.filter(id=job.id).update(status=Job.DONE, finished_at=timezone.now())
+    return True
+
+
+def job_progress(job: Job) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "product": {"pid": job.product.pid, "name": job.product.name, "source": job.product.source},
+        "pages_done": job.pages_done,
+        "max_pages": job.max_pages,
+        "reviews_scraped": job.reviews_scraped,
+        "sentiment_analyzed": job.reviews_analyzed,
+        "error": job.error or None,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+def run_sentiment_for_product(product: Product, only_stale: bool = False) -> int:
+    """
+    Run sentence-level aggregation -> store review-level sentiment + score
+    (majority vote, score = mean confidence of the winning class).
+    With only_stale, reviews whose sentiment is up to date are skipped.
+    """
+    return analyze_reviews(
+        Review.objects.filter(product=product), get_classifier("sentiment"),
+        policy="majority", cache=get_sentiment_cache(), only_stale=only_stale,
+    )
 
 def run_critical_issues_for_product(product: Product) -> int:
     """
@@ -1,3 +1,1001 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import queue
+import shutil
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import onnx_backend
+from .batching import plan_batches, run_batched
+from .chunking import pool_windows, window_spans
+from .fingerprint import review_fingerprint
+from .inference import InferenceError, InferenceServer, RemoteModel, get_classifier, request
+from .ml import ModelRegistry, load_pipeline, model_id
+from .models import CrawlTask, Job, Product, Review
+from .scraper import amazon, flipkart
+from .scraper.cache import PageCache
+from .scraper.cleaner import _WORD, STOP_WORDS, meaningful_word_count
+from .scraper.flipkart import iter_flipkart_pages, scrape_flipkart_reviews
+from .scraper.http import make_session, send
+from .scraper.sources import SOURCES
+from .scraper.synth import scale_page
+from .scraper.throttle import CircuitOpenError, TokenBucket, throttles
+from .segment import RuleSegmenter
+from .sentiment import analyze_reviews, classify_sentences, id_shards, segment_stats, sentiment_version
+from .sentiment_cache import SentimentCache, sentence_key
+from .sentiment_worker import analyze_shard
+from .services import (
+    claim_next_job, enqueue_add_product, insert_reviews, iter_new_review_pages, requeue_stale_jobs, run_job,
+)
+
+
+def flipkart_review_block(n):
+    return (
+        '<div class="col-12-12">'
+        f'<div class="XQDdHH Ga3i8K">{n % 5 + 1}</div>'
+        f'<p class="z9E0IG">Title {n}</p>'
+        f'<div class="ZmyHeo"><div>Review text {n}</div></div>'
+        f'<p class="_2NsDsF AwS1CA">Reviewer {n}</p>'
+        '<p class="MztJPv">Certified Buyer, Pune</p>'
+        '<p class="_2NsDsF">Sep, 2025</p>'
+        '</div>'
+    )
+
+
+def keyword_classifier(sentences, batch_size=None, truncation=False):
+    """Stands in for the transformers pipeline: "bad" sentences are negative."""
+    return [
+        {"label": "NEGATIVE", "score": 0.9} if "bad" in s else {"label": "POSITIVE", "score": 0.6 + len(s) / 1000}
+        for s in sentences
+    ]
+
+
+class StubReviewServer:
+    """
+    Local HTTP/1.1 server that serves `pages` Flipkart-like review pages of
+    `per_page` blocks each, and an empty page after that. Raising `newer`
+    posts that many new reviews in front of the first one.
+    """
+
+    def __init__(self, pages=3, per_page=10, fail_first=0):
+        stub = self
+        self.pages = pages
+        self.per_page = per_page
+        self.fail_first = fail_first
+        self.newer = 0
+        self.requested = []
+        self.client_ports = set()
+        self.lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                page = int(query["page"][-1])
+                with stub.lock:
+                    stub.requested.append(page)
+                    stub.client_ports.add(self.client_address[1])
+                    failing = len(stub.requested) <= stub.fail_first
+                if failing:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = stub.render(page).encode()
+                etag = f'"page-{page}-{stub.newer}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"127.0.0.1:{self.server.server_port}"
+        self.base_url = f"http://{self.host}/reviews?pid={{pid}}"
+        throttles.set_limit(self.host, rate=None)
+
+    def render(self, page):
+        blocks = ""
+        if page <= self.pages:
+            start = (page - 1) * self.per_page - self.newer
+            blocks = "".join(flipkart_review_block(n) for n in range(start, start + self.per_page))
+        return f"<html><body>{blocks}</body></html>"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FlipkartScraperTests(SimpleTestCase):
+    def test_sequential_scrape_stops_at_first_empty_page(self):
+        with StubReviewServer(pages=3) as stub:
+            reviews = scrape_flipkart_reviews("PID", max_pages=10, base_url=stub.base_url)
+
+        self.assertEqual(len(reviews), 30)
+        self.assertEqual(stub.requested, [1, 2, 3, 4])
+        self.assertEqual(reviews[0]["title"], "Title 0")
+        self.assertEqual(reviews[0]["review_text"], "Review text 0")
+        self.assertEqual(reviews[0]["rating"], 1.0)
+
+    def test_concurrent_scrape_keeps_page_order(self):
+        with StubReviewServer(pages=5) as stub:
+            reviews = scrape_flipkart_reviews("PID", max_pages=10, concurrency=4, base_url=stub.base_url)
+
+        self.assertEqual([r["title"] for r in reviews], [f"Title {n}" for n in range(50)])
+        # pages past the first empty one are never scheduled beyond the window
+        self.assertLessEqual(max(stub.requested), 6 + 4)
+        # keep-alive: no more connections than pages in flight
+        self.assertLessEqual(len(stub.client_ports), 4)
+
+    def test_rescrape_stops_at_first_seen_review(self):
+        with StubReviewServer(pages=5) as stub:
+            reviews = scrape_flipkart_reviews(
+                "PID", max_pages=10, base_url=stub.base_url,
+                seen=lambda r: r["title"] == "Title 12",
+            )
+
+        self.assertEqual([r["title"] for r in reviews], [f"Title {n}" for n in range(12)])
+        self.assertEqual(stub.requested, [1, 2])
+
+    def test_pages_are_yielded_as_they_arrive(self):
+        with StubReviewServer(pages=3) as stub:
+            pages = iter_flipkart_pages("PID", max_pages=10, base_url=stub.base_url)
+            page, reviews = next(pages)
+            self.assertEqual((page, len(reviews)), (1, 10))
+            self.assertEqual(stub.requested, [1])
+            self.assertEqual([p for p, _ in pages], [2, 3])
+
+
+@override_settings(SCRAPER_CACHE_DIR=None)
+class CrawlTests(TestCase):
+    def setUp(self):
+        self.stub = StubReviewServer(pages=3).__enter__()
+        self.addCleanup(self.stub.__exit__)
+        source = SOURCES["flipkart"]
+        self.addCleanup(setattr, source, "base_url", source.base_url)
+        source.base_url = self.stub.base_url
+        fd, self.pid_file = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as f:
+            f.write("# pid,name\nPID,Trimmer\n")
+        self.addCleanup(os.remove, self.pid_file)
+
+    def crawl(self, *args):
+        call_command("crawl", *args, "--concurrency", "1", "--parse-workers", "0", stdout=StringIO())
+
+    def statuses(self):
+        return list(CrawlTask.objects.order_by("page").values_list("page", "status"))
+
+    def test_seeded_crawl_closes_product_after_empty_page(self):
+        self.crawl(self.pid_file, "--max-pages", "10")
+
+        product = Product.objects.get(pid="PID", source="flipkart")
+        self.assertEqual(product.name, "Trimmer")
+        self.assertEqual(Review.objects.filter(product=product).count(), 30)
+        self.assertEqual(CrawlTask.objects.filter(product=product).count(), 10)
+        # the empty page 4 closes the product; at most the next page was already in flight
+        self.assertEqual(self.stub.requested[:4], [1, 2, 3, 4])
+        self.assertLessEqual(len(self.stub.requested), 5)
+        self.assertEqual(self.statuses()[:4], [(1, "done"), (2, "done"), (3, "done"), (4, "done")])
+        self.assertEqual({status for _, status in self.statuses()[5:]}, {"skipped"})
+
+    def test_resume_fetches_only_unfinished_pages(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        CrawlTask.objects.bulk_create([
+            CrawlTask(product=product, page=1, status=CrawlTask.DONE),
+            CrawlTask(product=product, page=2, status=CrawlTask.PENDING),
+            CrawlTask(product=product, page=3, status=CrawlTask.FETCHING),  # interrupted mid-fetch
+        ])
+
+        self.crawl("--resume", "--max-pages", "3")
+
+        self.assertEqual(self.stub.requested, [2, 3])
+        self.assertEqual(Review.objects.filter(product=product).count(), 20)
+        self.assertEqual(self.statuses(), [(1, "done"), (2, "done"), (3, "done")])
+
+    def test_recrawl_stops_at_high_water_mark(self):
+        self.crawl(self.pid_file, "--max-pages", "3")
+        self.stub.requested.clear()
+
+        self.crawl(self.pid_file, "--max-pages", "3")
+
+        self.assertEqual(self.stub.requested, [1])
+        self.assertEqual(Review.objects.count(), 30)
+        self.assertEqual(self.statuses(), [(1, "done")])
+
+    def test_refresh_revalidates_cached_pages(self):
+        with tempfile.TemporaryDirectory() as tmp, self.settings(SCRAPER_CACHE_DIR=tmp, SCRAPER_CACHE_TTL=3600):
+            self.crawl(self.pid_file, "--max-pages", "3")
+            product = Product.objects.get(pid="PID")
+            self.stub.newer = 2
+            self.stub.requested.clear()
+
+            new = []
+            for rows in iter_new_review_pages(product, max_pages=3):
+                new += [row["title"] for row in rows]
+                insert_reviews(product, rows)
+            self.crawl(self.pid_file, "--max-pages", "3")
+
+        # both refreshes went back to the origin for page 1 instead of the cached copy
+        self.assertEqual(new, ["Title -2", "Title -1"])
+        self.assertEqual(self.stub.requested, [1, 1])
+        self.assertEqual(Review.objects.count(), 32)
+
+
+class PageCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = tmp.name
+
+    def test_replay_serves_only_from_cache(self):
+        with StubReviewServer(pages=2) as stub:
+            live = scrape_flipkart_reviews("PID", max_pages=5, base_url=stub.base_url,
+                                           cache=PageCache(self.cache_dir, ttl=3600))
+            stub.requested.clear()
+            replayed = scrape_flipkart_reviews("PID", max_pages=5, base_url=stub.base_url,
+                                               cache=PageCache(self.cache_dir, replay=True))
+
+        self.assertEqual(replayed, live)
+        self.assertEqual(stub.requested, [])
+
+    def test_stale_entries_are_revalidated(self):
+        with StubReviewServer(pages=1) as stub:
+            cache = PageCache(self.cache_dir, ttl=0)
+            first = scrape_flipkart_reviews("PID", max_pages=1, base_url=stub.base_url, cache=cache)
+            second = scrape_flipkart_reviews("PID", max_pages=1, base_url=stub.base_url, cache=cache)
+
+        self.assertEqual(first, second)
+        self.assertEqual(stub.requested, [1, 1])
+
+    def test_evict_drops_expired_entries_and_bodies(self):
+        with StubReviewServer(pages=1) as stub:
+            cache = PageCache(self.cache_dir, ttl=3600)
+            scrape_flipkart_reviews("PID", max_pages=2, base_url=stub.base_url, cache=cache)
+
+        self.assertEqual(cache.evict(), (0, 0))
+        self.assertEqual(cache.evict(max_age=0), (2, 2))
+        self.assertEqual(list(cache.iter_entries()), [])
+
+
+FLIPKART_EDGE_CASES = """<html><head><script>var s = "<div class='col-12-12'>";</script></head><body>
+<!-- <div class="col-12-12">old</div> -->
+<div class=" col-12-12  row"><div class="XQDdHH  Ga3i8K"> 4<img src="star.svg"/></div>
+<p class="z9E0IG">Worth &amp; every <b>penny</b><!-- ad --></p>
+<div class="ZmyHeo"><div><div>Great   trimmer.<br/>Lasts <span>long</span>&nbsp;</div><span><span>READ MORE</span></span></div></div>
+<p class="_2NsDsF AwS1CA">Rahul <script>track()</script>K</p>
+<p class="MztJPv"><span>Certified Buyer</span>, <span>Delhi</span></p>
+<p class="_2NsDsF">3 months ago</p></div>
+<div class="col-12-12"><p class="_2NsDsF">only a date ₹499</p></div>
+<div class="col-12-12"><div class="col-12-12"><p class="z9E0IG">nested</p></div></div>
+</body></html>""".encode()
+
+AMAZON_EDGE_CASES = """<html><body>
+<li data-hook="review"><span class="a-profile-name"> Priya </span>
+<i data-hook="review-star-rating"><span class="a-icon-alt">4.0 out of 5 stars</span></i>
+<span data-hook="review-date">Reviewed in India on 21 August 2025</span>
+<span data-hook="avp-badge-linkless">Verified Purchase</span>
+<span data-hook="review-body"><span>Good <br> value</span></span></li>
+<li data-hook="review"><span data-hook="review-collapsed">short</span><span data-hook="review-body">long</span></li>
+</body></html>""".encode()
+
+AMAZON_FALLBACK = b"""<div class="a-section celwidget"><span class="a-profile-name">X</span>
+<span data-hook="review-body">text</span></div><div class="celwidget review a-section"></div>"""
+
+
+class ParserParityTests(SimpleTestCase):
+    def test_flipkart_lxml_matches_bs4(self):
+        stub_page = "".join(flipkart_review_block(n) for n in range(10)).encode()
+        for page in [FLIPKART_EDGE_CASES, stub_page]:
+            self.assertEqual(flipkart.PARSERS["lxml"](page), flipkart.PARSERS["bs4"](page))
+
+    def test_amazon_lxml_matches_bs4(self):
+        for page in [AMAZON_EDGE_CASES, AMAZON_FALLBACK]:
+            self.assertEqual(amazon.PARSERS["lxml"](page), amazon.PARSERS["bs4"](page))
+
+
+class BenchScrapersTests(TestCase):
+    def test_bench_runs_on_scaled_fixtures(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.json")
+            call_command("bench_scrapers", "--scale", "2", "--repeat", "1", "--json", path, stdout=StringIO())
+            with open(path, encoding="utf-8") as f:
+                report = json.load(f)
+
+        self.assertEqual(report["scale"], 2)
+        stages = {(r["site"], r["stage"], r["backend"]): r for r in report["results"]}
+        for site in ["flipkart", "amazon"]:
+            for backend in ["bs4", "lxml"]:
+                self.assertEqual(stages[site, "parse", backend]["parity_mismatches"], 0)
+            self.assertEqual(stages[site, "insert", None]["reviews"], stages[site, "parse", "bs4"]["reviews"])
+        self.assertFalse(Review.objects.exists())  # the insert stage is rolled back
+
+        page = (Path(flipkart.__file__).parent / "fixtures" / "flipkart_reviews.html").read_bytes()
+        reviews = flipkart.PARSERS["lxml"](page)
+        scaled = flipkart.PARSERS["lxml"](scale_page(page, "flipkart", 3))
+        self.assertEqual(len(scaled), 3 * len(reviews))
+        self.assertEqual(len({r["review_text"] for r in scaled}), len(scaled))  # copies stay distinct reviews
+
+
+class ThrottleTests(SimpleTestCase):
+    def setUp(self):
+        throttles.configure(backoff_base=0, max_retries=2, circuit_failures=3)
+        self.addCleanup(throttles.configure, **settings.SCRAPER_THROTTLE)
+
+    def test_token_bucket_holds_the_configured_rate(self):
+        clock = [0.0]
+        slept = []
+        bucket = TokenBucket(rate=2, burst=2, clock=lambda: clock[0], sleep=slept.append)
+        for _ in range(6):
+            bucket.acquire()
+        # the burst goes out at once, the other 4 are spaced 0.5s apart
+        self.assertEqual(slept, [0.5, 1.0, 1.5, 2.0])
+
+    def test_transient_errors_are_retried(self):
+        with StubReviewServer(pages=1, fail_first=2) as stub:
+            resp = send(make_session(), f"http://{stub.host}/reviews?page=1")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(stub.requested, [1, 1, 1])
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        with StubReviewServer(pages=1, fail_first=100) as stub:
+            resp = send(make_session(), f"http://{stub.host}/reviews?page=1")
+            self.assertEqual(resp.status_code, 503)
+            with self.assertRaises(CircuitOpenError):
+                send(make_session(), f"http://{stub.host}/reviews?page=1")
+
+        self.assertEqual(len(stub.requested), 3)
+
+
+class ReviewFingerprintTests(SimpleTestCase):
+    def test_ignores_whitespace_case_and_relative_dates(self):
+        a = review_fingerprint(1, "Asha", "Great", "Works  well", "2 months ago")
+        b = review_fingerprint(1, "asha ", "Great", "works well", "3 months ago")
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, review_fingerprint(2, "Asha", "Great", "Works well", ""))
+        self.assertNotEqual(
+            review_fingerprint(1, "Asha", "Great", "Works well", "Sep, 2025"),
+            review_fingerprint(1, "Asha", "Great", "Works well", "Oct, 2025"),
+        )
+
+
+class IngestTests(TestCase):
+    def test_bulk_insert_validates_and_returns_saved_rows(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        rows = [{"reviewer": f"R{n}", "rating": n % 5 + 1, "text": f"Text {n}", "title": "T"} for n in range(25)]
+        rows += [{"rating": "bad", "text": "x"}, {"rating": 9, "text": "x"}, {"rating": 4, "text": " "}]
+        rows += [{"reviewer": "", "rating": 4, "text": "No name given"}]
+
+        with self.assertNumQueries(8):  # savepoint, 3 lookups, 3 batched upserts, release
+            saved = insert_reviews(product, rows, batch_size=10)
+
+        self.assertEqual(len(saved), 26)
+        self.assertTrue(all(r.pk for r in saved))
+        self.assertEqual(Review.objects.filter(product=product).count(), 26)
+        self.assertEqual(saved[-1].reviewer, "Anonymous")
+        self.assertEqual(saved[0].review_date, "")
+        self.assertEqual((saved[0].normalized_text, saved[0].text_length, saved[0].word_count), ("Text 0", 6, 2))
+
+    def test_rescraped_reviews_are_upserted(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        rows = [{"reviewer": "R", "rating": 2, "text": "Too loud", "title": "Meh", "review_date": "Sep, 2025"}]
+        self.assertEqual(len(insert_reviews(product, rows)), 1)
+
+        rows[0]["rating"] = 3
+        self.assertEqual(insert_reviews(product, rows + [dict(rows[0], text=" too  LOUD ")]), [])
+        self.assertEqual(list(Review.objects.values_list("rating", flat=True)), [3.0])
+
+    def test_cleaned_reviews_still_match_rescrapes(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        rows = [
+            {"reviewer": "asha", "rating": 4, "text": "Très bien, works", "title": "Good", "review_date": "12 Sep 2025"},
+            {"reviewer": "ravi", "rating": 2, "text": "Stored before fingerprints", "title": "Meh", "review_date": ""},
+        ]
+        insert_reviews(product, rows[:1])
+        Review.objects.create(product=product, **rows[1])  # no fingerprint
+
+        call_command("clean_reviews", stdout=StringIO())
+        cleaned = Review.objects.get(reviewer="Asha")
+        self.assertEqual((cleaned.text, cleaned.review_date), ("Trs bien, works", "2025-09-12"))
+        self.assertFalse(Review.objects.filter(fingerprint=None).exists())
+
+        self.assertEqual(insert_reviews(product, rows), [])  # upserted, not stored again
+        self.assertEqual(Review.objects.count(), 2)
+
+    def test_word_count_ascii_fast_path_matches_the_regex(self):
+        for text in ["It's NOT worth it, 2/10 - broke_after a week!!", "Très bon produit, the café's 2nd one", "", "   "]:
+            expected = sum(1 for word in _WORD.findall(text.lower()) if word not in STOP_WORDS)
+            self.assertEqual(meaningful_word_count(text), expected, text)
+        self.assertEqual(meaningful_word_count("It's NOT worth it, 2/10"), 3)  # worth, 2, 10
+
+
+    def test_import_reviews_maps_columns_and_upserts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "dump.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("pid,product_name,author,stars,body,verified\n")
+                f.write("P1,Trimmer,Asha,5,Works great,yes\n")
+                f.write("P1,Trimmer,Ravi,2,Battery died,no\n")
+                f.write(",Orphan,Nobody,3,No product,yes\n")
+                f.write("P2,Dryer,Asha,4,Loud but fine,1\n")
+            first, second = StringIO(), StringIO()
+            call_command("import_reviews", path, "--batch-size", "2", stdout=first)
+            call_command("import_reviews", path, stdout=second)
+            self.assertFalse(os.path.exists(path + ".import-checkpoint"))
+
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(
+            sorted(Review.objects.values_list("product__pid", "reviewer", "rating", "verified")),
+            [("P1", "Asha", 5.0, True), ("P1", "Ravi", 2.0, False), ("P2", "Asha", 4.0, True)],
+        )
+        self.assertIn("Imported 3 new and updated 0 existing reviews", first.getvalue())
+        self.assertIn("Imported 0 new and updated 3 existing reviews", second.getvalue())
+
+    def test_import_reviews_skips_jsonl_lines_that_are_not_objects(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "old.csv-export.jsonl")  # .jsonl despite the ".csv" in the name
+            with open(path, "w", encoding="utf-8") as f:
+                f.write('{"reviewer": "Asha", "rating": 5, "text": "Works great"}\n')
+                f.write('["not", "a", "review"]\n')
+                f.write('"just a string"\n')
+                f.write('{"reviewer": "Ravi", "rating": 2, "text": "Battery died"}\n')
+            out = StringIO()
+            call_command("import_reviews", path, "--pid", "P1", stdout=out)
+
+        self.assertIn("2 invalid rows skipped", out.getvalue())
+        self.assertEqual(sorted(Review.objects.values_list("reviewer", flat=True)), ["Asha", "Ravi"])
+
+
+class ExportTests(TestCase):
+    def test_reviews_stream_as_ndjson_and_csv(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        insert_reviews(product, [{"reviewer": f"R{n}", "rating": 4, "text": f"Text, {n}"} for n in range(3)])
+
+        res = self.client.get("/api/export/PID/")
+        self.assertTrue(res.streaming)
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["reviewer"] for line in lines], ["R0", "R1", "R2"])
+
+        res = self.client.get("/api/export/PID/?format=csv")
+        rows = list(csv.reader(b"".join(res.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:3], ["id", "reviewer", "rating"])
+        self.assertEqual([r[5] for r in rows[1:]], ["Text, 0", "Text, 1", "Text, 2"])
+        self.assertEqual(self.client.get("/api/export/NOPE/").status_code, 404)
+
+    def test_pid_listed_on_two_sources_is_looked_up_by_source(self):
+        flipkart = Product.objects.create(pid="PID", name="Trimmer")
+        amazon = Product.objects.create(pid="PID", name="Trimmer", source="amazon")
+        insert_reviews(flipkart, [{"reviewer": "Asha", "rating": 4, "text": "Good"}])
+        insert_reviews(amazon, [{"reviewer": "Ravi", "rating": 2, "text": "Meh"}])
+
+        res = self.client.get("/api/dashboard-data/PID/")
+        self.assertEqual((res.status_code, res.json()["sources"]), (400, ["amazon", "flipkart"]))
+        data = self.client.get("/api/dashboard-data/PID/?source=flipkart").json()
+        self.assertEqual([r["reviewer"] for r in data["recent_reviews"]], ["Asha"])
+        res = self.client.get("/api/export/PID/?source=amazon")
+        self.assertEqual([json.loads(line)["reviewer"] for line in b"".join(res.streaming_content).splitlines()], ["Ravi"])
+        self.assertEqual(self.client.get("/api/export/PID/?source=ebay").status_code, 400)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Product.objects.create(pid="PID", name="Trimmer again")
+
+
+class JobQueueTests(TestCase):
+    def test_add_product_is_queued_and_reports_status(self):
+        res = self.client.post("/api/add-product/", {"pid": "PID", "name": "Trimmer"}, content_type="application/json")
+        self.assertEqual(res.status_code, 202)
+        status_url = res.json()["status_url"]
+        self.assertEqual(self.client.get(status_url).json()["status"], Job.QUEUED)
+
+        job = claim_next_job()
+        self.assertEqual(job.product.pid, "PID")
+        self.assertIsNone(claim_next_job())
+        self.assertEqual(self.client.get(status_url).json()["status"], Job.RUNNING)
+        self.assertEqual(self.client.get("/api/jobs/999/").status_code, 404)
+
+    def test_product_with_an_active_job_is_not_queued_twice(self):
+        def post():
+            return self.client.post(
+                "/api/add-product/", {"pid": "PID", "name": "Trimmer"}, content_type="application/json",
+            ).json()["job_id"]
+
+        first = post()
+        self.assertEqual(post(), first)
+        claim_next_job()
+        self.assertEqual(post(), first)  # still running
+
+        Job.objects.filter(id=first).update(status=Job.DONE)
+        self.assertNotEqual(post(), first)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_only_stale_running_jobs_are_requeued(self):
+        stale, live = (Job.objects.create(kind=Job.ADD_PRODUCT, product=Product.objects.create(pid=pid, name=pid))
+                       for pid in ["P1", "P2"])
+        self.assertEqual([claim_next_job().id, claim_next_job().id], [stale.id, live.id])
+        Job.objects.filter(id=stale.id).update(started_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(requeue_stale_jobs(stale_after=3600), 1)
+        self.assertEqual(dict(Job.objects.values_list("id", "status")), {stale.id: Job.QUEUED, live.id: Job.RUNNING})
+
+    def test_open_circuit_fails_the_job_with_a_retry_hint(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        open_circuit = mock.patch("core.scraper.base.fetch_in_order",
+                                  side_effect=CircuitOpenError("Circuit open for example.com, not sending request"))
+        with open_circuit:
+            job = enqueue_add_product(product)
+            self.assertFalse(run_job(claim_next_job()))
+            with self.assertRaisesMessage(CommandError, "host circuit open, retry later"):
+                call_command("scrape_flipkart", "PID", "Trimmer", stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (Job.FAILED, "Circuit open for example.com, not sending request: host circuit open, retry later"))
+        self.assertNotEqual(enqueue_add_product(product).id, job.id)  # can be queued again
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def test_concurrent_first_use_loads_model_once(self):
+        loads = []
+
+        def loader(name):
+            loads.append(name)
+            time.sleep(0.05)
+            return object()
+
+        registry = ModelRegistry(loader=loader)
+        got = []
+        threads = [threading.Thread(target=lambda: got.append(registry.get("sentiment"))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(loads, ["sentiment"])
+        self.assertEqual(len({id(m) for m in got}), 1)
+        self.assertIn("load_seconds", registry.stats()["models"]["sentiment"])
+        registry.unload()
+        self.assertFalse(registry.is_loaded("sentiment"))
+
+    def test_backends_have_their_own_model_ids(self):
+        self.assertNotEqual(model_id("sentiment", "torch"), model_id("sentiment", "onnx-int8"))
+        with self.assertRaises(ValueError):
+            load_pipeline("zero-shot", backend="onnx-int8")
+
+    def test_windowing_is_part_of_the_model_id(self):
+        ids, versions = {model_id("sentiment")}, {sentiment_version()}
+        for change in [{"INFERENCE_WINDOW_TOKENS": 128}, {"INFERENCE_WINDOW_OVERLAP": 0}, {"INFERENCE_MAX_WINDOWS": None}]:
+            with override_settings(**change):
+                ids.add(model_id("sentiment"))
+                versions.add(sentiment_version())
+        self.assertEqual((len(ids), len(versions)), (4, 4))
+        self.assertEqual(model_id("summarizer"), "facebook/bart-large-cnn")
+
+
+class BatchingTests(SimpleTestCase):
+    def test_batches_stay_under_token_budget_and_keep_order(self):
+        lengths = [3, 50, 4, 4, 120, 8, 3, 600, 7]
+        batches = plan_batches(lengths, max_tokens=128, max_items=4)
+
+        self.assertEqual(sorted(i for b in batches for i in b), list(range(len(lengths))))
+        for batch in batches:
+            padded = len(batch) * max(lengths[i] for i in batch)
+            self.assertTrue(padded <= 128 or len(batch) == 1)
+            self.assertLessEqual(len(batch), 4)
+        self.assertEqual([lengths[i] for i in batches[0]], [3, 3, 4, 4])
+
+        encodings = [[0] * n for n in lengths]
+        out = run_batched(encodings, lambda idx: [[len(encodings[i])] for i in idx], max_tokens=128)
+        self.assertEqual(out.ravel().tolist(), lengths)
+
+    def test_long_inputs_are_windowed_and_pooled(self):
+        self.assertEqual(window_spans(10, 16), [(0, 10)])
+        self.assertEqual(window_spans(40, 16, overlap=4), [(0, 16), (12, 28), (24, 40)])
+        capped = window_spans(1000, 16, overlap=4, max_windows=3)
+        self.assertEqual([capped[0], capped[-1], len(capped)], [(0, 16), (984, 1000), 3])
+
+        rows = np.array([[0.2, 0.8], [0.6, 0.4], [0.9, 0.1]])
+        owners = np.array([0, 1, 1])
+        np.testing.assert_allclose(pool_windows(rows, owners, 2, weights=[5, 3, 1]), [[0.2, 0.8], [0.675, 0.325]])
+        np.testing.assert_allclose(pool_windows(rows, owners, 2, how="max"), [[0.2, 0.8], [0.9, 0.4]])
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer: [PAD] = 0, [CLS] = 1, [SEP] = 2, words from 10 on ("bad" is 10)."""
+    model_input_names = ["input_ids", "attention_mask"]
+
+    def __init__(self):
+        self.vocab = {"bad": 10}
+
+    def __call__(self, texts, add_special_tokens=False, verbose=False):
+        return {"input_ids": [[self.vocab.setdefault(w, 10 + len(self.vocab)) for w in t.split()] for t in texts]}
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 3 if pair else 2
+
+    def build_inputs_with_special_tokens(self, ids, pair=None):
+        return [1, *ids, 2] + ([*pair, 2] if pair else [])
+
+    def pad(self, features, padding=True, return_tensors="np"):
+        width = max(len(f["input_ids"]) for f in features)
+        return {name: np.array([f[name] + [0] * (width - len(f[name])) for f in features]) for name in features[0]}
+
+
+class FakeSession:
+    """Stands in for onnxruntime.InferenceSession: logits favour NEGATIVE for inputs holding "bad"."""
+
+    def __init__(self):
+        self.batches = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, outputs, feeds):
+        ids = feeds["input_ids"]
+        self.batches.append((ids.shape, ids.dtype))
+        bad = (ids == 10).any(axis=1, keepdims=True)
+        return [np.where(bad, [[2.0, 0.0]], [[0.0, 1.0]])]
+
+
+class OnnxBackendTests(SimpleTestCase):
+    def classifier(self, **kwargs):
+        session = FakeSession()
+        return onnx_backend.OnnxSentimentClassifier(FakeTokenizer(), session, ["NEGATIVE", "POSITIVE"], 512, **kwargs), session
+
+    def test_labels_are_mapped_in_input_order(self):
+        classifier, _ = self.classifier()
+        results = classifier(["works well", "bad battery", "good"])
+        self.assertEqual([r["label"] for r in results], ["POSITIVE", "NEGATIVE", "POSITIVE"])
+        self.assertAlmostEqual(results[0]["score"], 1 / (1 + np.exp(-1)))
+        self.assertAlmostEqual(results[1]["score"], 1 / (1 + np.exp(-2)))
+        self.assertEqual(classifier([]), [])
+
+    def test_batches_stay_under_the_token_budget(self):
+        classifier, session = self.classifier(max_tokens=16)
+        sentences = ["good " * n for n in (1, 9, 2, 3, 1, 6)]
+        self.assertEqual(len(classifier(sentences)), 6)
+        self.assertGreater(len(session.batches), 1)
+        for (rows, width), dtype in session.batches:
+            self.assertTrue(rows * width <= 16 or rows == 1)
+            self.assertEqual(dtype, np.int64)
+
+    def test_long_inputs_are_windowed_and_pooled(self):
+        classifier, session = self.classifier(window=4)
+        [result] = classifier(["good good good good good good good bad"])
+        self.assertEqual(session.batches[0][0], (2, 6))  # two windows of 4 words + [CLS]/[SEP]
+        positive = 1 / (1 + np.exp(-1))
+        negative = 1 / (1 + np.exp(-2))
+        self.assertEqual(result["label"], "NEGATIVE")
+        self.assertAlmostEqual(result["score"], ((1 - positive) + negative) / 2)
+
+    def test_concurrent_exports_leave_one_complete_copy(self):
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base)
+        final = onnx_backend.model_dir(base, "org/model")
+        exports = []
+
+        def export(model, out_dir, winner=False):
+            exports.append(out_dir)
+            self.assertNotEqual(Path(out_dir), final)  # never written in place
+            (Path(out_dir) / onnx_backend.INT8_FILE).write_text("int8")
+            if winner:  # another process renamed its copy into place meanwhile
+                final.mkdir()
+                (final / onnx_backend.INT8_FILE).write_text("theirs")
+
+        with mock.patch.object(onnx_backend, "export_quantized", partial(export, winner=True)), \
+                self.assertLogs("core.onnx_backend", "INFO") as logs:
+            self.assertEqual(onnx_backend.ensure_exported("org/model", base), final)
+        self.assertIn("exported by another process", logs.output[-1])
+        with mock.patch.object(onnx_backend, "export_quantized", export):
+            onnx_backend.ensure_exported("org/model", base)
+
+        self.assertEqual(len(exports), 1)
+        self.assertEqual((final / onnx_backend.INT8_FILE).read_text(), "theirs")
+        self.assertEqual(os.listdir(base), [final.name])  # the losing copy was removed
+
+
+class InferenceServerTests(SimpleTestCase):
+    def test_concurrent_requests_share_micro_batches(self):
+        path = os.path.join(tempfile.mkdtemp(), "inference.sock")
+        server = InferenceServer(path, {"sentiment": keyword_classifier}, max_batch=64, max_wait=0.2)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        model = RemoteModel("sentiment", path=path, fallback=False)
+        requests = [[f"bad {i}.", f"good {i}."] for i in range(8)]
+        barrier = threading.Barrier(len(requests))
+        results = {}
+
+        def call(i):
+            barrier.wait()
+            results[i] = model(requests[i])
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(requests))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([results[i] for i in range(len(requests))], [keyword_classifier(r) for r in requests])
+        stats = request({"op": "stats"}, path)["models"]["sentiment"]
+        self.assertEqual((stats["requests"], stats["inputs"]), (8, 16))
+        self.assertLess(stats["batches"], 8)
+        with self.assertRaises(FileNotFoundError):
+            RemoteModel("sentiment", path=path + ".missing", fallback=False)(["Good."])
+        with self.assertRaises(InferenceError):
+            InferenceServer(path, {"sentiment": keyword_classifier})
+        self.assertEqual(model(["Good."]), keyword_classifier(["Good."]))  # the running server kept its socket
+
+    def test_missing_server_is_reported_once_and_not_retried_every_call(self):
+        path = os.path.join(tempfile.mkdtemp(), "missing.sock")
+        with override_settings(INFERENCE_SOCKET=path), mock.patch("core.inference.get_model", return_value=keyword_classifier), \
+                mock.patch("core.inference.request", side_effect=FileNotFoundError) as send, \
+                self.assertLogs("core.inference", "WARNING") as logs:
+            first = get_classifier("sentiment")
+            self.assertEqual(first(["bad."]), keyword_classifier(["bad."]))
+            second = get_classifier("sentiment")
+            self.assertEqual(second(["good."]), keyword_classifier(["good."]))
+
+        self.assertIs(first, second)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("No inference server", logs.output[0])
+        self.assertEqual(send.call_count, 1)  # the second call went straight to the local model
+
+    def test_failed_or_timed_out_requests_fall_back_to_the_local_model(self):
+        for error in [InferenceError("CUDA out of memory"), socket.timeout("timed out")]:
+            model = RemoteModel("sentiment", path="unused.sock")
+            with mock.patch("core.inference.get_model", return_value=keyword_classifier), \
+                    mock.patch("core.inference.request", side_effect=error), self.assertLogs("core.inference", "WARNING"):
+                self.assertEqual(model(["bad."]), keyword_classifier(["bad."]))
+
+
+class SegmenterTests(SimpleTestCase):
+    def test_rule_segmenter_splits_review_sentences(self):
+        segmenter = RuleSegmenter()
+        self.assertEqual(
+            segmenter.split("Paid Rs. 499 for it. Rated 4.5 stars!Good.Value for money\nWorks fineREAD MORE"),
+            ["Paid Rs. 499 for it.", "Rated 4.5 stars!", "Good.", "Value for money", "Works fine"],
+        )
+        sentences, counts = segmenter.segment_many(["One. Two?", "", "Three"])
+        self.assertEqual((sentences, counts), (["One.", "Two?", "Three"], [2, 0, 1]))
+
+    def test_rule_segmenter_keeps_text_as_written(self):
+        segmenter = RuleSegmenter()
+        self.assertEqual(segmenter.split("   "), [])
+        self.assertEqual(segmenter.split(" \n READ MORE "), [])
+        self.assertEqual(segmenter.split("Mr.Smith came"), ["Mr.Smith came"])
+        self.assertEqual(segmenter.split("  Ask Dr.  Rao. Paid Rs.\n499 "), ["Ask Dr.  Rao.", "Paid Rs.\n499"])
+        self.assertEqual(segmenter.split("Bought it from Mr. READ MORE"), ["Bought it from Mr."])
+
+    def test_batched_segmentation_keeps_texts_apart(self):
+        texts = ["Paid Rs.", "500 more. Fine", None, "Zero\x00byte. Ok", "Rs."]
+        sentences, counts = RuleSegmenter().segment_many(texts)
+        self.assertEqual(sentences, ["Paid Rs.", "500 more.", "Fine", "Zero byte.", "Ok", "Rs."])
+        self.assertEqual(counts, [1, 2, 0, 2, 1])
+        self.assertEqual(RuleSegmenter().segment_many([]), ([], []))
+
+
+class SentimentTests(TestCase):
+    def test_segment_reductions_match_per_review_statistics(self):
+        reviews = [[0.9, 0.2, 0.4], [0.7], [0.1, 0.8, 0.3, 0.6]]
+        stats = segment_stats(np.array([p for r in reviews for p in r]), np.array([len(r) for r in reviews]))
+        for i, scores in enumerate(reviews):
+            self.assertAlmostEqual(stats["mean"][i], statistics.mean(scores))
+            self.assertAlmostEqual(stats["median"][i], statistics.median(scores))
+            self.assertEqual(stats["positive"][i], sum(p >= 0.5 for p in scores))
+
+    def test_sentences_of_many_reviews_share_classifier_batches(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        texts = ["Good.\nbad.\nbad.", "Great blade.", "", "bad battery.\nFine."]
+        Review.objects.bulk_create(Review(product=product, reviewer=f"R{i}", rating=4, text=t) for i, t in enumerate(texts))
+        calls = []
+
+        def classifier(sentences, **kwargs):
+            calls.append(len(sentences))
+            return keyword_classifier(sentences, **kwargs)
+
+        updated = analyze_reviews(Review.objects.order_by("id"), classifier, chunk_size=10, split=str.splitlines)
+
+        self.assertEqual((updated, calls), (3, [5]))  # "bad." is classified once
+        self.assertEqual(
+            list(Review.objects.order_by("id").values_list("sentiment", "sentiment_score")),
+            [("negative", 0.268), ("positive", 0.612), (None, None), ("positive", 0.352)],
+        )
+
+    def test_only_stale_reviews_are_reanalyzed(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        saved = insert_reviews(product, [{"reviewer": f"R{n}", "rating": 4, "text": f"Good {n}."} for n in range(3)])
+        calls = []
+
+        def classifier(sentences, **kwargs):
+            calls.append(len(sentences))
+            return keyword_classifier(sentences, **kwargs)
+
+        def analyze():
+            return analyze_reviews(Review.objects.all(), classifier, split=str.splitlines, only_stale=True)
+
+        self.assertEqual(analyze(), 3)
+        self.assertEqual(analyze(), 0)
+
+        edited = Review.objects.get(id=saved[0].id)
+        edited.text = "Arrived bad."
+        edited.save(update_fields=["text"])  # e.g. the admin: save() refreshes content_hash
+        Review.objects.filter(id=saved[1].id).update(sentiment_model="older-model/median")
+        self.assertEqual(analyze(), 2)
+        self.assertEqual(calls, [3, 2])
+        self.assertEqual(Review.objects.get(id=saved[0].id).sentiment, "negative")
+
+    def test_line_breaks_separate_sentences(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        insert_reviews(product, [{"reviewer": "R", "rating": 3, "text": "Battery is bad\n  Screen is   great \n\nREAD MORE"}])
+        seen = []
+
+        def classifier(sentences, **kwargs):
+            seen.extend(sentences)
+            return keyword_classifier(sentences, **kwargs)
+
+        self.assertEqual(analyze_reviews(Review.objects.all(), classifier), 1)
+        self.assertEqual(seen, ["Battery is bad", "Screen is great"])
+        review = Review.objects.get()
+        self.assertEqual(review.sentiment_text_hash, review.content_hash)
+
+    def test_admin_form_leaves_out_derived_fields(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        review = insert_reviews(product, [{"reviewer": "Asha", "rating": 4, "text": "Good."}])[0]
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+
+        form = self.client.get(f"/admin/core/review/{review.id}/change/").context["adminform"].form
+        self.assertIn("text", form.fields)
+        for name in ["sentiment_model", "sentiment_text_hash", "normalized_text", "text_length", "word_count", "content_hash"]:
+            self.assertNotIn(name, form.fields)
+
+    def test_id_shards_cover_every_review_once(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        Review.objects.bulk_create(Review(product=product, reviewer=f"R{i}", rating=4, text="t") for i in range(10))
+        Review.objects.filter(reviewer__in=["R2", "R3", "R4"]).delete()
+
+        shards = id_shards(Review.objects.all(), 3)
+        ids = [pk for lo, hi in shards for pk in Review.objects.filter(id__gte=lo, id__lte=hi).values_list("id", flat=True)]
+        self.assertEqual(sorted(ids), sorted(Review.objects.values_list("id", flat=True)))
+        self.assertEqual(len(shards), 3)
+        self.assertEqual(id_shards(Review.objects.none(), 3), [])
+
+    def test_cached_sentences_skip_the_classifier(self):
+        calls = []
+
+        def classifier(sentences, **kwargs):
+            calls.append(list(sentences))
+            return keyword_classifier(sentences, **kwargs)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sentiment.sqlite3")
+            cache = SentimentCache(path, "model-a", max_entries=1)
+            first = classify_sentences(classifier, ["Awesome", "bad fit", "awesome "], cache=cache)
+            cache.close()
+
+            cache = SentimentCache(path, "model-a", max_entries=1)
+            second = classify_sentences(classifier, ["bad fit", "Awesome", "Value for money"], cache=cache)
+            self.assertEqual(calls, [["Awesome", "bad fit"], ["Value for money"]])
+            self.assertEqual(second[:2].tolist(), first[[1, 0]].tolist())
+            self.assertEqual((cache.stats()["disk_hits"], cache.stats()["misses"]), (2, 1))
+            cache.close()
+
+            other_model = SentimentCache(path, "model-b")
+            self.assertEqual(other_model.get_many([b"x"]), {})
+            self.assertEqual(other_model.evict_other_models(), 3)
+            other_model.close()
+
+            cache = SentimentCache(path, "model-a")
+            self.assertEqual(cache.get_many([sentence_key("Awesome")]), {})
+            cache.close()
+
+
+class WorkerProcess:
+    """Stands in for a spawned analyze_sentiments worker: start() runs the target in this process."""
+
+    def __init__(self, target, args, daemon=None):
+        self.target, self.args = target, args
+        self.exitcode = None
+
+    def start(self):
+        self.target(*self.args)
+        self.exitcode = 0
+
+    def is_alive(self):
+        return False
+
+    def terminate(self):
+        pass
+
+    def join(self):
+        pass
+
+
+class KilledWorkerProcess(WorkerProcess):
+    """A worker killed before it could report anything (e.g. by the OOM killer)."""
+
+    def start(self):
+        self.exitcode = -9
+
+
+def worker_context(process):
+    return SimpleNamespace(Queue=lambda maxsize=0: queue.Queue(), Process=process)
+
+
+class SentimentWorkerTests(TestCase):
+    def setUp(self):
+        product = Product.objects.create(pid="PID", name="Trimmer")
+        self.saved = insert_reviews(product, [{"reviewer": f"R{n}", "rating": 4, "text": t}
+                                              for n, t in enumerate(["Good.", "bad fit.", "bad box. Fine. bad lid."])])
+        for target in ["core.ml.get_model", "core.ml.limit_threads"]:
+            patcher = mock.patch(target, return_value=keyword_classifier)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_shard_reports_rows_then_done(self):
+        results = queue.Queue()
+        ids = [r.id for r in self.saved]
+        analyze_shard(1, ids[0], ids[-1], 1, {"no_cache": True, "chunk_size": 2}, results)
+
+        messages = [results.get_nowait() for _ in range(results.qsize())]
+        self.assertEqual([(kind, shard) for kind, shard, _ in messages], [("rows", 1), ("rows", 1), ("done", 1)])
+        rows = [row for kind, _, payload in messages if kind == "rows" for row in payload]
+        self.assertEqual([(sentiment, review_id) for sentiment, _, _, _, review_id in rows],
+                         [("positive", ids[0]), ("negative", ids[1]), ("negative", ids[2])])
+        self.assertEqual({model for _, _, model, _, _ in rows}, {sentiment_version()})
+        self.assertIsNone(messages[-1][2])  # no cache stats with no_cache
+        self.assertFalse(Review.objects.exclude(sentiment=None).exists())  # the parent writes the rows
+
+    def test_shard_reports_errors_with_the_traceback(self):
+        results = queue.Queue()
+        with mock.patch("core.ml.get_model", side_effect=RuntimeError("model files missing")):
+            analyze_shard(0, self.saved[0].id, self.saved[-1].id, 1, {"no_cache": True}, results)
+
+        kind, shard, payload = results.get_nowait()
+        self.assertEqual((kind, shard), ("error", 0))
+        self.assertIn("RuntimeError: model files missing", payload)
+        self.assertTrue(results.empty())
+
+    def test_parent_merges_worker_rows(self):
+        with mock.patch("multiprocessing.get_context", return_value=worker_context(WorkerProcess)):
+            call_command("analyze_sentiments", "--workers", "2", "--no-cache", stdout=StringIO())
+
+        self.assertEqual(list(Review.objects.order_by("id").values_list("sentiment", flat=True)),
+                         ["positive", "negative", "negative"])
+
+    def test_dead_worker_fails_the_command(self):
+        with mock.patch("multiprocessing.get_context", return_value=worker_context(KilledWorkerProcess)), \
+                self.assertRaisesMessage(CommandError, "Worker 0 exited with code -9"):
+            call_command("analyze_sentiments", "--workers", "2", "--no-cache", stdout=StringIO())
@@ -5,7 +5,9 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),
      path("products/", views.product_list, name="product-list"),
     path('add-product/', views.add_and_scrape_product, name='add-product'),
+    path("jobs/<int:job_id>/", views.job_status, name="job-status"),
     path("dashboard-data/<str:pid>/", views.dashboard_data, name="dashboard-data"),
+    path("export/<str:pid>/", views.export_reviews, name="export-reviews"),
 
 ]
     # path('add/', views.add_product, name='add_product'),
@@ -1,12 +1,14 @@
 # core/views.py
 
+import csv
 import json
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from .models import Product, Review
-from .scraper.flipkart import scrape_flipkart_reviews
-from .utils import analyze_sentiments_for_reviews
+from django.urls import reverse
+from .models import Job, Product, Review
+from .scraper.sources import DEFAULT_SOURCE, SOURCES
+from .services import enqueue_add_product, job_progress
 
 
 def dashboard(request):
@@ -16,7 +18,7 @@ def dashboard(request):
 
 def product_list(request):
    
-    products = Product.objects.all().values("pid", "name")
+    products = Product.objects.all().values("pid", "name", "source")
     return JsonResponse({"products": list(products)})
 
 
@@ -30,48 +32,66 @@ def add_and_scrape_product(request):
         data = json.loads(request.body)
         pid = data.get("pid")
         name = data.get("name")
+        source = data.get("source") or DEFAULT_SOURCE
     except Exception:
         return JsonResponse({"error": "Invalid JSON"}, status=400)
 
     if not pid or not name:
         return JsonResponse({"error": "pid and name are required"}, status=400)
+    if source not in SOURCES:
+        return JsonResponse({"error": f"Unknown source, expected one of: {', '.join(SOURCES)}"}, status=400)
 
-    product, created = Product.objects.get_or_create(pid=pid, defaults={"name": name})
+    product, created = Product.objects.get_or_create(pid=pid, source=source, defaults={"name": name})
     message = "Product added successfully" if created else "Product already existed"
 
-    # Scrape 
-    reviews_data = scrape_flipkart_reviews(pid, max_pages=10)
-    saved_reviews = []
-    for r in reviews_data:
-        rev = Review.objects.create(
-            product=product,
-            reviewer=r.get('reviewer_name') or "Anonymous",
-            rating=r.get('rating') or 0,
-            verified=True,
-            text=r.get('review_text') or "",
-            title=r.get('title') or "",
-            location=r.get('location') or "",
-            review_date=r.get('date'),
-            category="product",
-        )
-        saved_reviews.append(rev)
-
-  
-    analyzed_count = analyze_sentiments_for_reviews(saved_reviews)
+    # Scraping and sentiment analysis run in `manage.py run_worker`; the
+    # client polls the job's status URL for progress
+    job = enqueue_add_product(product, max_pages=10)
 
     return JsonResponse({
         "message": message,
-        "product": {"pid": product.pid, "name": product.name},
-        "reviews_scraped": len(reviews_data),
-        "sentiment_analyzed": analyzed_count
-    })
+        "product": {"pid": product.pid, "name": product.name, "source": product.source},
+        "job_id": job.id,
+        "status_url": reverse("job-status", args=[job.id]),
+    }, status=202)
 
 
-def dashboard_data(request, pid):
+def job_status(request, job_id):
     try:
-        product = Product.objects.get(pid=pid)
-    except Product.DoesNotExist:
-        return JsonResponse({"error": "Product not found"}, status=404)
+        job = Job.objects.select_related("product").get(id=job_id)
+    except Job.DoesNotExist:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    return JsonResponse(job_progress(job))
+
+
+def _product_for_request(request, pid):
+    """
+    (product, None) for `pid`, or (None, error response). The same pid may
+    be listed on several marketplaces: ?source= picks one, and without it an
+    ambiguous pid is a 400.
+    """
+    products = Product.objects.filter(pid=pid)
+    source = request.GET.get("source")
+    if source:
+        if source not in SOURCES:
+            return None, JsonResponse({"error": f"Unknown source, expected one of: {', '.join(SOURCES)}"}, status=400)
+        products = products.filter(source=source)
+    matches = list(products[:2])
+    if not matches:
+        return None, JsonResponse({"error": "Product not found"}, status=404)
+    if len(matches) > 1:
+        return None, JsonResponse({
+            "error": "pid exists on several sources, pass ?source=",
+            "sources": sorted(products.values_list("source", flat=True)),
+        }, status=400)
+    return matches[0], None
+
+
+def dashboard_data(request, pid):
+    product, error = _product_for_request(request, pid)
+    if error:
+        return error
 
     reviews = Review.objects.filter(product=product).order_by("-id")
     total_reviews = reviews.count()
@@ -124,10 +144,9 @@ from django.http import JsonResponse
 from .models import Product, Review
 
 def critical_issues(request, pid):
-    try:
-        product = Product.objects.get(pid=pid)
-    except Product.DoesNotExist:
-        return JsonResponse({"error": "Product not found"}, status=404)
+    product, error = _product_for_request(request, pid)
+    if error:
+        return error
 
     reviews = Review.objects.filter(product=product)
     total_reviews = reviews.count() or 1  # avoid division by zero
@@ -166,7 +185,7 @@ def critical_issues(request, pid):
         })
 
     # 4️⃣ Very short review texts
-    short_text_count = reviews.filter(text__length__lt=20).count()
+    short_text_count = reviews.filter(text_length__lt=20).count()
     if short_text_count > 0:
         issues.append({
             "issue": "Short / truncated review text",
@@ -179,3 +198,75 @@ def critical_issues(request, pid):
         "total_reviews": total_reviews,
         "critical_issues": issues
     })
+
+
+# Columns of /api/export/<pid>/, in CSV column order
+EXPORT_FIELDS = [
+    "id", "reviewer", "rating", "verified", "title", "text", "location", "review_date",
+    "sentiment", "sentiment_score", "category", "is_critical",
+]
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _LineBuffer:
+    """File-like object for csv.writer that hands back each written line."""
+
+    def write(self, value):
+        return value
+
+
+def _chunked(lines):
+    """
+    Join lines into chunks of EXPORT_CHUNK_SIZE. The first line goes out on
+    its own so the client gets the first byte without waiting for a chunk.
+    """
+    lines = iter(lines)
+    for first in lines:
+        yield first
+        break
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def _export_ndjson(rows):
+    return _chunked(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n" for row in rows)
+
+
+def _export_csv(rows):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_FIELDS)
+    yield from _chunked(writer.writerow(row) for row in rows)
+
+
+def export_reviews(request, pid):
+    """
+    Stream every review of a product with its analysis results as NDJSON
+    (default) or CSV (?format=csv). Rows are read with a chunked cursor and
+    written as they come, so memory stays flat whatever the review count.
+    """
+    fmt = request.GET.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return JsonResponse({"error": "format must be ndjson or csv"}, status=400)
+
+    product, error = _product_for_request(request, pid)
+    if error:
+        return error
+
+    rows = (
+        Review.objects.filter(product=product)
+        .order_by("id")
+        .values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    if fmt == "csv":
+        response = StreamingHttpResponse(_export_csv(rows), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="reviews_{pid}.csv"'
+    else:
+        response = StreamingHttpResponse(_export_ndjson(rows), content_type="application/x-ndjson")
+    return response
@@ -127,3 +127,99 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Logging
+# Messages of the project's own modules (core.*, e.g. model exports or a
+# missing inference server) go to stderr.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"core": {"handlers": ["console"], "level": "INFO"}},
+}
+
+# Scrapers
+# Number of review pages fetched in parallel (over one keep-alive session).
+SCRAPER_CONCURRENCY = 4
+
+# On-disk page cache (set SCRAPER_CACHE_DIR = None to disable). Pages younger
+# than SCRAPER_CACHE_TTL seconds are served from disk, older ones revalidated.
+# Re-scrapes of known products always revalidate (see get_refresh_page_cache).
+# SCRAPER_REPLAY serves pages only from the cache, for offline runs.
+SCRAPER_CACHE_DIR = BASE_DIR / "cache" / "pages"
+SCRAPER_CACHE_TTL = 6 * 60 * 60
+SCRAPER_REPLAY = False
+
+# Shared per-host throttle for every scraper request: token bucket of `rate`
+# requests/second with bursts of `burst`, `max_retries` retries of 429/5xx and
+# connection errors with jittered exponential backoff, and a circuit breaker
+# that stops hitting a host for `circuit_reset` seconds after
+# `circuit_failures` consecutive failures. `hosts` overrides rate/burst per host.
+SCRAPER_THROTTLE = {
+    "rate": 2.0,
+    "burst": 4,
+    "hosts": {},
+    "max_retries": 3,
+    "backoff_base": 1.0,
+    "backoff_max": 30.0,
+    "circuit_failures": 5,
+    "circuit_reset": 60.0,
+}
+
+# Reviews written per INSERT statement when storing scraped/imported reviews
+# (each page or import is still a single transaction).
+INGEST_BATCH_SIZE = 500
+
+# Background jobs: `run_worker --requeue` only puts back running jobs started
+# more than JOB_STALE_AFTER seconds ago, younger ones may belong to a live worker.
+JOB_STALE_AFTER = 60 * 60
+
+# Sentiment analysis: at most SENTIMENT_BATCH_SIZE sentences per classifier
+# batch (within INFERENCE_TOKEN_BUDGET), and reviews whose sentences are
+# pooled into one classifier call / one batched write.
+SENTIMENT_BATCH_SIZE = 256
+SENTIMENT_CHUNK_SIZE = 2000
+
+# Persistent cache of sentence sentiment scores (set SENTIMENT_CACHE_PATH =
+# None to disable), with an in-memory LRU of SENTIMENT_CACHE_SIZE sentences.
+# Scores of earlier models stay on disk until `manage.py prune_sentiment_cache`.
+SENTIMENT_CACHE_PATH = BASE_DIR / "cache" / "sentiment.sqlite3"
+SENTIMENT_CACHE_SIZE = 100_000
+
+# Sentiment model backend: "torch" (transformers pipeline) or "onnx-int8"
+# (exported once to ONNX_MODEL_DIR, int8-quantized, run by ONNX Runtime with
+# ONNX_THREADS intra-op threads, None for one per core). Needs onnx and
+# onnxruntime; check it with `manage.py bench_sentiment` before switching.
+SENTIMENT_BACKEND = "torch"
+ONNX_MODEL_DIR = BASE_DIR / "cache" / "onnx"
+ONNX_THREADS = None
+
+# Padded tokens per transformer forward pass (core.batching): inputs are
+# batched shortest first under this budget instead of a fixed batch size.
+INFERENCE_TOKEN_BUDGET = 8192
+
+# Inputs longer than INFERENCE_WINDOW_TOKENS tokens (None: the model limit)
+# are scored in windows overlapping by INFERENCE_WINDOW_OVERLAP tokens and the
+# window scores pooled (core.chunking), at most INFERENCE_MAX_WINDOWS per input.
+# They are part of core.ml.model_id, so changing any of them invalidates the
+# sentiment cache and marks stored sentiment as stale.
+INFERENCE_WINDOW_TOKENS = 256
+INFERENCE_WINDOW_OVERLAP = 64
+INFERENCE_MAX_WINDOWS = 8
+
+# Sentence segmenter for sentiment analysis (core.segment): "rules", a regex
+# rule set for marketplace reviews, or "punkt" (nltk, needs its data files).
+SENTENCE_SEGMENTER = "rules"
+
+# Local inference server (`manage.py inference_server`): web and job worker
+# processes send their sentiment inputs to it over this Unix socket instead
+# of loading their own model, and run a local copy while no server is
+# listening (INFERENCE_SOCKET = None: always local), trying it again every
+# INFERENCE_RETRY_INTERVAL seconds. Concurrent requests are micro-batched,
+# up to INFERENCE_SERVER_MAX_BATCH inputs, the first one waiting at most
+# INFERENCE_SERVER_MAX_WAIT seconds for others to join.
+INFERENCE_SOCKET = BASE_DIR / "cache" / "inference.sock"
+INFERENCE_TIMEOUT = 120.0
+INFERENCE_RETRY_INTERVAL = 30.0
+INFERENCE_SERVER_MAX_BATCH = 256
+INFERENCE_SERVER_MAX_WAIT = 0.01